@@ -0,0 +1,186 @@
+"""
+Blinkit Analysis Dashboard - Order Generator Benchmark
+Compares orders/sec of the batched generate_sales and generate_deliveries
+engines against the original row-by-row generators and checks the outputs
+are statistically equivalent
+
+Usage:
+    python benchmarks/bench_generation.py [--legacy-orders 5000] [--orders 20000 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import data_generation as gen  # noqa: E402
+
+
+# ============================================================================
+# REFERENCE IMPLEMENTATION (row-by-row generator before vectorization)
+# ============================================================================
+
+def generate_sales_legacy(num_orders, df_customers, df_products):
+    """Original per-order loop, kept only as the benchmark baseline"""
+    orders = []
+    peak_hours = [7, 8, 12, 13, 19, 20, 21]
+
+    for i in range(num_orders):
+        order_date = gen.fake.date_time_between(start_date=gen.START_DATE, end_date=gen.END_DATE)
+        if order_date.weekday() >= 5:
+            if random.random() < 0.3:
+                continue
+
+        hour = random.choice(peak_hours) if random.random() < 0.6 else random.randint(6, 23)
+        order_datetime = order_date.replace(hour=hour, minute=random.randint(0, 59))
+        customer = df_customers.sample(1).iloc[0]
+        num_items = np.random.choice([1, 2, 3, 4, 5, 6, 7, 8],
+                                     p=[0.3, 0.25, 0.2, 0.12, 0.08, 0.03, 0.01, 0.01])
+        products = df_products.sample(num_items)
+
+        subtotal = sum(products['Price'] * np.random.randint(1, 4, size=len(products)))
+        delivery_fee = 0 if subtotal > 200 else 20
+        discount = round(subtotal * random.choice([0, 0, 0.05, 0.10, 0.15]), 2)
+        total_amount = round(subtotal + delivery_fee - discount, 2)
+
+        orders.append({
+            'OrderID': f'ORD{i+1:06d}',
+            'CustomerID': customer['CustomerID'],
+            'OrderDateTime': order_datetime,
+            'OrderHour': hour,
+            'IsWeekend': order_datetime.weekday() >= 5,
+            'NumItems': num_items,
+            'Subtotal': round(subtotal, 2),
+            'DeliveryFee': delivery_fee,
+            'Discount': discount,
+            'TotalAmount': total_amount,
+            'OrderStatus': random.choice(['Completed', 'Completed', 'Completed', 'Cancelled']),
+        })
+
+    df_sales = pd.DataFrame(orders)
+    customer_order_counts = df_sales.groupby('CustomerID').size()
+    df_sales['IsRepeatCustomer'] = df_sales['CustomerID'].map(lambda x: customer_order_counts[x] > 1)
+    return df_sales
+
+
+def generate_deliveries_legacy(df_sales):
+    """Original per-order delivery loop, kept only as the benchmark baseline"""
+    deliveries = []
+
+    for _, order in df_sales.iterrows():
+        if order['OrderStatus'] == 'Completed':
+            delivery_minutes = np.random.choice(
+                range(8, 26),
+                p=[0.05, 0.08, 0.12, 0.15, 0.18, 0.15, 0.12, 0.08, 0.04, 0.02,
+                   0.01, 0, 0, 0, 0, 0, 0, 0]
+            )
+            is_on_time = delivery_minutes <= 15
+            deliveries.append({
+                'DeliveryID': f'DEL{order["OrderID"][3:]}',
+                'OrderID': order['OrderID'],
+                'OrderDateTime': order['OrderDateTime'],
+                'DeliveryDateTime': order['OrderDateTime'] + timedelta(minutes=int(delivery_minutes)),
+                'DeliveryTimeMinutes': delivery_minutes,
+                'IsOnTime': is_on_time,
+                'DeliveryPartnerID': f'DP{random.randint(1, 50):03d}',
+                'DeliveryRating': random.choice([4, 4, 5, 5, 5, 3]) if is_on_time else random.choice([2, 3, 3, 4]),
+            })
+
+    return pd.DataFrame(deliveries)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def summarize(df_sales, num_orders):
+    """Distribution summary used to compare the two generators"""
+    return {
+        'kept_share': len(df_sales) / num_orders,
+        'weekend_share': df_sales['IsWeekend'].mean(),
+        'peak_hour_share': df_sales['OrderHour'].isin(gen.PEAK_HOURS).mean(),
+        'avg_items': df_sales['NumItems'].mean(),
+        'avg_subtotal': df_sales['Subtotal'].mean(),
+        'free_delivery_share': (df_sales['DeliveryFee'] == 0).mean(),
+        'avg_discount': df_sales['Discount'].mean(),
+        'avg_order_value': df_sales['TotalAmount'].mean(),
+        'cancelled_share': (df_sales['OrderStatus'] == 'Cancelled').mean(),
+    }
+
+
+def summarize_deliveries(df_deliveries, df_sales):
+    """Distribution summary used to compare the two delivery generators"""
+    on_time = df_deliveries['IsOnTime'].astype(bool)
+    return {
+        'delivered_share': len(df_deliveries) / len(df_sales),
+        'avg_minutes': df_deliveries['DeliveryTimeMinutes'].mean(),
+        'on_time_share': on_time.mean(),
+        'avg_rating_on_time': df_deliveries.loc[on_time, 'DeliveryRating'].mean(),
+        'avg_rating_late': df_deliveries.loc[~on_time, 'DeliveryRating'].mean(),
+        'partners_used': df_deliveries['DeliveryPartnerID'].nunique(),
+    }
+
+
+def time_call(func, *args):
+    """Run func once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legacy-orders', type=int, default=5000,
+                        help='orders generated by the row-by-row baseline')
+    parser.add_argument('--orders', type=int, nargs='+', default=[20000, 1000000],
+                        help='order counts generated by the batched engine')
+    args = parser.parse_args()
+
+    df_customers = gen.generate_customers(gen.NUM_CUSTOMERS)
+    df_products = gen.generate_products(gen.NUM_PRODUCTS)
+
+    df_legacy, legacy_seconds = time_call(generate_sales_legacy, args.legacy_orders, df_customers, df_products)
+    results = [('legacy loop', args.legacy_orders, legacy_seconds, summarize(df_legacy, args.legacy_orders))]
+
+    df_deliveries, seconds = time_call(generate_deliveries_legacy, df_legacy)
+    delivery_results = [('legacy loop', len(df_legacy), seconds, summarize_deliveries(df_deliveries, df_legacy))]
+
+    for num_orders in args.orders:
+        df_sales, seconds = time_call(gen.generate_sales, num_orders, df_customers, df_products)
+        results.append(('batched numpy', num_orders, seconds, summarize(df_sales, num_orders)))
+        df_deliveries, seconds = time_call(gen.generate_deliveries, df_sales)
+        delivery_results.append(('batched numpy', len(df_sales), seconds,
+                                 summarize_deliveries(df_deliveries, df_sales)))
+
+    print("\n" + "="*70)
+    print("GENERATE_SALES THROUGHPUT")
+    print("="*70)
+    print(f"{'engine':<15}{'orders':>12}{'seconds':>10}{'orders/sec':>14}")
+    for engine, num_orders, seconds, _ in results:
+        print(f"{engine:<15}{num_orders:>12,}{seconds:>10.2f}{num_orders / seconds:>14,.0f}")
+
+    print("\n" + "="*70)
+    print("GENERATE_DELIVERIES THROUGHPUT")
+    print("="*70)
+    print(f"{'engine':<15}{'orders':>12}{'seconds':>10}{'orders/sec':>14}")
+    for engine, num_orders, seconds, _ in delivery_results:
+        print(f"{engine:<15}{num_orders:>12,}{seconds:>10.2f}{num_orders / seconds:>14,.0f}")
+
+    print("\n" + "="*70)
+    print("DISTRIBUTION CHECK (legacy vs batched)")
+    print("="*70)
+    for legacy_stats, batched_stats in [(results[0][3], results[-1][3]),
+                                        (delivery_results[0][3], delivery_results[-1][3])]:
+        for key in legacy_stats:
+            print(f"{key:<22}{legacy_stats[key]:>12.3f}{batched_stats[key]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
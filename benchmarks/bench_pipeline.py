@@ -0,0 +1,283 @@
+"""
+Blinkit Analysis Dashboard - Pipeline Scale Benchmark
+Runs data_generation.py and data_cleaning.py at several scale factors and
+storage formats, records generation and cleaning throughput, master-join time,
+file sizes and peak memory in a history file, and fails when a run is slower
+or larger than the previous runs on the same machine by more than a threshold
+
+Usage:
+    python benchmarks/bench_pipeline.py [--scales 1 10] [--formats csv parquet]
+                                        [--threshold 0.25] [--history benchmarks/results/pipeline_history.csv]
+    python benchmarks/bench_pipeline.py --scales 100 1000 --formats parquet --workers 4
+    python benchmarks/bench_pipeline.py --check-reproducible [--formats csv]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import data_generation as gen  # noqa: E402
+from instrumentation import METRICS_DIR  # noqa: E402
+from pipeline import dataset_files, file_digest  # noqa: E402
+from storage import FORMATS  # noqa: E402
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'pipeline_history.csv')
+RAW_TABLES = ['customer_data', 'product_data', 'sales_data', 'delivery_data', 'order_items']
+HISTORY_COLUMNS = ['run_id', 'started_at', 'commit', 'host', 'scale', 'format', 'mode', 'orders',
+                   'generation_seconds', 'generation_orders_per_second', 'generation_peak_mb',
+                   'cleaning_seconds', 'cleaning_rows_per_second', 'cleaning_peak_mb',
+                   'master_join_seconds', 'raw_mb', 'processed_mb']
+
+# Allowed increase over the baseline (median of the previous runs with the same host, scale, format and mode)
+REGRESSION_THRESHOLDS = {
+    'generation_seconds': 0.25,
+    'cleaning_seconds': 0.25,
+    'master_join_seconds': 0.25,
+    'generation_peak_mb': 0.25,
+    'cleaning_peak_mb': 0.25,
+    'raw_mb': 0.10,
+    'processed_mb': 0.10,
+}
+NOISE_SECONDS = 0.5  # timing differences below this are never a regression
+BASELINE_RUNS = 5
+
+# ============================================================================
+# RUNNING THE SCRIPTS
+# ============================================================================
+
+def run_script(script, args, directory):
+    """Run a pipeline script in directory; returns (seconds, peak MB of it and its workers)"""
+    log_path = os.path.join(directory, script.replace('.py', '.log'))
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, script), *args],
+                                   cwd=directory, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports the peak RSS of this child, including the worker processes it waited for
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} {' '.join(args)} failed (exit {process.returncode}), see {log_path}")
+    return seconds, usage.ru_maxrss / 1e3  # Linux reports KB
+
+
+def directory_mb(path):
+    """MB on disk under path, skipping bookkeeping folders such as _metrics and _state"""
+    total = 0
+    for root, directories, names in os.walk(path):
+        directories[:] = [name for name in directories if not name.startswith('_')]
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total / 1e6
+
+
+def load_metrics(directory, script):
+    """Step metrics written by a script run (see instrumentation.py), keyed by step"""
+    with open(os.path.join(directory, METRICS_DIR, f'{script}.json')) as f:
+        report = json.load(f)
+    return {step['step']: step for step in report['steps']}
+
+
+def bench_run(scale, fmt, workdir, shard_size, workers, keep=False):
+    """Generate and clean one dataset; returns its history record"""
+    directory = os.path.join(workdir, f'scale{scale}_{fmt}')
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+    _, _, num_orders = gen.scaled_sizes(scale)
+    sharded = num_orders > shard_size
+    generate_args = ['--scale', str(scale), '--format', fmt]
+    clean_args = ['--format', fmt]
+    if sharded:
+        generate_args += ['--shard-size', str(shard_size)] + (['--workers', str(workers)] if workers else [])
+        clean_args += ['--streaming']
+
+    generation_seconds, generation_peak_mb = run_script('data_generation.py', generate_args, directory)
+    cleaning_seconds, cleaning_peak_mb = run_script('data_cleaning.py', clean_args, directory)
+
+    steps = load_metrics(directory, 'data_cleaning')
+    orders = steps['read sales_data']['rows']
+    raw_rows = sum(steps[f'read {table}']['rows'] for table in RAW_TABLES if f'read {table}' in steps)
+    record = {
+        'scale': scale,
+        'format': fmt,
+        'mode': 'sharded+streaming' if sharded else 'batch',
+        'orders': orders,
+        'generation_seconds': round(generation_seconds, 3),
+        'generation_orders_per_second': round(orders / generation_seconds),
+        'generation_peak_mb': round(generation_peak_mb, 1),
+        'cleaning_seconds': round(cleaning_seconds, 3),
+        'cleaning_rows_per_second': round(raw_rows / cleaning_seconds),
+        'cleaning_peak_mb': round(cleaning_peak_mb, 1),
+        'master_join_seconds': round(steps['build_master']['seconds'], 3),
+        'raw_mb': round(directory_mb(os.path.join(directory, 'data/raw')), 2),
+        'processed_mb': round(directory_mb(os.path.join(directory, 'data/processed')), 2),
+    }
+    if not keep:
+        shutil.rmtree(directory)
+    return record
+
+def raw_digests(directory):
+    """Content hash of every raw file under directory, keyed by its path relative to directory"""
+    digests = {}
+    for table in RAW_TABLES:
+        for path in dataset_files(os.path.join(directory, 'data/raw', table)):
+            digests[os.path.relpath(path, directory)] = file_digest(path, {})
+    return digests
+
+
+def check_reproducible(fmt, workdir, seed=gen.SEED):
+    """Run the pipeline's generate stage twice with the same seed; messages for raw files that differ"""
+    generate_args = ['--generate', '--force', 'generate', '--format', fmt, '--seed', str(seed)]
+    digests = []
+    for attempt in range(2):
+        directory = os.path.join(workdir, f'reproducible_{fmt}_{attempt}')
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        run_script('pipeline.py', generate_args, directory)
+        digests.append(raw_digests(directory))
+        shutil.rmtree(directory)
+    first, second = digests
+    if not first:
+        return [f"{fmt}: the generate stage wrote no raw files"]
+    return [f"{fmt}: {path} differs between two runs with seed {seed}"
+            for path in sorted(first.keys() | second.keys()) if first.get(path) != second.get(path)]
+
+# ============================================================================
+# HISTORY AND REGRESSIONS
+# ============================================================================
+
+def git_commit():
+    """Short hash of the checked-out commit, or '' outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def load_history(path):
+    """Previous benchmark records (empty when there are none)"""
+    if not os.path.isfile(path):
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return pd.read_csv(path)
+
+
+def find_regressions(record, df_history, thresholds, noise_seconds=NOISE_SECONDS):
+    """Messages for the measures of record above their baseline by more than the threshold"""
+    df_same = df_history[(df_history['host'] == record['host']) & (df_history['scale'] == record['scale'])
+                         & (df_history['format'] == record['format']) & (df_history['mode'] == record['mode'])]
+    if df_same.empty:
+        return []
+    baseline = df_same.tail(BASELINE_RUNS)[list(thresholds)].median()
+    regressions = []
+    for measure, threshold in thresholds.items():
+        value, limit = record[measure], baseline[measure] * (1 + threshold)
+        if measure.endswith('_seconds'):
+            limit = max(limit, baseline[measure] + noise_seconds)
+        if value > limit:
+            regressions.append(f"{record['scale']}x {record['format']}: {measure} {value:,.2f} "
+                               f"vs baseline {baseline[measure]:,.2f} (limit {limit:,.2f})")
+    return regressions
+
+
+def save_history(records, path):
+    """Append this run's records to the history file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pd.DataFrame(records, columns=HISTORY_COLUMNS).to_csv(path, mode='a', header=not os.path.isfile(path),
+                                                          index=False)
+
+
+def print_results(records):
+    """Print one line per scale and format"""
+    print("\n" + "="*100)
+    print("PIPELINE BENCHMARK")
+    print("="*100)
+    print(f"{'scale':>6} {'format':<8}{'orders':>12}{'gen orders/s':>14}{'gen MB':>8}{'clean rows/s':>14}"
+          f"{'clean MB':>10}{'join (s)':>10}{'raw MB':>9}{'out MB':>9}")
+    for r in records:
+        print(f"{str(r['scale']) + 'x':>6} {r['format']:<8}{r['orders']:>12,}{r['generation_orders_per_second']:>14,}"
+              f"{r['generation_peak_mb']:>8.0f}{r['cleaning_rows_per_second']:>14,}{r['cleaning_peak_mb']:>10.0f}"
+              f"{r['master_join_seconds']:>10.2f}{r['raw_mb']:>9.1f}{r['processed_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=gen.SCALE_FACTORS[:2],
+                        help=f'multiples of the default dataset size (up to {gen.SCALE_FACTORS[-1]})')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='allowed increase over the baseline for every measure (default: per measure)')
+    parser.add_argument('--history', default=HISTORY_PATH, help='CSV file the results are appended to')
+    parser.add_argument('--no-save', action='store_true', help='compare against the history without adding to it')
+    parser.add_argument('--shard-size', type=int, default=gen.SHARD_SIZE,
+                        help='larger datasets are generated in shards and cleaned with --streaming')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for sharded generation')
+    parser.add_argument('--workdir', default='/tmp/blinkit_bench_pipeline', help='scratch directory')
+    parser.add_argument('--keep', action='store_true', help='keep the generated data in the workdir')
+    parser.add_argument('--check-reproducible', action='store_true',
+                        help='only check that two pipeline generate runs write byte-identical raw files')
+    args = parser.parse_args()
+
+    if args.check_reproducible:
+        differences = []
+        for fmt in args.formats:
+            print(f"Generating {fmt} twice through the pipeline...")
+            try:
+                differences += check_reproducible(fmt, args.workdir)
+            except RuntimeError as e:
+                print(f"❌ Error: {e}")
+                exit(1)
+        if differences:
+            print("\n❌ Raw data is not reproducible:")
+            for message in differences:
+                print(f"  - {message}")
+            exit(1)
+        print("\n✅ Raw data is byte-identical across runs")
+        return
+
+    thresholds = ({measure: args.threshold for measure in REGRESSION_THRESHOLDS} if args.threshold is not None
+                  else REGRESSION_THRESHOLDS)
+    df_history = load_history(args.history)
+    run_info = {
+        'run_id': time.strftime('%Y%m%d-%H%M%S'),
+        'started_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'host': platform.node(),
+    }
+
+    records, regressions = [], []
+    for scale in args.scales:
+        for fmt in args.formats:
+            print(f"Running {scale}x ({gen.scaled_sizes(scale)[2]:,} orders) as {fmt}...")
+            try:
+                record = {**run_info, **bench_run(scale, fmt, args.workdir, args.shard_size, args.workers, args.keep)}
+            except RuntimeError as e:
+                print(f"❌ Error: {e}")
+                exit(1)
+            records.append(record)
+            regressions += find_regressions(record, df_history, thresholds)
+
+    print_results(records)
+    if not args.no_save:
+        save_history(records, args.history)
+        print(f"\nResults appended to {args.history}")
+    if regressions:
+        print("\n❌ Regressions against the previous runs:")
+        for message in regressions:
+            print(f"  - {message}")
+        exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Blinkit Analysis Dashboard - Data Quality Benchmark
+Runs the validation rules of data_quality.py over generated tables in chunks,
+with defects injected at a known rate, and reports rows/sec per table and
+whether every injected defect was quarantined
+
+Usage:
+    python benchmarks/bench_quality.py [--orders 2000000] [--chunk-size 500000]
+                                       [--defect-rate 0.001] [--csv-datetimes]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import data_generation as gen  # noqa: E402
+from data_cleaning import SeenIdSet, key_set  # noqa: E402
+from data_quality import Validator  # noqa: E402
+
+TARGET_ROWS_PER_SECOND = 1_000_000
+
+
+def inject_defects(df_sales, df_deliveries, rate, seed=42):
+    """Unbalanced and malformed order totals, and deliveries before their order; returns the number of defects"""
+    rng = np.random.default_rng(seed)
+    draws = rng.random(len(df_sales))
+    bad_sales = draws < rate
+    df_sales.loc[bad_sales, 'TotalAmount'] += 1.0
+    # A cell that is not a number turns the whole column into text, as when read from CSV
+    malformed = (draws >= rate) & (draws < 2 * rate)
+    df_sales['TotalAmount'] = df_sales['TotalAmount'].astype(str)
+    df_sales.loc[malformed, 'TotalAmount'] = 'abc'
+    bad_sales |= malformed
+    bad_deliveries = rng.random(len(df_deliveries)) < rate
+    df_deliveries.loc[bad_deliveries, 'DeliveryDateTime'] = (
+        df_deliveries.loc[bad_deliveries, 'OrderDateTime'] - pd.Timedelta(hours=1))
+    return int(bad_sales.sum()), int(bad_deliveries.sum())
+
+
+def validate_chunks(validator, df, table, chunk_size, kept_ids=None, text_columns=None):
+    """Validate df chunk by chunk, adding the OrderIDs kept to kept_ids when given; returns the rows kept.
+
+    Numeric rule columns the validator returned as text are added to text_columns when given.
+    """
+    numeric = [column for rule in validator.rules[table] if rule.numeric for column in rule.columns]
+    kept = 0
+    for start in range(0, len(df), chunk_size):
+        df_kept = validator.validate(df.iloc[start:start + chunk_size], table)
+        kept += len(df_kept)
+        if kept_ids is not None:
+            kept_ids.add(df_kept['OrderID'])
+        if text_columns is not None:
+            text_columns.update(f'{table}.{column}' for column in numeric
+                                if not pd.api.types.is_numeric_dtype(df_kept[column]))
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2_000_000)
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    parser.add_argument('--defect-rate', type=float, default=0.001)
+    parser.add_argument('--csv-datetimes', action='store_true',
+                        help='pass datetimes as text, as read from CSV (parsing is then part of validation)')
+    args = parser.parse_args()
+
+    print(f"Generating {args.orders:,} orders...")
+    df_customers = gen.generate_customers(gen.NUM_CUSTOMERS)
+    df_products = gen.generate_products(gen.NUM_PRODUCTS)
+    df_sales, df_items = gen.generate_sales(args.orders, df_customers, df_products, return_items=True)
+    df_deliveries = gen.generate_deliveries(df_sales, verbose=False)
+    bad_sales, bad_deliveries = inject_defects(df_sales, df_deliveries, args.defect_rate)
+    if args.csv_datetimes:
+        for df in [df_sales, df_deliveries]:
+            for column in ['OrderDateTime', 'OrderDate', 'DeliveryDateTime']:
+                if column in df.columns:
+                    df[column] = df[column].astype(str)
+
+    with tempfile.TemporaryDirectory() as directory:
+        validator = Validator(rejects_dir=directory)
+        validator.key_sets['customers'] = key_set(df_customers['CustomerID'], 'CUST')
+        validator.key_sets['products'] = key_set(df_products['ProductID'], 'PROD')
+        validator.key_sets['orders'] = SeenIdSet('ORD')  # orders kept so far
+
+        start = time.perf_counter()
+        text_columns = set()
+        kept_sales = validate_chunks(validator, df_sales, 'sales_data', args.chunk_size, validator.key_sets['orders'],
+                                     text_columns)
+        validate_chunks(validator, df_deliveries, 'delivery_data', args.chunk_size, text_columns=text_columns)
+        validate_chunks(validator, df_items, 'order_items', args.chunk_size, text_columns=text_columns)
+        elapsed = time.perf_counter() - start
+        report = validator.close(report_path=None)
+
+    print(f"\n{'table':<15}{'rows':>12}{'rejected':>10}{'seconds':>10}{'rows/sec':>14}")
+    for table, stats in report['tables'].items():
+        print(f"{table:<15}{stats['rows']:>12,}{stats['rejected']:>10,}{stats['seconds']:>10.3f}"
+              f"{stats['rows_per_second']:>14,}")
+    rows_per_second = report['rows'] / elapsed
+    print(f"\nAll tables: {report['rows']:,} rows in {elapsed:.2f}s ({rows_per_second:,.0f} rows/sec, "
+          f"target {TARGET_ROWS_PER_SECOND:,})")
+
+    # Rejected orders also orphan their deliveries and order lines
+    rejected = {table: stats['rejected'] for table, stats in report['tables'].items()}
+    print(f"Injected defects: {bad_sales:,} orders, {bad_deliveries:,} deliveries")
+    print(f"Quarantined: {rejected['sales_data']:,} orders (kept {kept_sales:,}), "
+          f"{rejected['delivery_data']:,} deliveries, {rejected['order_items']:,} order lines")
+    caught = rejected['sales_data'] == bad_sales and rejected['delivery_data'] >= bad_deliveries
+    print("✓ Every injected defect was quarantined" if caught else "❌ Injected defects were missed")
+    if text_columns:
+        print(f"❌ Numeric columns kept as text: {', '.join(sorted(text_columns))}")
+    else:
+        print("✓ Numeric rule columns of the kept rows are numbers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Blinkit Analysis Dashboard - RFM Aggregation Benchmark
+Streams synthetic sales chunks through the chunked per-customer aggregation used
+by rfm_segmentation.py, reports orders/sec and peak memory, and checks the
+result against a single in-memory groupby where that fits
+
+Usage:
+    python benchmarks/bench_rfm.py [--customers 1000000] [--orders 20000000]
+                                   [--chunk-size 500000] [--reference-max-rows 5000000]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from rfm_segmentation import CustomerTotals, score_customers  # noqa: E402
+
+
+def sales_chunks(num_customers, num_orders, chunk_size, seed=42):
+    """Synthetic cleaned sales in OrderID order, one DataFrame per chunk"""
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64('2023-01-01')
+    for start in range(0, num_orders, chunk_size):
+        size = min(chunk_size, num_orders - start)
+        customers = rng.integers(1, num_customers + 1, size=size)
+        yield pd.DataFrame({
+            'OrderID': np.char.add('ORD', np.char.zfill(np.arange(start + 1, start + size + 1).astype(str), 6)),
+            'CustomerID': np.char.add('CUST', np.char.zfill(customers.astype(str), 5)),
+            'OrderDate': first_day + rng.integers(0, 730, size=size).astype('timedelta64[D]'),
+            'TotalAmount': rng.gamma(2.0, 400.0, size=size).round(2),
+        })
+
+
+def reference_totals(df_sales):
+    """Per-customer totals from one groupby over every order"""
+    df = df_sales.groupby('CustomerID').agg(
+        FirstOrderDate=('OrderDate', 'min'), LastOrderDate=('OrderDate', 'max'),
+        Frequency=('OrderID', 'size'), Monetary=('TotalAmount', 'sum'),
+    ).reset_index()
+    df['Monetary'] = df['Monetary'].round(2)
+    return df
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far (Linux reports KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=1_000_000)
+    parser.add_argument('--orders', type=int, default=20_000_000)
+    parser.add_argument('--chunk-size', type=int, default=500_000)
+    parser.add_argument('--reference-max-rows', type=int, default=5_000_000,
+                        help='skip the in-memory groupby check above this many orders')
+    args = parser.parse_args()
+
+    aggregate_seconds = 0.0
+    totals = CustomerTotals()
+    for chunk in sales_chunks(args.customers, args.orders, args.chunk_size):
+        start = time.perf_counter()
+        totals.add(chunk)
+        aggregate_seconds += time.perf_counter() - start
+    streaming_peak = peak_rss_mb()
+
+    start = time.perf_counter()
+    df_totals = totals.frame()
+    df_rfm = score_customers(df_totals, df_totals['LastOrderDate'].max())
+    score_seconds = time.perf_counter() - start
+    state_mb = sum(array.nbytes for array in [totals.orders, totals.revenue, totals.first_day, totals.last_day]) / 1e6
+
+    print("="*70)
+    print(f"RFM AGGREGATION ({args.orders:,} orders, {args.customers:,} customers)")
+    print("="*70)
+    print(f"Aggregation:   {aggregate_seconds:.2f}s ({args.orders / aggregate_seconds:,.0f} orders/sec)")
+    print(f"Scoring:       {score_seconds:.2f}s for {len(df_rfm):,} customers")
+    print(f"Totals arrays: {state_mb:.1f} MB")
+    print(f"Peak RSS:      {streaming_peak:,.0f} MB (one chunk in memory at a time)")
+
+    if args.orders > args.reference_max_rows:
+        print("\n  - Skipped the in-memory groupby check (raise --reference-max-rows to run it)")
+        return
+    df_sales = pd.concat(sales_chunks(args.customers, args.orders, args.chunk_size), ignore_index=True)
+    start = time.perf_counter()
+    df_expected = reference_totals(df_sales)
+    print(f"\nIn-memory groupby: {time.perf_counter() - start:.2f}s over {len(df_sales):,} rows held at once "
+          f"(peak RSS {peak_rss_mb():,.0f} MB)")
+    try:
+        pd.testing.assert_frame_equal(df_totals.sort_values('CustomerID', ignore_index=True), df_expected,
+                                      check_dtype=False)
+    except AssertionError as e:
+        print(f"\n❌ Chunked totals differ from the in-memory groupby: {e}")
+        sys.exit(1)
+    print("✅ Chunked totals match the in-memory groupby")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Blinkit Analysis Dashboard - Storage Format Benchmark
+Compares file size and load time of CSV and Parquet for the cleaning stage
+inputs (data/raw) and the Power BI import set (data/processed)
+
+Usage:
+    python benchmarks/bench_storage.py [--orders 200000] [--workdir /tmp/blinkit_bench_storage]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import data_cleaning as cleaning  # noqa: E402
+import data_generation as gen  # noqa: E402
+from storage import FORMATS, PARTITION_COLUMNS, read_dataset, write_dataset  # noqa: E402
+
+
+def dataset_size(path):
+    """Bytes on disk of a file or a dataset directory"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def time_load(stem, fmt):
+    """Seconds to load a dataset, including datetime parsing for CSV"""
+    start = time.perf_counter()
+    df = read_dataset(stem, fmt)
+    for column in ['OrderDateTime', 'OrderDate', 'DeliveryDateTime', 'RegistrationDate']:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return time.perf_counter() - start
+
+
+def build_tables(num_orders):
+    """Generate and clean one dataset in memory"""
+    df_customers = gen.generate_customers(gen.NUM_CUSTOMERS)
+    df_products = gen.generate_products(gen.NUM_PRODUCTS)
+    df_sales, df_order_items = gen.generate_sales(num_orders, df_customers, df_products, return_items=True)
+    df_deliveries = gen.generate_deliveries(df_sales)
+    raw = {
+        'customer_data': df_customers,
+        'product_data': df_products,
+        'sales_data': df_sales,
+        'delivery_data': df_deliveries,
+        'order_items': df_order_items,
+    }
+
+    customers_clean, products_clean = cleaning.clean_customers(df_customers.copy()), cleaning.clean_products(df_products)
+    sales_clean = cleaning.clean_sales(cleaning.drop_duplicate_ids(df_sales.copy(), 'OrderID'))
+    deliveries_clean = cleaning.clean_deliveries(cleaning.drop_duplicate_ids(df_deliveries.copy(), 'DeliveryID'))
+    order_items_clean = cleaning.clean_order_items(df_order_items, sales_clean['OrderID'],
+                                                   cleaning.product_id_lookup(products_clean))
+    processed = {
+        'customers_clean': customers_clean,
+        'products_clean': products_clean,
+        'sales_clean': sales_clean,
+        'deliveries_clean': deliveries_clean,
+        'order_items_clean': order_items_clean,
+        'master_dataset': cleaning.build_master(sales_clean, deliveries_clean, customers_clean),
+    }
+    return raw, processed
+
+
+def measure(tables, directory, fmt, partition=False):
+    """Write tables in one format and return (total bytes, total load seconds)"""
+    os.makedirs(directory, exist_ok=True)
+    total_bytes, total_seconds = 0, 0.0
+    for name, df in tables.items():
+        stem = os.path.join(directory, name)
+        partition_cols = PARTITION_COLUMNS if partition and 'Year' in df.columns else None
+        path = write_dataset(df, stem, fmt, partition_cols)
+        total_bytes += dataset_size(path)
+        total_seconds += time_load(stem, fmt)
+    return total_bytes, total_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=200000, help='orders to generate')
+    parser.add_argument('--workdir', default='/tmp/blinkit_bench_storage', help='scratch directory')
+    args = parser.parse_args()
+
+    raw, processed = build_tables(args.orders)
+
+    runs = [(fmt, False) for fmt in FORMATS] + [('parquet', True)]
+    rows = []
+    for label, tables in [('cleaning inputs', raw), ('Power BI import set', processed)]:
+        for fmt, partition in runs:
+            if partition and label == 'cleaning inputs':
+                continue
+            name = f'{fmt} (Year/Month)' if partition else fmt
+            directory = os.path.join(args.workdir, label.replace(' ', '_'), fmt + ('_partitioned' if partition else ''))
+            size, seconds = measure(tables, directory, fmt, partition)
+            rows.append((label, name, size, seconds))
+
+    print("\n" + "="*70)
+    print(f"STORAGE FORMATS ({args.orders:,} orders)")
+    print("="*70)
+    print(f"{'dataset':<22}{'format':<22}{'size (MB)':>12}{'load (s)':>12}")
+    for label, name, size, seconds in rows:
+        print(f"{label:<22}{name:<22}{size / 1e6:>12.1f}{seconds:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Blinkit Analysis Dashboard - Transform Micro-Benchmarks
+Times the vectorized StockStatus, TimeSegment and IsRepeatCustomer transforms
+against the original row-wise versions at 1e5, 1e6 and 1e7 rows, checks the
+labels match, and fails when a vectorized transform exceeds its time budget
+
+Usage:
+    python benchmarks/bench_transforms.py [--sizes 100000 1000000 10000000]
+                                          [--legacy-max-rows 1000000] [--budget-ns-per-row 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from data_cleaning import stock_status, time_segment  # noqa: E402
+
+
+# ============================================================================
+# ROW-WISE REFERENCE IMPLEMENTATIONS
+# ============================================================================
+
+def stock_status_legacy(df_products):
+    return df_products.apply(
+        lambda x: 'Out of Stock' if x['StockQuantity'] == 0
+        else 'Low Stock' if x['StockQuantity'] < x['MinStockLevel']
+        else 'In Stock',
+        axis=1
+    )
+
+
+def time_segment_legacy(df_sales):
+    return df_sales['OrderHour'].apply(
+        lambda x: 'Morning' if 6 <= x < 12
+        else 'Afternoon' if 12 <= x < 17
+        else 'Evening' if 17 <= x < 21
+        else 'Night'
+    )
+
+
+def repeat_customer_legacy(df_sales):
+    customer_order_counts = df_sales.groupby('CustomerID').size()
+    return df_sales['CustomerID'].map(lambda x: customer_order_counts[x] > 1)
+
+# ============================================================================
+# VECTORIZED IMPLEMENTATIONS
+# ============================================================================
+
+def stock_status_vectorized(df_products):
+    return stock_status(df_products['StockQuantity'], df_products['MinStockLevel'])
+
+
+def time_segment_vectorized(df_sales):
+    return time_segment(df_sales['OrderHour'])
+
+
+def repeat_customer_vectorized(df_sales):
+    codes, _ = pd.factorize(df_sales['CustomerID'])
+    return np.bincount(codes)[codes] > 1
+
+
+TRANSFORMS = [
+    ('StockStatus', 'products', stock_status_legacy, stock_status_vectorized),
+    ('TimeSegment', 'sales', time_segment_legacy, time_segment_vectorized),
+    ('IsRepeatCustomer', 'sales', repeat_customer_legacy, repeat_customer_vectorized),
+]
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def make_frames(num_rows, seed=42):
+    """Synthetic product and sales columns with realistic value ranges"""
+    rng = np.random.default_rng(seed)
+    df_products = pd.DataFrame({
+        'StockQuantity': rng.integers(0, 1000, size=num_rows),
+        'MinStockLevel': rng.integers(20, 100, size=num_rows),
+    })
+    num_customers = max(num_rows // 4, 1)
+    df_sales = pd.DataFrame({
+        'OrderHour': rng.integers(0, 24, size=num_rows),
+        'CustomerID': pd.Series(rng.integers(1, num_customers + 1, size=num_rows)).map('CUST{:05d}'.format),
+    })
+    return {'products': df_products, 'sales': df_sales}
+
+
+def best_of(func, df, repeats):
+    """Fastest of several runs, with the last result"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--legacy-max-rows', type=int, default=1_000_000,
+                        help='skip the row-wise versions above this size')
+    parser.add_argument('--budget-ns-per-row', type=float, default=500.0,
+                        help='fail when a vectorized transform is slower than this')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'transform':<18}{'rows':>12}{'row-wise (s)':>14}{'vectorized (s)':>16}{'speedup':>10}{'ns/row':>9}")
+    failures = []
+    for num_rows in args.sizes:
+        frames = make_frames(num_rows)
+        for name, table, legacy, vectorized in TRANSFORMS:
+            df = frames[table]
+            fast_result, fast_seconds = best_of(vectorized, df, args.repeats)
+            ns_per_row = fast_seconds / num_rows * 1e9
+
+            legacy_column, speedup = '-', '-'
+            if num_rows <= args.legacy_max_rows:
+                slow_result, slow_seconds = best_of(legacy, df, 1)
+                if not np.array_equal(np.asarray(slow_result, dtype=object), np.asarray(fast_result, dtype=object)):
+                    failures.append(f'{name} at {num_rows:,} rows: labels differ from the row-wise version')
+                legacy_column, speedup = f'{slow_seconds:.3f}', f'{slow_seconds / fast_seconds:.0f}x'
+
+            if ns_per_row > args.budget_ns_per_row:
+                failures.append(f'{name} at {num_rows:,} rows: {ns_per_row:.0f} ns/row over budget')
+            print(f"{name:<18}{num_rows:>12,}{legacy_column:>14}{fast_seconds:>16.3f}{speedup:>10}{ns_per_row:>9.0f}")
+
+    if failures:
+        print("\n❌ Regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n✅ All transforms match and are within budget")
+
+
+if __name__ == "__main__":
+    main()
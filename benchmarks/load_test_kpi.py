@@ -0,0 +1,123 @@
+"""
+Blinkit Analysis Dashboard - KPI API Load Test
+Fires a mix of filtered KPI queries at the query engine (in process, or over
+HTTP with --http) and reports p50/p99 latency for cache misses and hits
+
+Usage:
+    python benchmarks/load_test_kpi.py [--queries 5000] [--distinct 500] [--http --concurrency 8]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from kpi_api import KPIEngine, KPIRequestHandler, KPIServer  # noqa: E402
+
+HOUR_RANGES = ['7-9', '12-14', '19-21', '6-11', '17-20', '0-23']
+
+
+def make_filters(engine, distinct, seed=42):
+    """A pool of random filters over the loaded data's cities, segments, dates and hours"""
+    rng = np.random.default_rng(seed)
+    first_day, last_day = int(engine.days.min()), int(engine.days.max())
+    cities = [c for c in engine.cities if isinstance(c, str)]
+    segments = [s for s in engine.segments if isinstance(s, str)]
+    filters = []
+    for _ in range(distinct):
+        start = int(rng.integers(first_day, last_day + 1))
+        end = int(rng.integers(start, last_day + 1))
+        query = {
+            'start': str(np.datetime64(start, 'D')),
+            'end': str(np.datetime64(end, 'D')),
+        }
+        if rng.random() < 0.7:
+            query['city'] = ','.join(rng.choice(cities, size=int(rng.integers(1, 4)), replace=False))
+        if rng.random() < 0.4:
+            query['segment'] = str(rng.choice(segments))
+        if rng.random() < 0.3:
+            query['hour'] = str(rng.choice(HOUR_RANGES))
+        filters.append(query)
+    return filters
+
+
+def start_server(engine):
+    """Run the KPI HTTP server on a free local port in a background thread"""
+    KPIRequestHandler.engine = engine
+    server = KPIServer(('127.0.0.1', 0), KPIRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def percentiles(latencies):
+    """p50, p99 and max in milliseconds"""
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    values = np.array(latencies) * 1e3
+    return np.percentile(values, 50), np.percentile(values, 99), values.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=5000, help='queries to send')
+    parser.add_argument('--distinct', type=int, default=500, help='distinct filters in the query mix')
+    parser.add_argument('--http', action='store_true', help='query through the local HTTP server')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    parser.add_argument('--cache-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = KPIEngine(cache_size=args.cache_size)
+    print(f"✓ Loaded {engine.rows:,} orders in {time.perf_counter() - start:.2f}s")
+
+    pool = make_filters(engine, args.distinct)
+    rng = np.random.default_rng(7)
+    workload = [pool[i] for i in rng.integers(0, len(pool), size=args.queries)]
+
+    server, url = start_server(engine) if args.http else (None, None)
+    seen, seen_lock = set(), threading.Lock()
+
+    def run_query(query):
+        key = tuple(sorted(query.items()))
+        with seen_lock:
+            first = key not in seen
+            seen.add(key)
+        started = time.perf_counter()
+        if url:
+            with urlopen(f'{url}/kpis?{urlencode(query)}') as response:
+                response.read()
+        else:
+            engine.query(**query)
+        return first, time.perf_counter() - started
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(run_query, workload))
+    elapsed = time.perf_counter() - start
+    if server:
+        server.shutdown()
+
+    misses = [seconds for first, seconds in results if first]
+    hits = [seconds for first, seconds in results if not first]
+
+    print("\n" + "="*70)
+    print(f"KPI QUERY LATENCY ({'HTTP' if args.http else 'in process'}, {args.concurrency} client threads)")
+    print("="*70)
+    print(f"{'queries':<16}{'count':>10}{'p50 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}")
+    for label, latencies in [('cache miss', misses), ('cache hit', hits), ('all', misses + hits)]:
+        p50, p99, worst = percentiles(latencies)
+        print(f"{label:<16}{len(latencies):>10,}{p50:>12.3f}{p99:>12.3f}{worst:>12.3f}")
+    print(f"\nThroughput: {len(results) / elapsed:,.0f} queries/sec")
+    print(f"Cache: {engine.cache.info()}")
+
+
+if __name__ == "__main__":
+    main()
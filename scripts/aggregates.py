@@ -0,0 +1,98 @@
+"""
+Blinkit Analysis Dashboard - KPI Aggregates
+Pre-aggregated summary tables the dashboard can import instead of the order-level master dataset
+"""
+
+import pandas as pd
+import numpy as np
+
+from instrumentation import timed
+
+# ============================================================================
+# KPI CUBE
+# ============================================================================
+
+# One row per day x city x time segment x order status x customer segment.
+# Every measure is a sum, so cells can be added across chunks and runs.
+CUBE_DIMENSIONS = ['OrderDate', 'City', 'TimeSegment', 'OrderStatus', 'CustomerSegment']
+CUBE_MEASURES = ['Revenue', 'Orders', 'Items', 'Deliveries', 'DeliveryMinutes', 'OnTimeDeliveries', 'RatingSum']
+
+
+@timed
+def kpi_cube(df_master, delivery_only=False):
+    """Aggregate master dataset rows into KPI cube cells.
+
+    With delivery_only, the order measures are zero: used for deliveries
+    that arrive after their order was already counted.
+    """
+    delivered = df_master['DeliveryTimeMinutes'].notna()
+    order_weight = 0 if delivery_only else 1
+    measures = pd.DataFrame({
+        'Revenue': df_master['TotalAmount'] * order_weight,
+        'Orders': order_weight,
+        'Items': df_master['NumItems'] * order_weight,
+        'Deliveries': delivered.astype(np.int64),
+        'DeliveryMinutes': df_master['DeliveryTimeMinutes'].fillna(0),
+        'OnTimeDeliveries': df_master['IsOnTime'].astype('boolean').fillna(False).astype(np.int64),
+        'RatingSum': df_master['DeliveryRating'].fillna(0),
+    }, index=df_master.index)
+
+    keys = [pd.to_datetime(df_master['OrderDate']).dt.normalize()]
+    keys += [df_master[column] for column in CUBE_DIMENSIONS[1:]]
+    cube = measures.groupby(keys, observed=True, dropna=False, sort=False).sum()
+    return cube.reset_index()
+
+
+def combine_cubes(cubes):
+    """Add partial cubes cell by cell into one sorted cube"""
+    return _combine(cubes, CUBE_DIMENSIONS, CUBE_MEASURES, money=['Revenue'])
+
+# ============================================================================
+# PRODUCT x DAY ROLLUP
+# ============================================================================
+
+# Line revenue is at list price, before order-level discounts and delivery fees
+PRODUCT_DAY_DIMENSIONS = ['OrderDate', 'ProductID']
+PRODUCT_DAY_MEASURES = ['OrderLines', 'Quantity', 'Revenue', 'Cost', 'GrossProfit']
+
+
+@timed
+def product_day_rollup(df_lines):
+    """Aggregate order lines (with OrderDate and ProductID) into product x day revenue and margin"""
+    revenue = df_lines['Quantity'] * df_lines['UnitPrice']
+    cost = df_lines['Quantity'] * df_lines['UnitCost']
+    measures = pd.DataFrame({
+        'OrderLines': 1,
+        'Quantity': df_lines['Quantity'].astype(np.int64),
+        'Revenue': revenue,
+        'Cost': cost,
+        'GrossProfit': revenue - cost,
+    }, index=df_lines.index)
+
+    keys = [pd.to_datetime(df_lines['OrderDate']).dt.normalize(), df_lines['ProductID']]
+    return measures.groupby(keys, dropna=False, sort=False).sum().reset_index()
+
+
+def combine_product_days(rollups):
+    """Add partial product x day rollups into one sorted table"""
+    return _combine(rollups, PRODUCT_DAY_DIMENSIONS, PRODUCT_DAY_MEASURES, money=['Revenue', 'Cost', 'GrossProfit'])
+
+# ============================================================================
+# COMBINING PARTIAL AGGREGATES
+# ============================================================================
+
+def _combine(frames, dimensions, measures, money):
+    """Sum partial aggregates cell by cell; money columns are rounded, the rest are counts"""
+    frames = [frame for frame in frames if frame is not None and len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=dimensions + measures)
+
+    df = pd.concat(frames, ignore_index=True)
+    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    for column in dimensions[1:]:
+        df[column] = df[column].astype(object)
+    df = df.groupby(dimensions, dropna=False, sort=False)[measures].sum().reset_index()
+
+    for column in measures:
+        df[column] = df[column].round(2) if column in money else df[column].astype(np.int64)
+    return df.sort_values(dimensions, ignore_index=True)
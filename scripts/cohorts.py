@@ -0,0 +1,366 @@
+"""
+Blinkit Analysis Dashboard - Cohort Retention
+Groups customers into monthly cohorts (by first order or registration) and builds
+the cohort x month retention matrix and cumulative revenue (CLV) curves
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+from key_encoding import id_keys, MISSING_KEY
+from storage import FORMATS, dataset_manifest, file_partition, iter_file_chunks, read_dataset, write_dataset
+
+PROCESSED_DIR = 'data/processed'
+SALES_STEM = f'{PROCESSED_DIR}/sales_clean'
+STATE_PATH = f'{PROCESSED_DIR}/_state/cohort_state.npz'
+CHUNK_SIZE = 500_000
+MERGE_ROWS = 4_000_000  # customer-month rows buffered before they are merged
+SALES_COLUMNS = ['CustomerID', 'OrderDate', 'TotalAmount']
+COHORT_BASES = ['first-order', 'registration']
+MONTH_BITS = 16  # (customer, month) pairs are packed into one int64 sort key
+
+# ============================================================================
+# CUSTOMER x MONTH ACTIVITY
+# ============================================================================
+
+def month_numbers(dates):
+    """Months since January 1970 (NaT -> MISSING_KEY)"""
+    months = pd.to_datetime(dates).to_numpy().astype('datetime64[M]')
+    return np.where(np.isnat(months), MISSING_KEY, months.astype(np.int64))
+
+
+def partition_month(path):
+    """Month number of a sales file in a Year=/Month= partition folder, else None"""
+    partition = file_partition(path)
+    return None if partition is None else (partition[0] - 1970) * 12 + partition[1] - 1
+
+
+def pack_months(high, months):
+    """One int64 sort key per (high, month) pair; months must fit in MONTH_BITS"""
+    if len(months) and (months.min() < 0 or months.max() >= 1 << MONTH_BITS):
+        raise ValueError(f"Month values must lie in 0-{(1 << MONTH_BITS) - 1} to be packed into sort keys "
+                         f"(got {months.min()} to {months.max()})")
+    return (high << MONTH_BITS) | months
+
+
+def _reduce(keys, orders, revenue):
+    """Sum orders and revenue per distinct key; keys come back sorted"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return (unique_keys, np.bincount(inverse, orders, len(unique_keys)).astype(np.int64),
+            np.bincount(inverse, revenue, len(unique_keys)))
+
+
+class CustomerMonths:
+    """Orders and revenue per (customer, month) after a given month, reduced by sorting.
+    Memory grows with active customer-months, not orders."""
+
+    def __init__(self, after_month=MISSING_KEY):
+        self.after_month = after_month
+        self.rows_by_month = {}  # sales rows per month, including months up to after_month
+        self.files = {}  # partition file -> [size, modification time, rows]
+        self.files_read = 0
+        self._parts = []
+        self._buffered = 0
+
+    def add(self, df_sales):
+        """Fold a chunk of cleaned sales into the customer-month totals"""
+        customers = id_keys(df_sales['CustomerID'].reset_index(drop=True), 'CUST', np.int64)
+        months = month_numbers(df_sales['OrderDate'])
+        valid = (customers != MISSING_KEY) & (months != MISSING_KEY)
+        for month, rows in zip(*np.unique(months[valid], return_counts=True)):
+            self.rows_by_month[int(month)] = self.rows_by_month.get(int(month), 0) + int(rows)
+
+        new = valid & (months > self.after_month)
+        keys = pack_months(customers[new], months[new])
+        amounts = pd.to_numeric(df_sales['TotalAmount']).fillna(0).to_numpy(dtype=float)[new]
+        self._parts.append(_reduce(keys, np.ones(len(keys)), amounts))
+        self._buffered += len(self._parts[-1][0])
+        if self._buffered > MERGE_ROWS:
+            self._merge()
+
+    def _merge(self):
+        """Reduce the buffered parts into one sorted part"""
+        if len(self._parts) > 1:
+            self._parts = [_reduce(*(np.concatenate(arrays) for arrays in zip(*self._parts)))]
+        self._buffered = len(self._parts[0][0]) if self._parts else 0
+
+    def arrays(self):
+        """(customer, month, orders, revenue) arrays sorted by customer, then month"""
+        self._merge()
+        keys, orders, revenue = self._parts[0] if self._parts else (np.zeros(0, np.int64),) * 2 + (np.zeros(0),)
+        return keys >> MONTH_BITS, keys & ((1 << MONTH_BITS) - 1), orders, revenue
+
+    def rows_through(self, month):
+        """Sales rows in months up to and including month"""
+        return sum(rows for m, rows in self.rows_by_month.items() if m <= month)
+
+    def rows(self):
+        """Sales rows with a customer and order date added so far"""
+        return sum(self.rows_by_month.values())
+
+# ============================================================================
+# COHORTS
+# ============================================================================
+
+def _grow(array, size, fill=MISSING_KEY):
+    """array padded with fill up to size"""
+    if size <= len(array):
+        return array
+    grown = np.full(size, fill, dtype=np.int64)
+    grown[:len(array)] = array
+    return grown
+
+
+def first_order_months(cohort_months, customers, months):
+    """Update each customer's first order month from (customer, month) pairs sorted by customer, then month"""
+    if not len(customers):
+        return cohort_months
+    starts = np.flatnonzero(np.r_[True, customers[1:] != customers[:-1]])
+    cohort_months = _grow(cohort_months, int(customers.max()) + 1)
+    known = cohort_months[customers[starts]]
+    first = months[starts]
+    cohort_months[customers[starts]] = np.where(known == MISSING_KEY, first, np.minimum(known, first))
+    return cohort_months
+
+
+def registration_months():
+    """Registration month per customer number, from the cleaned customer table"""
+    df_customers = read_dataset(f'{PROCESSED_DIR}/customers_clean', columns=['CustomerID', 'RegistrationDate'])
+    customers = id_keys(df_customers['CustomerID'], 'CUST', np.int64)
+    months = month_numbers(df_customers['RegistrationDate'])
+    present = customers != MISSING_KEY
+    cohort_months = _grow(np.zeros(0, np.int64), int(customers.max()) + 1 if present.any() else 0)
+    cohort_months[customers[present]] = months[present]
+    return cohort_months
+
+
+def cohort_cells(cohort_months, customers, months, orders, revenue):
+    """Active customers, orders and revenue per (cohort month, months since cohort).
+    Also returns the orders that fall before their customer's cohort month or outside any cohort."""
+    cohort_months = _grow(cohort_months, int(customers.max()) + 1 if len(customers) else 0)
+    cohorts = cohort_months[customers]
+    offsets = months - cohorts
+    inside = (cohorts != MISSING_KEY) & (offsets >= 0)  # orders before the cohort month have negative offsets
+    keys, inverse = np.unique(pack_months(cohorts[inside], offsets[inside]), return_inverse=True)
+    cells = pd.DataFrame({
+        'Cohort': keys >> MONTH_BITS,
+        'Offset': keys & ((1 << MONTH_BITS) - 1),
+        'ActiveCustomers': np.bincount(inverse, minlength=len(keys)),
+        'Orders': np.bincount(inverse, orders[inside], len(keys)).astype(np.int64),
+        'Revenue': np.bincount(inverse, revenue[inside], len(keys)),
+    })
+    return cells, int(orders[~inside].sum())
+
+
+def combine_cells(frames):
+    """Add cells from several runs (a cell only ever comes from one of them)"""
+    df = pd.concat([frame for frame in frames if frame is not None], ignore_index=True)
+    return df.groupby(['Cohort', 'Offset'], as_index=False).sum()
+
+# ============================================================================
+# RETENTION AND CLV TABLES
+# ============================================================================
+
+def _month_start(months):
+    """First day of each month number"""
+    return np.asarray(months, dtype=np.int64).astype('datetime64[M]').astype('datetime64[ns]')
+
+
+def retention_table(cells, cohort_sizes, last_month):
+    """Dense cohort x months-since-cohort table with retention % and cumulative revenue per customer"""
+    cohorts = np.array(sorted(c for c, size in cohort_sizes.items() if size and c <= last_month), dtype=np.int64)
+    lengths = last_month - cohorts + 1
+    cohort = np.repeat(cohorts, lengths)
+    offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    grid = pd.DataFrame({'Cohort': cohort, 'Offset': offset})
+    df = grid.merge(cells, on=['Cohort', 'Offset'], how='left').fillna(0)
+    df['CohortCustomers'] = df['Cohort'].map(cohort_sizes).astype(np.int64)
+    for column in ['ActiveCustomers', 'Orders']:
+        df[column] = df[column].astype(np.int64)
+
+    # Rows are sorted by cohort, then offset: cumulative sums restart at each cohort's first row
+    running = np.cumsum(df['Revenue'].to_numpy())
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    df['CumulativeRevenue'] = (running - np.r_[0, running][starts]).round(2)
+    df['Revenue'] = df['Revenue'].round(2)
+    df['RetentionPct'] = (df['ActiveCustomers'] / df['CohortCustomers'] * 100).round(2)
+    df['CLV'] = (df['CumulativeRevenue'] / df['CohortCustomers']).round(2)
+
+    df.insert(0, 'CohortMonth', _month_start(df.pop('Cohort')))
+    df = df.rename(columns={'Offset': 'MonthsSinceCohort'})
+    return df[['CohortMonth', 'MonthsSinceCohort', 'CohortCustomers', 'ActiveCustomers', 'RetentionPct',
+               'Orders', 'Revenue', 'CumulativeRevenue', 'CLV']]
+
+
+def clv_curve(df_retention):
+    """Retention and cumulative revenue per customer by months since cohort, over every cohort that
+    has reached that month (customer-weighted)"""
+    df = df_retention.groupby('MonthsSinceCohort', as_index=False).agg(
+        Cohorts=('CohortMonth', 'size'), CohortCustomers=('CohortCustomers', 'sum'),
+        ActiveCustomers=('ActiveCustomers', 'sum'), Revenue=('Revenue', 'sum'),
+        CumulativeRevenue=('CumulativeRevenue', 'sum'),
+    )
+    df['RetentionPct'] = (df['ActiveCustomers'] / df['CohortCustomers'] * 100).round(2)
+    df['CLV'] = (df['CumulativeRevenue'] / df['CohortCustomers']).round(2)
+    df['CumulativeRevenue'] = df['CumulativeRevenue'].round(2)
+    df['Revenue'] = df['Revenue'].round(2)
+    return df
+
+# ============================================================================
+# INCREMENTAL STATE
+# ============================================================================
+
+def load_state(basis):
+    """Cells of closed months, first order months and the rows they cover, or None"""
+    if not os.path.isfile(STATE_PATH):
+        return None
+    data = np.load(STATE_PATH)
+    if str(data['basis']) != basis:
+        return None
+    cells = pd.DataFrame({column: data[column] for column in ['Cohort', 'Offset', 'ActiveCustomers', 'Orders',
+                                                                'Revenue']})
+    files = json.loads(str(data['files'])) if 'files' in data.files else {}
+    return {'closed_month': int(data['closed_month']), 'closed_rows': int(data['closed_rows']),
+            'cohort_months': data['cohort_months'], 'cells': cells, 'files': files}
+
+
+def save_state(basis, closed_month, closed_rows, cohort_months, cells, files):
+    """Keep the cells of closed months and their partition files; the latest month stays open for
+    orders still arriving"""
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    closed = cells[cells['Cohort'] + cells['Offset'] <= closed_month]
+    closed_files = {path: info for path, info in files.items() if partition_month(path) <= closed_month}
+    np.savez(STATE_PATH, basis=basis, closed_month=closed_month, closed_rows=closed_rows,
+             cohort_months=cohort_months, files=json.dumps(closed_files),
+             **{column: closed[column].to_numpy() for column in closed.columns})
+
+
+def scan_sales(after_month, chunk_size=CHUNK_SIZE, known_files=None):
+    """Customer-month totals of the cleaned sales after after_month.
+
+    With Year/Month partitioned sales, files of months up to after_month that are
+    unchanged since known_files was recorded are not read: their rows are taken from
+    it. activity.files records [size, modification time, rows] per partition file.
+    """
+    activity = CustomerMonths(after_month)
+    known_files = known_files or {}
+    for path, info in dataset_manifest(SALES_STEM).items():
+        month, known = partition_month(path), known_files.get(path)
+        if month is not None and month <= after_month and known is not None and known[:2] == info:
+            activity.rows_by_month[month] = activity.rows_by_month.get(month, 0) + known[2]
+            activity.files[path] = known
+            continue
+        rows = activity.rows()
+        for chunk in iter_file_chunks(path, chunk_size, columns=SALES_COLUMNS):
+            activity.add(chunk)
+        activity.files_read += 1
+        if month is not None:
+            activity.files[path] = info + [activity.rows() - rows]
+    return activity
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def print_retention_matrix(df_retention, max_cohorts=12, max_months=6):
+    """Retention % of the latest cohorts over their first months"""
+    matrix = df_retention.pivot(index='CohortMonth', columns='MonthsSinceCohort', values='RetentionPct')
+    matrix = matrix.iloc[-max_cohorts:, :max_months]
+
+    print("\n" + "="*70)
+    print("RETENTION % BY COHORT (months since cohort)")
+    print("="*70)
+    print(f"{'cohort':<10}{'customers':>10}" + ''.join(f"{f'M{m}':>8}" for m in matrix.columns))
+    sizes = df_retention.groupby('CohortMonth')['CohortCustomers'].first()
+    for cohort, row in matrix.iterrows():
+        values = ''.join(f"{'':>8}" if np.isnan(value) else f"{value:>8.1f}" for value in row)
+        print(f"{cohort.strftime('%Y-%m'):<10}{sizes[cohort]:>10,}{values}")
+    print("="*70)
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run(storage_format='csv', chunk_size=CHUNK_SIZE, basis='first-order', incremental=False):
+    """Build the cohort retention and CLV tables, reusing closed months from the last incremental run"""
+    start = time.perf_counter()
+    state = load_state(basis) if incremental else None
+
+    print("\n[1/3] Collecting customer activity per month...")
+    activity = scan_sales(state['closed_month'] if state else MISSING_KEY, chunk_size,
+                          state['files'] if state else None)
+    if state and activity.rows_through(state['closed_month']) != state['closed_rows']:
+        print("  - Cleaned sales of closed months changed since the last run: rebuilding every month")
+        state = None
+        activity = scan_sales(MISSING_KEY, chunk_size)
+    if not activity.rows_by_month:
+        raise ValueError("No sales with a customer and order date to build cohorts from")
+    customers, months, orders, revenue = activity.arrays()
+    last_month = max(activity.rows_by_month)
+    if state:
+        print(f"✓ Reused months through {np.datetime64(state['closed_month'], 'M')}; "
+              f"{len(customers):,} customer-months recomputed from {activity.files_read} of "
+              f"{len(dataset_manifest(SALES_STEM))} sales files")
+    else:
+        print(f"✓ {len(customers):,} customer-months from {activity.rows_through(last_month):,} orders")
+
+    print("\n[2/3] Building cohorts...")
+    if basis == 'registration':
+        cohort_months = registration_months()
+    else:
+        cohort_months = first_order_months(state['cohort_months'] if state else np.zeros(0, np.int64),
+                                           customers, months)
+    cells, outside = cohort_cells(cohort_months, customers, months, orders, revenue)
+    cells = combine_cells([state['cells'] if state else None, cells])
+    assigned = cohort_months[cohort_months != MISSING_KEY]
+    cohort_sizes = dict(zip(*(values.tolist() for values in np.unique(assigned, return_counts=True))))
+    df_retention = retention_table(cells, cohort_sizes, last_month)
+    df_curve = clv_curve(df_retention)
+    print(f"✓ {df_retention['CohortMonth'].nunique()} cohorts by {basis} month, "
+          f"{df_curve['MonthsSinceCohort'].max() + 1} months of history")
+    if outside:
+        print(f"  - {outside:,} orders before their customer's cohort month or without one are not counted")
+
+    print("\n[3/3] Saving...")
+    for df, name in [(df_retention, 'cohort_retention'), (df_curve, 'clv_curve')]:
+        path = write_dataset(df, f'{PROCESSED_DIR}/{name}', storage_format)
+        print(f"✓ Saved: {path} ({len(df):,} rows)")
+    if incremental:
+        save_state(basis, last_month - 1, activity.rows_through(last_month - 1), cohort_months, cells,
+                   activity.files)
+
+    print_retention_matrix(df_retention)
+    print(f"\n✅ Cohort tables built in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Build Blinkit cohort retention and CLV tables')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the cohort tables')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='sales rows read at a time')
+    parser.add_argument('--cohort-by', choices=COHORT_BASES, default='first-order', dest='basis',
+                        help="cohort month: the customer's first order or their registration")
+    parser.add_argument('--incremental', action='store_true',
+                        help='recompute only the months after those closed by the last incremental run')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - COHORT RETENTION")
+    print("="*70)
+
+    try:
+        run(args.storage_format, args.chunk_size, args.basis, args.incremental)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Blinkit Analysis Dashboard - Columnar Store
+Append-only, memory-mapped copy of the cleaned sales and delivery fact tables:
+one fixed-width NumPy file per column, shared zero-copy by every process that
+opens it, with a catalog of category dictionaries and per-block min/max zone
+maps so filtered reads skip blocks without touching them
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import time
+
+from instrumentation import measure
+from storage import iter_dataset_chunks
+
+STORE_DIR = 'data/processed/columnar'
+PROCESSED_DIR = 'data/processed'
+CATALOG_FILE = 'catalog.json'
+BLOCK_ROWS = 65_536  # rows per zone-map block
+CHUNK_SIZE = 500_000  # rows read at a time when building from processed datasets
+
+# Fixed-width type of every column kind, and the value stored for missing values
+KIND_DTYPES = {
+    'timestamp': 'int64',  # nanoseconds since the epoch
+    'key': 'int32',  # number of a formatted ID such as ORD000123
+    'int': 'int32',
+    'amount': 'float64',
+    'category': 'uint8',  # code into the column's dictionary
+    'flag': 'uint8',
+}
+MISSING = {'timestamp': np.iinfo(np.int64).min, 'key': -1, 'int': -1, 'amount': np.nan, 'category': 255, 'flag': 0}
+MAX_CATEGORIES = 255  # code 255 marks a missing value
+ZONE_MAPPED = ['timestamp', 'key', 'int', 'amount', 'category']  # flags can be updated in place
+
+
+def _column(kind, source=None, prefix=None):
+    """Column spec; source is the cleaned dataset column it is encoded from"""
+    return {'kind': kind, 'source': source, 'prefix': prefix}
+
+
+# Columns of each table, by the dataset they are appended from
+SCHEMAS = {
+    'sales': {
+        'OrderKey': _column('key', 'OrderID', 'ORD'),
+        'CustomerKey': _column('key', 'CustomerID', 'CUST'),
+        'OrderDateTime': _column('timestamp'),
+        'OrderHour': _column('int'),
+        'NumItems': _column('int'),
+        'Subtotal': _column('amount'),
+        'DeliveryFee': _column('amount'),
+        'Discount': _column('amount'),
+        'TotalAmount': _column('amount'),
+        'IsWeekend': _column('flag'),
+        'IsRepeatCustomer': _column('flag'),
+        'DayOfWeek': _column('category'),
+        'PaymentMethod': _column('category'),
+        'OrderStatus': _column('category'),
+        'City': _column('category'),
+        'TimeSegment': _column('category'),
+        'OrderValueSegment': _column('category'),
+    },
+    'deliveries': {
+        'DeliveryKey': _column('key', 'DeliveryID', 'DEL'),
+        'OrderKey': _column('key', 'OrderID', 'ORD'),
+        'CustomerKey': _column('key', 'CustomerID', 'CUST'),
+        'DeliveryPartnerKey': _column('key', 'DeliveryPartnerID', 'DP'),
+        'OrderDateTime': _column('timestamp'),
+        'DeliveryDateTime': _column('timestamp'),
+        'DeliveryTimeMinutes': _column('int'),
+        'DeliveryRating': _column('int'),
+        'IsOnTime': _column('flag'),
+        'City': _column('category'),
+        'DeliveryStatus': _column('category'),
+        'DeliveryTimeSegment': _column('category'),
+        'RatingCategory': _column('category'),
+    },
+}
+DATASETS = {'sales': 'sales_clean', 'deliveries': 'deliveries_clean'}
+
+# Rows of every appended batch are sorted by these, so city and date filters skip blocks
+CLUSTER_BY = {'sales': ['City', 'OrderDateTime'], 'deliveries': ['City', 'OrderDateTime']}
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+def _id_keys(ids, prefix):
+    """Numbers of formatted IDs (missing where absent or malformed)"""
+    digits = pd.Series(ids).str.slice(len(prefix))
+    try:
+        return digits.astype(np.int32).to_numpy()  # fast path when every ID is well formed
+    except (TypeError, ValueError):
+        return pd.to_numeric(digits, errors='coerce').fillna(MISSING['key']).astype(np.int32).to_numpy()
+
+
+def encode_column(values, spec, dictionary=None):
+    """Fixed-width array of one column (new categories are appended to dictionary)"""
+    kind = spec['kind']
+    values = pd.Series(values).reset_index(drop=True)
+    if kind == 'timestamp':
+        return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    if kind == 'key':
+        return _id_keys(values, spec['prefix'])
+    if kind == 'int':
+        return pd.to_numeric(values).fillna(MISSING['int']).astype(np.int32).to_numpy()
+    if kind == 'amount':
+        return pd.to_numeric(values).to_numpy(dtype=np.float64, na_value=np.nan)
+    if kind == 'flag':
+        return values.fillna(False).astype(bool).to_numpy(dtype=np.uint8)
+
+    row_codes, uniques = pd.factorize(values)  # -1 where missing
+    uniques = [str(value) for value in uniques]
+    dictionary.extend(sorted(set(uniques) - set(dictionary)))
+    if len(dictionary) > MAX_CATEGORIES:
+        raise ValueError(f"Too many categories for a uint8 column ({len(dictionary)} > {MAX_CATEGORIES})")
+    lookup = np.append(pd.Index(dictionary).get_indexer(uniques), MISSING['category']).astype(np.uint8)
+    return lookup[row_codes]
+
+
+def decode_column(array, spec, dictionary=None):
+    """Values of a stored column as pandas types (datetimes, categoricals, booleans)"""
+    kind = spec['kind']
+    if kind == 'timestamp':
+        return pd.Series(np.asarray(array).view('datetime64[ns]'))
+    if kind == 'category':
+        codes = np.where(np.asarray(array) == MISSING['category'], -1, array)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=dictionary))
+    if kind == 'flag':
+        return pd.Series(np.asarray(array, dtype=bool))
+    return pd.Series(np.asarray(array))
+
+
+def _valid(values, kind):
+    """Mask of the values that are not the missing marker"""
+    if kind == 'amount':
+        return ~np.isnan(values)
+    return values != MISSING[kind]
+
+
+def filter_value(value, spec, dictionary=None):
+    """A filter bound or member in the stored encoding (None for unknown categories)"""
+    kind = spec['kind']
+    if kind == 'timestamp':
+        return pd.Timestamp(value).value
+    if kind == 'category':
+        return dictionary.index(value) if value in dictionary else None
+    if kind == 'key' and isinstance(value, str):
+        return int(_id_keys([value], spec['prefix'])[0])
+    return value
+
+# ============================================================================
+# CATALOG
+# ============================================================================
+
+def table_dir(table, store_dir=STORE_DIR):
+    """Folder holding the column files and catalog of a table"""
+    return os.path.join(store_dir, table)
+
+
+def load_catalog(table, store_dir=STORE_DIR):
+    """Catalog of a stored table, or None if it was never written"""
+    path = os.path.join(table_dir(table, store_dir), CATALOG_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _new_catalog(table):
+    """Catalog of an empty table"""
+    columns = {name: {**spec, 'dtype': KIND_DTYPES[spec['kind']]} for name, spec in SCHEMAS[table].items()}
+    return {
+        'table': table,
+        'rows': 0,
+        'block_rows': BLOCK_ROWS,
+        'columns': columns,
+        'dictionaries': {name: [] for name, spec in columns.items() if spec['kind'] == 'category'},
+        'zone_maps': {name: {'min': [], 'max': []} for name, spec in columns.items() if spec['kind'] in ZONE_MAPPED},
+    }
+
+
+def _save_catalog(catalog, store_dir=STORE_DIR):
+    """Replace the catalog atomically; readers never see rows it does not count"""
+    path = os.path.join(table_dir(catalog['table'], store_dir), CATALOG_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(catalog, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def _update_zone_map(zones, values, valid, rows_before, block_rows):
+    """Extend per-block min/max with appended values (the last block may be partly filled)"""
+    position, offset = 0, rows_before % block_rows
+    while position < len(values):
+        take = block_rows - offset
+        part = values[position:position + take][valid[position:position + take]]
+        low, high = (part.min().item(), part.max().item()) if len(part) else (None, None)
+        if offset and zones['min']:
+            old_low, old_high = zones['min'][-1], zones['max'][-1]
+            zones['min'][-1] = low if old_low is None else old_low if low is None else min(old_low, low)
+            zones['max'][-1] = high if old_high is None else old_high if high is None else max(old_high, high)
+        else:
+            zones['min'].append(low)
+            zones['max'].append(high)
+        position += take
+        offset = 0
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def reset_table(table, store_dir=STORE_DIR):
+    """Delete a stored table so the next append starts it again"""
+    shutil.rmtree(table_dir(table, store_dir), ignore_errors=True)
+
+
+def append_rows(df, table, store_dir=STORE_DIR):
+    """Encode cleaned rows and append them to a table's column files; returns the table's row count"""
+    with measure(f'append columnar {table}', rows=len(df)):
+        directory = table_dir(table, store_dir)
+        os.makedirs(directory, exist_ok=True)
+        catalog = load_catalog(table, store_dir) or _new_catalog(table)
+        rows = catalog['rows']
+        columns = catalog['columns']
+
+        arrays = {}
+        for name, spec in columns.items():
+            source = spec['source'] or name
+            arrays[name] = encode_column(df[source], spec, catalog['dictionaries'].get(name))
+        order = np.lexsort([arrays[name] for name in reversed(CLUSTER_BY[table])])
+
+        for name, spec in columns.items():
+            values = arrays[name][order]
+            path = os.path.join(directory, f'{name}.bin')
+            with open(path, 'ab') as f:
+                f.truncate(rows * values.itemsize)  # drop bytes of an append that never reached the catalog
+                f.write(values.tobytes())
+            if name in catalog['zone_maps']:
+                _update_zone_map(catalog['zone_maps'][name], values, _valid(values, spec['kind']), rows,
+                                 catalog['block_rows'])
+
+        catalog['rows'] = rows + len(df)
+        _save_catalog(catalog, store_dir)
+    return catalog['rows']
+
+
+def set_flag(table, column, key_column, keys, store_dir=STORE_DIR):
+    """Set a flag column in place on the rows whose key_column is in keys (e.g. IsRepeatCustomer)"""
+    store = ColumnStore(table, store_dir)
+    if store.rows == 0 or len(keys) == 0:
+        return 0
+    flags = np.memmap(os.path.join(store.directory, f'{column}.bin'), dtype=np.uint8, mode='r+', shape=(store.rows,))
+    key_values = store.column(key_column)
+    keys = np.asarray(keys)
+    changed = 0
+    for start in range(0, store.rows, store.block_rows):
+        mask = np.isin(key_values[start:start + store.block_rows], keys)
+        block = flags[start:start + store.block_rows]
+        changed += int((mask & (block == 0)).sum())
+        block[mask] = 1
+    flags.flush()
+    return changed
+
+
+def build_table(table, stem, chunk_size=CHUNK_SIZE, store_dir=STORE_DIR):
+    """Rebuild a stored table from a cleaned dataset; returns its row count"""
+    reset_table(table, store_dir)
+    rows = 0
+    columns = list(dict.fromkeys(spec['source'] or name for name, spec in SCHEMAS[table].items()))
+    for chunk in iter_dataset_chunks(stem, chunk_size, columns=columns):
+        rows = append_rows(chunk, table, store_dir)
+    return rows
+
+# ============================================================================
+# READING
+# ============================================================================
+
+class ColumnStore:
+    """Read-only view of a stored table; columns are memory-mapped, so processes share one copy"""
+
+    def __init__(self, table, store_dir=STORE_DIR):
+        catalog = load_catalog(table, store_dir)
+        if catalog is None:
+            raise FileNotFoundError(f"No columnar table '{table}' in {store_dir}")
+        self.table = table
+        self.directory = table_dir(table, store_dir)
+        self.catalog = catalog
+        self.rows = catalog['rows']
+        self.block_rows = catalog['block_rows']
+        self.columns = catalog['columns']
+        self.blocks_read = 0
+        self._maps = {}
+
+    @property
+    def num_blocks(self):
+        """Zone-map blocks in the table"""
+        return -(-self.rows // self.block_rows)
+
+    def column(self, name):
+        """Memory-mapped array of a column (nothing is read until it is indexed)"""
+        if name not in self._maps:
+            dtype = np.dtype(self.columns[name]['dtype'])
+            if self.rows == 0:
+                self._maps[name] = np.empty(0, dtype=dtype)
+            else:
+                self._maps[name] = np.memmap(os.path.join(self.directory, f'{name}.bin'), dtype=dtype, mode='r',
+                                             shape=(self.rows,))
+        return self._maps[name]
+
+    def _condition(self, name, condition):
+        """(low, high) range or list of members of a filter, in the stored encoding"""
+        spec = self.columns[name]
+        dictionary = self.catalog['dictionaries'].get(name)
+        if isinstance(condition, tuple):
+            low, high = condition
+            return 'range', (None if low is None else filter_value(low, spec, dictionary),
+                             None if high is None else filter_value(high, spec, dictionary))
+        members = [filter_value(value, spec, dictionary) for value in condition]
+        return 'members', np.array([member for member in members if member is not None])
+
+    def blocks(self, where=None):
+        """Indexes of the blocks whose zone maps allow rows matching every filter"""
+        keep = np.ones(self.num_blocks, dtype=bool)
+        for name, condition in (where or {}).items():
+            zones = self.catalog['zone_maps'].get(name)
+            if zones is None:
+                continue
+            low = np.array([np.nan if value is None else value for value in zones['min']], dtype=float)
+            high = np.array([np.nan if value is None else value for value in zones['max']], dtype=float)
+            mode, encoded = self._condition(name, condition)
+            if mode == 'range':
+                allowed = ~np.isnan(low)
+                if encoded[0] is not None:
+                    allowed &= high >= encoded[0]
+                if encoded[1] is not None:
+                    allowed &= low <= encoded[1]
+            else:
+                allowed = ((encoded[:, None] >= low) & (encoded[:, None] <= high)).any(axis=0) if len(encoded) \
+                    else np.zeros(self.num_blocks, dtype=bool)
+            keep &= allowed
+        return np.flatnonzero(keep)
+
+    def _matches(self, start, stop, where):
+        """Row mask of one block for every filter"""
+        mask = np.ones(stop - start, dtype=bool)
+        for name, condition in where.items():
+            values = self.column(name)[start:stop]
+            mode, encoded = self._condition(name, condition)
+            if mode == 'range':
+                valid = _valid(values, self.columns[name]['kind'])
+                mask &= valid if encoded[0] is None else valid & (values >= encoded[0])
+                if encoded[1] is not None:
+                    mask &= values <= encoded[1]
+            else:
+                mask &= np.isin(values, encoded)
+        return mask
+
+    def select(self, columns=None, where=None):
+        """Rows matching every filter as a DataFrame.
+
+        where maps a column to a (low, high) range, inclusive and open when None,
+        or to a list of values, e.g. {'OrderDateTime': ('2024-01-01', '2024-03-31'), 'City': ['Delhi']}.
+        """
+        where = where or {}
+        columns = columns or list(self.columns)
+        blocks = self.blocks(where)
+        self.blocks_read = len(blocks)
+        positions = [start + np.flatnonzero(self._matches(start, min(start + self.block_rows, self.rows), where))
+                     for start in blocks * self.block_rows]
+        positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+        return pd.DataFrame({name: decode_column(self.column(name)[positions], self.columns[name],
+                                                 self.catalog['dictionaries'].get(name)) for name in columns})
+
+
+def main():
+    """Build the store from the processed datasets and/or run a filtered read"""
+    parser = argparse.ArgumentParser(description='Memory-mapped columnar store of the cleaned fact tables')
+    parser.add_argument('--build', action='store_true',
+                        help=f'rebuild the store from the cleaned datasets in {PROCESSED_DIR}/')
+    parser.add_argument('--table', choices=list(SCHEMAS), default='sales', help='table to read')
+    parser.add_argument('--start', default=None, help='first OrderDateTime to read (e.g. 2024-01-01)')
+    parser.add_argument('--end', default=None, help='last OrderDateTime to read (e.g. 2024-03-31 23:59)')
+    parser.add_argument('--city', default=None, help='comma-separated cities to read')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - COLUMNAR STORE")
+    print("="*70)
+
+    try:
+        if args.build:
+            print(f"\nBuilding {STORE_DIR}/ from the cleaned datasets...")
+            for table, dataset in DATASETS.items():
+                rows = build_table(table, f'{PROCESSED_DIR}/{dataset}')
+                print(f"✓ Saved: {table_dir(table)} ({rows:,} rows)")
+
+        store = ColumnStore(args.table)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py --columnar (or this script with --build) first")
+        exit(1)
+
+    where = {}
+    if args.start or args.end:
+        where['OrderDateTime'] = (args.start, args.end)
+    if args.city:
+        where['City'] = args.city.split(',')
+    start = time.perf_counter()
+    df = store.select(where=where)
+    seconds = time.perf_counter() - start
+
+    print(f"\n{args.table}: {len(df):,} of {store.rows:,} rows matched in {seconds * 1000:.1f} ms")
+    print(f"  - Blocks read: {store.blocks_read} of {store.num_blocks} ({BLOCK_ROWS:,} rows each)")
+    if 'TotalAmount' in df.columns:
+        print(f"  - Revenue: ₹{df['TotalAmount'].sum():,.2f}")
+    if 'IsOnTime' in df.columns and len(df):
+        print(f"  - On-time rate: {df['IsOnTime'].mean() * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
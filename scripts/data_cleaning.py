@@ -5,240 +5,1181 @@ Cleans and preprocesses raw data for Power BI dashboard
 
 import pandas as pd
 import numpy as np
-from datetime import datetime
+import argparse
+import json
+import os
+import time
 
-print("="*70)
-print("BLINKIT ANALYSIS DASHBOARD - DATA CLEANING")
-print("="*70)
+import column_store
+from aggregates import combine_cubes, combine_product_days, kpi_cube, product_day_rollup
+from data_quality import REPORT_PATH, Validator, combine_reports, print_validation_report, write_report
+from instrumentation import METRICS_DIR, measure, print_metrics, run_profiled, timed, write_metrics
+from storage import (DATETIME_COLUMNS, FORMATS, PARTITION_COLUMNS, DatasetWriter, append_dataset, dataset_exists,
+                     dataset_parts, detect_format, iter_dataset_chunks, iter_file_chunks, read_dataset,
+                     update_dataset, write_dataset)
+
+RAW_DIR = 'data/raw'
+PROCESSED_DIR = 'data/processed'
+CHUNK_SIZE = 500_000
+STATE_DIR = f'{PROCESSED_DIR}/_state'
+QUALITY_PARTS_DIR = f'{STATE_DIR}/quality'  # validation report of each pipeline stage
+VERSION_PATH = f'{PROCESSED_DIR}/_version'  # rewritten whenever the outputs change
+
+# Columns carried into the master dataset
+MASTER_DELIVERY_COLUMNS = ['OrderID', 'DeliveryTimeMinutes', 'IsOnTime', 'DeliveryRating',
+                           'DeliveryPartnerID', 'DeliveryTimeSegment', 'RatingCategory']
+MASTER_CUSTOMER_COLUMNS = ['CustomerID', 'Name', 'City', 'CustomerSegment', 'RegistrationDate']
+
+# Order lines are keyed by the numbers in OrderID and ProductID; the cleaned lines
+# also carry both IDs, so Power BI can relate them to Sales and Products
+ORDER_ITEM_COLUMNS = ['OrderKey', 'ProductKey', 'Quantity', 'UnitPrice', 'UnitCost']
+ORDER_ITEM_DTYPES = {'OrderKey': np.int32, 'ProductKey': np.int32, 'Quantity': np.int8}
 
 # ============================================================================
-# LOAD RAW DATA
+# DEDUPLICATION
 # ============================================================================
 
-print("\n[1/5] Loading raw data files...")
+def id_numbers(ids, prefix):
+    """Numeric part of formatted IDs such as ORD000123 (NaN if not numeric)"""
+    digits = ids.astype(str).str.slice(len(prefix))
+    try:
+        return digits.astype(np.int64)  # fast path when every ID is well formed
+    except (TypeError, ValueError):
+        return pd.to_numeric(digits, errors='coerce')
 
-try:
-    df_customers = pd.read_csv('data/raw/customer_data.csv')
-    df_products = pd.read_csv('data/raw/product_data.csv')
-    df_sales = pd.read_csv('data/raw/sales_data.csv')
-    df_deliveries = pd.read_csv('data/raw/delivery_data.csv')
-    print("✓ All data files loaded successfully")
-except FileNotFoundError as e:
-    print(f"❌ Error: {e}")
-    print("Please run data_generation.py first to generate sample data")
-    exit(1)
+
+class SeenIdSet:
+    """Compact set of IDs already kept, one byte per numeric ID (also the key sets of data_quality.py)"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._seen = np.zeros(1024, dtype=bool)
+        self._other = set()  # IDs without the expected numeric format
+
+    def _numbers(self, ids):
+        """(numeric mask, ID numbers of the numeric IDs)"""
+        numbers = id_numbers(ids, self.prefix)
+        numeric = numbers.notna().to_numpy() & (numbers >= 0).to_numpy()
+        return numeric, numbers.to_numpy()[numeric].astype(np.int64)
+
+    def _grow(self, values):
+        """Make room for the given ID numbers"""
+        if len(values) and values.max() >= len(self._seen):
+            grown = np.zeros(max(values.max() + 1, 2 * len(self._seen)), dtype=bool)
+            grown[:len(self._seen)] = self._seen
+            self._seen = grown
+
+    def first_occurrences(self, ids):
+        """Mask of IDs not seen before (in earlier chunks or earlier in ids); marks them seen"""
+        numeric, values = self._numbers(ids)
+        keep = ~ids.duplicated().to_numpy()
+
+        self._grow(values)
+        keep[numeric] &= ~self._seen[values]
+
+        for position in np.flatnonzero(~numeric & keep):
+            if ids.iat[position] in self._other:
+                keep[position] = False
+            self._other.add(ids.iat[position])
+
+        self._seen[values[keep[numeric]]] = True
+        return keep
+
+    def add(self, ids):
+        """Mark IDs as seen"""
+        numeric, values = self._numbers(ids)
+        self._grow(values)
+        self._seen[values] = True
+        self._other.update(ids[~numeric].tolist())
+
+    def contains(self, ids):
+        """Mask of IDs in the set (numeric IDs by bitmap, others by hash lookup)"""
+        numeric, values = self._numbers(ids)
+        found = np.zeros(len(ids), dtype=bool)
+        found[numeric] = self.contains_numbers(values)
+        if self._other and not numeric.all():
+            found[~numeric] = ids[~numeric].isin(self._other).to_numpy()
+        return found
+
+    def contains_numbers(self, numbers):
+        """Mask of ID numbers in the set"""
+        numbers = np.asarray(numbers, dtype=np.int64)
+        inside = (numbers >= 0) & (numbers < len(self._seen))
+        found = np.zeros(len(numbers), dtype=bool)
+        found[inside] = self._seen[numbers[inside]]
+        return found
+
+    def save(self, path):
+        """Store the set as a bit-packed .npz file"""
+        np.savez(path, prefix=self.prefix, size=len(self._seen), seen=np.packbits(self._seen),
+                 other=np.array(sorted(self._other), dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        """Read a set written by save()"""
+        data = np.load(path)
+        seen_ids = cls(str(data['prefix']))
+        seen_ids._seen = np.unpackbits(data['seen'], count=int(data['size'])).astype(bool)
+        seen_ids._other = set(data['other'].tolist())
+        return seen_ids
+
+
+@timed
+def drop_duplicate_ids(df, column, seen_ids=None):
+    """Drop rows whose ID repeats, across chunks when a SeenIdSet is given"""
+    if seen_ids is None:
+        return df.drop_duplicates(subset=[column])
+    return df[seen_ids.first_occurrences(df[column])]
 
 # ============================================================================
-# CLEAN CUSTOMER DATA
+# VECTORIZED TRANSFORMS
 # ============================================================================
 
-print("\n[2/5] Cleaning customer data...")
+STOCK_STATUSES = ['In Stock', 'Low Stock', 'Out of Stock']
+TIME_SEGMENTS = ['Morning', 'Afternoon', 'Evening', 'Night']
+
+
+def stock_status(stock_quantity, min_stock_level):
+    """Out of Stock at zero, Low Stock below MinStockLevel, else In Stock"""
+    stock_quantity = np.asarray(stock_quantity)
+    codes = np.select(
+        [stock_quantity == 0, stock_quantity < np.asarray(min_stock_level)],
+        [2, 1],
+        default=0
+    )
+    return pd.Categorical.from_codes(codes, categories=STOCK_STATUSES)
+
+
+def time_segment(order_hour):
+    """Morning 6-11, Afternoon 12-16, Evening 17-20, Night otherwise"""
+    order_hour = np.asarray(order_hour)
+    codes = np.select(
+        [(order_hour >= 6) & (order_hour < 12),
+         (order_hour >= 12) & (order_hour < 17),
+         (order_hour >= 17) & (order_hour < 21)],
+        [0, 1, 2],
+        default=3
+    )
+    return pd.Categorical.from_codes(codes, categories=TIME_SEGMENTS)
+
+# ============================================================================
+# CLEANING STEPS
+# ============================================================================
+
+@timed
+def clean_customers(df_customers):
+    """Clean customer data"""
+    # Convert dates
+    df_customers['RegistrationDate'] = pd.to_datetime(df_customers['RegistrationDate'])
+
+    # Remove duplicates
+    initial_count = len(df_customers)
+    df_customers = df_customers.drop_duplicates(subset=['CustomerID']).copy()
+    print(f"  - Removed {initial_count - len(df_customers)} duplicate customers")
+
+    # Handle missing values
+    df_customers['Email'] = df_customers['Email'].fillna('unknown@email.com')
+    df_customers['Phone'] = df_customers['Phone'].fillna('0000000000')
+
+    # Standardize city names
+    df_customers['City'] = df_customers['City'].str.title()
+    return df_customers
+
+
+@timed
+def clean_products(df_products):
+    """Clean product data"""
+    # Remove duplicates
+    initial_count = len(df_products)
+    df_products = df_products.drop_duplicates(subset=['ProductID'])
+    print(f"  - Removed {initial_count - len(df_products)} duplicate products")
+
+    # Ensure positive prices
+    df_products = df_products[df_products['Price'] > 0]
+    df_products = df_products[df_products['CostPrice'] > 0].copy()
+
+    # Recalculate profit margin
+    df_products['ProfitMargin'] = round(
+        ((df_products['Price'] - df_products['CostPrice']) / df_products['Price']) * 100,
+        2
+    )
+
+    # Handle stock quantities
+    df_products['StockQuantity'] = df_products['StockQuantity'].fillna(0).astype(int)
+    df_products['MinStockLevel'] = df_products['MinStockLevel'].fillna(20).astype(int)
+
+    # Add stock status
+    df_products['StockStatus'] = stock_status(df_products['StockQuantity'], df_products['MinStockLevel'])
+    return df_products
+
+
+@timed
+def clean_sales(df_sales):
+    """Convert datetimes, drop invalid orders and add calculated columns (after dedup)"""
+    # Convert datetime columns
+    df_sales['OrderDateTime'] = pd.to_datetime(df_sales['OrderDateTime'])
+    df_sales['OrderDate'] = pd.to_datetime(df_sales['OrderDate'])
+
+    # Remove invalid orders (negative amounts)
+    df_sales = df_sales[df_sales['TotalAmount'] > 0].copy()
+
+    # Add calculated columns
+    df_sales['Year'] = df_sales['OrderDateTime'].dt.year
+    df_sales['Month'] = df_sales['OrderDateTime'].dt.month
+    df_sales['MonthName'] = df_sales['OrderDateTime'].dt.strftime('%B')
+    df_sales['Quarter'] = df_sales['OrderDateTime'].dt.quarter
+    df_sales['WeekOfYear'] = df_sales['OrderDateTime'].dt.isocalendar().week
+
+    # Add time-based segments
+    df_sales['TimeSegment'] = time_segment(df_sales['OrderHour'])
 
-# Convert dates
-df_customers['RegistrationDate'] = pd.to_datetime(df_customers['RegistrationDate'])
+    # Calculate order value segments
+    df_sales['OrderValueSegment'] = pd.cut(
+        df_sales['TotalAmount'],
+        bins=[0, 200, 500, 1000, float('inf')],
+        labels=['Small', 'Medium', 'Large', 'Extra Large']
+    )
+    return df_sales
 
-# Remove duplicates
-initial_count = len(df_customers)
-df_customers = df_customers.drop_duplicates(subset=['CustomerID'])
-print(f"  - Removed {initial_count - len(df_customers)} duplicate customers")
 
-# Handle missing values
-df_customers['Email'].fillna('unknown@email.com', inplace=True)
-df_customers['Phone'].fillna('0000000000', inplace=True)
+@timed
+def clean_deliveries(df_deliveries):
+    """Convert datetimes, drop invalid deliveries and add segments (after dedup)"""
+    # Convert datetime columns
+    df_deliveries['OrderDateTime'] = pd.to_datetime(df_deliveries['OrderDateTime'])
+    df_deliveries['DeliveryDateTime'] = pd.to_datetime(df_deliveries['DeliveryDateTime'])
 
-# Standardize city names
-df_customers['City'] = df_customers['City'].str.title()
+    # Ensure delivery time is positive
+    df_deliveries = df_deliveries[df_deliveries['DeliveryTimeMinutes'] > 0].copy()
 
-print(f"✓ Cleaned {len(df_customers)} customer records")
+    # Add delivery time segments
+    df_deliveries['DeliveryTimeSegment'] = pd.cut(
+        df_deliveries['DeliveryTimeMinutes'],
+        bins=[0, 10, 15, 20, float('inf')],
+        labels=['Very Fast', 'Fast', 'Normal', 'Slow']
+    )
+
+    # Add rating categories
+    df_deliveries['RatingCategory'] = pd.cut(
+        df_deliveries['DeliveryRating'],
+        bins=[0, 2, 3, 4, 5],
+        labels=['Poor', 'Average', 'Good', 'Excellent']
+    )
+    return df_deliveries
+
+
+@timed
+def clean_order_items(df_items, order_ids, product_ids):
+    """Keep valid lines of the given cleaned orders, one line per order and product, with their OrderID and ProductID"""
+    order_ids = pd.Series(order_ids.to_numpy(), index=id_numbers(order_ids, 'ORD'))
+    df_items = df_items[df_items['OrderKey'].isin(order_ids.index)]
+    df_items = df_items.drop_duplicates(subset=['OrderKey', 'ProductKey'])
+    df_items = df_items[(df_items['Quantity'] > 0) & (df_items['UnitPrice'] > 0)].astype(ORDER_ITEM_DTYPES)
+    df_items.insert(1, 'OrderID', df_items['OrderKey'].map(order_ids))
+    df_items.insert(3, 'ProductID', df_items['ProductKey'].map(product_ids))
+    return df_items
+
+
+def product_id_lookup(df_products):
+    """ProductID by ProductKey"""
+    return pd.Series(df_products['ProductID'].to_numpy(), index=id_numbers(df_products['ProductID'], 'PROD'))
+
+
+@timed
+def order_lines(df_items, df_sales, product_ids):
+    """Order lines with the OrderDate of their order and the ProductID of their product"""
+    order_dates = pd.Series(df_sales['OrderDate'].to_numpy(), index=id_numbers(df_sales['OrderID'], 'ORD'))
+    return df_items.assign(OrderDate=df_items['OrderKey'].map(order_dates),
+                           ProductID=df_items['ProductKey'].map(product_ids))
+
+
+@timed
+def build_master(df_sales, df_deliveries, df_customers):
+    """Join sales with delivery and customer attributes"""
+    df_master = df_sales.merge(
+        df_deliveries[MASTER_DELIVERY_COLUMNS],
+        on='OrderID',
+        how='left'
+    )
+
+    df_master = df_master.merge(
+        df_customers[MASTER_CUSTOMER_COLUMNS],
+        on='CustomerID',
+        how='left',
+        suffixes=('', '_customer')
+    )
+    return df_master
 
 # ============================================================================
-# CLEAN PRODUCT DATA
+# DATA QUALITY REPORT
 # ============================================================================
 
-print("\n[3/5] Cleaning product data...")
+def sales_summary(df_sales):
+    """Additive sales statistics for the quality report"""
+    return {
+        'orders': len(df_sales),
+        'completed': int((df_sales['OrderStatus'] == 'Completed').sum()),
+        'revenue': float(df_sales['TotalAmount'].sum()),
+        'min_date': df_sales['OrderDate'].min(),
+        'max_date': df_sales['OrderDate'].max(),
+    }
 
-# Remove duplicates
-initial_count = len(df_products)
-df_products = df_products.drop_duplicates(subset=['ProductID'])
-print(f"  - Removed {initial_count - len(df_products)} duplicate products")
 
-# Ensure positive prices
-df_products = df_products[df_products['Price'] > 0]
-df_products = df_products[df_products['CostPrice'] > 0]
+def delivery_summary(df_deliveries):
+    """Additive delivery statistics for the quality report"""
+    return {
+        'deliveries': len(df_deliveries),
+        'on_time': int(df_deliveries['IsOnTime'].sum()),
+        'minutes': float(df_deliveries['DeliveryTimeMinutes'].sum()),
+        'rating': float(df_deliveries['DeliveryRating'].sum()),
+    }
 
-# Recalculate profit margin
-df_products['ProfitMargin'] = round(
-    ((df_products['Price'] - df_products['CostPrice']) / df_products['Price']) * 100, 
-    2
-)
 
-# Handle stock quantities
-df_products['StockQuantity'] = df_products['StockQuantity'].fillna(0).astype(int)
-df_products['MinStockLevel'] = df_products['MinStockLevel'].fillna(20).astype(int)
+def combine_summaries(total, part):
+    """Add the statistics of one chunk to a running summary"""
+    if total is None:
+        return part
+    combined = {}
+    for key, value in part.items():
+        if key == 'min_date':
+            combined[key] = min(total[key], value) if pd.notna(value) else total[key]
+        elif key == 'max_date':
+            combined[key] = max(total[key], value) if pd.notna(value) else total[key]
+        else:
+            combined[key] = total[key] + value
+    return combined
 
-# Add stock status
-df_products['StockStatus'] = df_products.apply(
-    lambda x: 'Out of Stock' if x['StockQuantity'] == 0 
-    else 'Low Stock' if x['StockQuantity'] < x['MinStockLevel']
-    else 'In Stock',
-    axis=1
-)
 
-print(f"✓ Cleaned {len(df_products)} product records")
+def mark_outputs_updated():
+    """Record that the processed outputs changed, so readers can drop cached results"""
+    with open(VERSION_PATH, 'w') as f:
+        f.write(str(time.time_ns()))
+
+
+def print_quality_report(df_customers, df_products, sales, deliveries, saved, validation):
+    """Print the data quality report from the sales/delivery summaries and the validation report"""
+    print("\n" + "="*70)
+    print("DATA QUALITY REPORT")
+    print("="*70)
+
+    print(f"\nCustomers:")
+    print(f"  - Total records: {len(df_customers):,}")
+    print(f"  - Active customers: {df_customers['IsActive'].sum():,}")
+    print(f"  - Unique cities: {df_customers['City'].nunique()}")
+
+    print(f"\nProducts:")
+    print(f"  - Total products: {len(df_products):,}")
+    print(f"  - Active products: {df_products['IsActive'].sum():,}")
+    print(f"  - Categories: {df_products['Category'].nunique()}")
+    print(f"  - Out of stock: {(df_products['StockStatus'] == 'Out of Stock').sum()}")
+
+    print(f"\nSales:")
+    print(f"  - Total orders: {sales['orders']:,}")
+    print(f"  - Completed orders: {sales['completed']:,}")
+    print(f"  - Total revenue: ₹{sales['revenue']:,.2f}")
+    print(f"  - Average order value: ₹{sales['revenue'] / max(sales['orders'], 1):.2f}")
+    print(f"  - Date range: {sales['min_date']} to {sales['max_date']}")
+
+    num_deliveries = max(deliveries['deliveries'], 1)
+    print(f"\nDeliveries:")
+    print(f"  - Total deliveries: {deliveries['deliveries']:,}")
+    print(f"  - On-time deliveries: {deliveries['on_time']:,} ({deliveries['on_time'] / num_deliveries * 100:.1f}%)")
+    print(f"  - Average delivery time: {deliveries['minutes'] / num_deliveries:.1f} minutes")
+    print(f"  - Average rating: {deliveries['rating'] / num_deliveries:.2f}/5")
+
+    print_validation_report(validation)
+
+    print("\n" + "="*70)
+    print("✅ Data cleaning complete!")
+    print("\nCleaned files are ready for Power BI import:")
+    print(f"  - {saved[-1]} (recommended)")
+    for path in saved[:-1]:
+        print(f"  - {path}")
+    print("="*70)
 
 # ============================================================================
-# CLEAN SALES DATA
+# BATCH MODE
 # ============================================================================
 
-print("\n[4/5] Cleaning sales data...")
+def key_set(ids, prefix):
+    """SeenIdSet holding the given IDs"""
+    keys = SeenIdSet(prefix)
+    keys.add(ids)
+    return keys
 
-# Convert datetime columns
-df_sales['OrderDateTime'] = pd.to_datetime(df_sales['OrderDateTime'])
-df_sales['OrderDate'] = pd.to_datetime(df_sales['OrderDate'])
 
-# Remove duplicates
-initial_count = len(df_sales)
-df_sales = df_sales.drop_duplicates(subset=['OrderID'])
-print(f"  - Removed {initial_count - len(df_sales)} duplicate orders")
+def clean_dimensions(df_customers, df_products, validator, storage_format='csv'):
+    """Validate, clean and save the customer and product tables (always held in memory)"""
+    print("\n[2/5] Cleaning customer data...")
+    df_customers = clean_customers(validator.validate(df_customers, 'customer_data'))
+    validator.key_sets['customers'] = key_set(df_customers['CustomerID'], 'CUST')
+    print(f"✓ Cleaned {len(df_customers)} customer records")
 
-# Remove invalid orders (negative amounts)
-df_sales = df_sales[df_sales['TotalAmount'] > 0]
+    print("\n[3/5] Cleaning product data...")
+    df_products = clean_products(validator.validate(df_products, 'product_data'))
+    validator.key_sets['products'] = key_set(df_products['ProductID'], 'PROD')
+    print(f"✓ Cleaned {len(df_products)} product records")
 
-# Add calculated columns
-df_sales['Year'] = df_sales['OrderDateTime'].dt.year
-df_sales['Month'] = df_sales['OrderDateTime'].dt.month
-df_sales['MonthName'] = df_sales['OrderDateTime'].dt.strftime('%B')
-df_sales['Quarter'] = df_sales['OrderDateTime'].dt.quarter
-df_sales['WeekOfYear'] = df_sales['OrderDateTime'].dt.isocalendar().week
+    write_dataset(df_customers, f'{PROCESSED_DIR}/customers_clean', storage_format)
+    write_dataset(df_products, f'{PROCESSED_DIR}/products_clean', storage_format)
+    return df_customers, df_products
 
-# Add time-based segments
-df_sales['TimeSegment'] = df_sales['OrderHour'].apply(
-    lambda x: 'Morning' if 6 <= x < 12
-    else 'Afternoon' if 12 <= x < 17
-    else 'Evening' if 17 <= x < 21
-    else 'Night'
-)
 
-# Calculate order value segments
-df_sales['OrderValueSegment'] = pd.cut(
-    df_sales['TotalAmount'],
-    bins=[0, 200, 500, 1000, float('inf')],
-    labels=['Small', 'Medium', 'Large', 'Extra Large']
-)
+def run_batch(storage_format='csv', partition=False, columnar=False):
+    """Load every table fully, clean it and build the master dataset"""
+    clear_state()
+    print("\n[1/5] Loading raw data files...")
+    df_customers = read_dataset(f'{RAW_DIR}/customer_data')
+    df_products = read_dataset(f'{RAW_DIR}/product_data')
+    df_sales = read_dataset(f'{RAW_DIR}/sales_data')
+    df_deliveries = read_dataset(f'{RAW_DIR}/delivery_data')
+    df_items = read_dataset(f'{RAW_DIR}/order_items') if dataset_exists(f'{RAW_DIR}/order_items') else None
+    print("✓ All data files loaded successfully")
+
+    validator = Validator(storage_format)
+    df_customers, df_products = clean_dimensions(df_customers, df_products, validator, storage_format)
 
-print(f"✓ Cleaned {len(df_sales)} sales records")
+    print("\n[4/5] Cleaning sales data...")
+    initial_count = len(df_sales)
+    df_sales = drop_duplicate_ids(df_sales, 'OrderID')
+    print(f"  - Removed {initial_count - len(df_sales)} duplicate orders")
+    df_sales = clean_sales(validator.validate(df_sales, 'sales_data'))
+    validator.key_sets['orders'] = key_set(df_sales['OrderID'], 'ORD')
+    print(f"✓ Cleaned {len(df_sales)} sales records")
+    if df_items is not None:
+        df_items = validator.validate(df_items, 'order_items')
+        df_items = clean_order_items(df_items, df_sales['OrderID'], product_id_lookup(df_products))
+        print(f"✓ Cleaned {len(df_items)} order lines")
+
+    print("\n[5/5] Cleaning delivery data...")
+    initial_count = len(df_deliveries)
+    df_deliveries = drop_duplicate_ids(df_deliveries, 'DeliveryID')
+    print(f"  - Removed {initial_count - len(df_deliveries)} duplicate deliveries")
+    df_deliveries = clean_deliveries(validator.validate(df_deliveries, 'delivery_data'))
+    print(f"✓ Cleaned {len(df_deliveries)} delivery records")
+
+    print("\n" + "="*70)
+    print("SAVING CLEANED DATA")
+    print("="*70)
+
+    partition_cols = PARTITION_COLUMNS if partition else None
+    df_master = build_master(df_sales, df_deliveries, df_customers)
+    saved = [
+        f'{PROCESSED_DIR}/customers_clean.{storage_format}',
+        f'{PROCESSED_DIR}/products_clean.{storage_format}',
+        write_dataset(df_sales, f'{PROCESSED_DIR}/sales_clean', storage_format, partition_cols),
+        write_dataset(df_deliveries, f'{PROCESSED_DIR}/deliveries_clean', storage_format),
+        write_dataset(combine_cubes([kpi_cube(df_master)]), f'{PROCESSED_DIR}/kpi_cube', storage_format),
+        write_dataset(df_master, f'{PROCESSED_DIR}/master_dataset', storage_format, partition_cols),
+    ]
+    if df_items is not None:
+        df_product_days = combine_product_days(
+            [product_day_rollup(order_lines(df_items, df_sales, product_id_lookup(df_products)))])
+        saved[-1:-1] = [
+            write_dataset(df_items, f'{PROCESSED_DIR}/order_items_clean', storage_format),
+            write_dataset(df_product_days, f'{PROCESSED_DIR}/product_daily', storage_format),
+        ]
+    for path in saved:
+        print(f"✓ Saved: {path}")
+    if columnar:
+        for table, df in [('sales', df_sales), ('deliveries', df_deliveries)]:
+            column_store.reset_table(table)
+            column_store.append_rows(df, table)
+            print(f"✓ Saved: {column_store.table_dir(table)}")
+
+    mark_outputs_updated()
+    print_quality_report(df_customers, df_products, sales_summary(df_sales), delivery_summary(df_deliveries), saved,
+                         validator.close())
 
 # ============================================================================
-# CLEAN DELIVERY DATA
+# STREAMING MODE
 # ============================================================================
 
-print("\n[5/5] Cleaning delivery data...")
+class OrderAligner:
+    """Hands out rows of a second input in step with sales chunks.
+
+    Both inputs must be ordered by OrderID (as written by data_generation.py),
+    so each sales chunk only needs the rows up to its largest OrderID.
+    """
+
+    name = 'input'
+    columns = []
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = None
+        self._boundary = -np.inf
+        self._exhausted = False
+        self.raw_rows = 0
+
+    def _prepare(self, chunk):
+        """Process one raw chunk and return the rows to hand out"""
+        return chunk[self.columns]
+
+    def _keys(self, chunk):
+        """OrderID number of every row"""
+        return id_numbers(chunk['OrderID'], 'ORD')
+
+    def _pull(self):
+        """Read the next chunk into the buffer"""
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._exhausted = True
+            return
+        self.raw_rows += len(chunk)
+        chunk = self._prepare(chunk)
+
+        chunk = chunk.assign(_key=self._keys(chunk))
+        if len(chunk) and chunk['_key'].min() <= self._boundary:
+            raise ValueError(f"Streaming mode needs {self.name} ordered by OrderID; "
+                             "re-run without --streaming for unordered inputs")
+        self._buffer = chunk if self._buffer is None else pd.concat([self._buffer, chunk], ignore_index=True)
+
+    def take_through(self, max_key):
+        """Rows whose OrderID number is at most max_key"""
+        while not self._exhausted and (self._buffer is None or not len(self._buffer)
+                                       or self._buffer['_key'].max() <= max_key):
+            self._pull()
+        if self._buffer is None:
+            return pd.DataFrame(columns=self.columns)
+        matched = self._buffer['_key'] <= max_key
+        taken, self._buffer = self._buffer[matched], self._buffer[~matched]
+        self._boundary = max(self._boundary, max_key)
+        return taken.drop(columns='_key')
+
+    def drain(self):
+        """Read any rows left after the last sales chunk"""
+        while not self._exhausted:
+            self._pull()
+
+
+class DeliveryAligner(OrderAligner):
+    """Cleans and writes deliveries once their orders were seen, handing out their master dataset columns"""
+
+    name = 'delivery_data'
+    columns = MASTER_DELIVERY_COLUMNS
+
+    def __init__(self, chunks, writer, seen_ids, validator, columnar=False):
+        super().__init__(chunks)
+        self._writer = writer
+        self._seen_ids = seen_ids
+        self._validator = validator
+        self._columnar = columnar
+        self.summary = None
+
+    def _prepare(self, chunk):
+        return drop_duplicate_ids(chunk, 'DeliveryID', self._seen_ids)
+
+    def _finish(self, df_deliveries):
+        """Validate (against the orders seen so far), clean and write deliveries"""
+        df_deliveries = clean_deliveries(self._validator.validate(df_deliveries, 'delivery_data'))
+        self._writer.write(df_deliveries)
+        if self._columnar:
+            column_store.append_rows(df_deliveries, 'deliveries')
+        self.summary = combine_summaries(self.summary, delivery_summary(df_deliveries))
+        return df_deliveries[self.columns]
+
+    def take_through(self, max_key):
+        taken = super().take_through(max_key)
+        return taken if self._buffer is None else self._finish(taken)
 
-# Convert datetime columns
-df_deliveries['OrderDateTime'] = pd.to_datetime(df_deliveries['OrderDateTime'])
-df_deliveries['DeliveryDateTime'] = pd.to_datetime(df_deliveries['DeliveryDateTime'])
+    def drain(self):
+        super().drain()
+        if self._buffer is not None:
+            self._finish(self._buffer.drop(columns='_key'))
+            self._buffer = self._buffer.iloc[:0]
 
-# Remove duplicates
-initial_count = len(df_deliveries)
-df_deliveries = df_deliveries.drop_duplicates(subset=['DeliveryID'])
-print(f"  - Removed {initial_count - len(df_deliveries)} duplicate deliveries")
 
-# Ensure delivery time is positive
-df_deliveries = df_deliveries[df_deliveries['DeliveryTimeMinutes'] > 0]
+class OrderItemAligner(OrderAligner):
+    """Hands out raw order lines in step with sales chunks"""
 
-# Add delivery time segments
-df_deliveries['DeliveryTimeSegment'] = pd.cut(
-    df_deliveries['DeliveryTimeMinutes'],
-    bins=[0, 10, 15, 20, float('inf')],
-    labels=['Very Fast', 'Fast', 'Normal', 'Slow']
-)
+    name = 'order_items'
+    columns = ORDER_ITEM_COLUMNS
 
-# Add rating categories
-df_deliveries['RatingCategory'] = pd.cut(
-    df_deliveries['DeliveryRating'],
-    bins=[0, 2, 3, 4, 5],
-    labels=['Poor', 'Average', 'Good', 'Excellent']
-)
+    def _keys(self, chunk):
+        return chunk['OrderKey']
 
-print(f"✓ Cleaned {len(df_deliveries)} delivery records")
+
+def run_streaming(chunk_size=CHUNK_SIZE, storage_format='csv', partition=False, columnar=False):
+    """Clean sales and deliveries chunk by chunk with bounded memory"""
+    clear_state()
+    print(f"\n[1/5] Streaming raw data files in chunks of {chunk_size:,} rows...")
+    df_customers = read_dataset(f'{RAW_DIR}/customer_data')
+    df_products = read_dataset(f'{RAW_DIR}/product_data')
+    validator = Validator(storage_format)
+    df_customers, df_products = clean_dimensions(df_customers, df_products, validator, storage_format)
+    customer_lookup = df_customers[MASTER_CUSTOMER_COLUMNS]
+
+    partition_cols = PARTITION_COLUMNS if partition else None
+    sales_writer = DatasetWriter(f'{PROCESSED_DIR}/sales_clean', storage_format, partition_cols)
+    delivery_writer = DatasetWriter(f'{PROCESSED_DIR}/deliveries_clean', storage_format)
+    master_writer = DatasetWriter(f'{PROCESSED_DIR}/master_dataset', storage_format, partition_cols)
+
+    if columnar:
+        column_store.reset_table('sales')
+        column_store.reset_table('deliveries')
+
+    seen_orders = SeenIdSet('ORD')
+    validator.key_sets['orders'] = SeenIdSet('ORD')  # cleaned orders so far
+    deliveries = DeliveryAligner(iter_dataset_chunks(f'{RAW_DIR}/delivery_data', chunk_size),
+                                 delivery_writer, SeenIdSet('DEL'), validator, columnar)
+
+    items, items_writer = None, None
+    if dataset_exists(f'{RAW_DIR}/order_items'):
+        items = OrderItemAligner(iter_dataset_chunks(f'{RAW_DIR}/order_items', chunk_size))
+        items_writer = DatasetWriter(f'{PROCESSED_DIR}/order_items_clean', storage_format)
+    product_ids = product_id_lookup(df_products)
+
+    print("\n[4/5] Cleaning sales and delivery data...")
+    raw_orders = 0
+    sales = None
+    cubes, product_days = [], []
+    last_key = -np.inf
+    for chunk_number, df_sales in enumerate(iter_dataset_chunks(f'{RAW_DIR}/sales_data', chunk_size), 1):
+        raw_orders += len(df_sales)
+        df_sales = drop_duplicate_ids(df_sales, 'OrderID', seen_orders)
+        df_sales = clean_sales(validator.validate(df_sales, 'sales_data'))
+        validator.key_sets['orders'].add(df_sales['OrderID'])
+        sales_writer.write(df_sales)
+        if columnar:
+            column_store.append_rows(df_sales, 'sales')
+        sales = combine_summaries(sales, sales_summary(df_sales))
+
+        keys = id_numbers(df_sales['OrderID'], 'ORD')
+        if len(keys) == 0:
+            continue
+        if keys.min() <= last_key:
+            raise ValueError("Streaming mode needs sales_data ordered by OrderID; "
+                             "re-run without --streaming for unordered inputs")
+        last_key = keys.max()
+
+        df_deliveries = deliveries.take_through(last_key)
+        with measure('build_master', rows=len(df_sales)):
+            df_master = df_sales.merge(df_deliveries, on='OrderID', how='left')
+            df_master = df_master.merge(customer_lookup, on='CustomerID', how='left', suffixes=('', '_customer'))
+        master_writer.write(df_master)
+        cubes.append(kpi_cube(df_master))
+
+        if items is not None:
+            df_items = clean_order_items(validator.validate(items.take_through(last_key), 'order_items'),
+                                         df_sales['OrderID'], product_ids)
+            items_writer.write(df_items)
+            product_days.append(product_day_rollup(order_lines(df_items, df_sales, product_ids)))
+        print(f"  - Chunk {chunk_number}: {len(df_sales):,} orders cleaned ({raw_orders:,} read)")
+
+    print("\n[5/5] Finishing delivery data...")
+    deliveries.drain()
+    print(f"  - Removed {raw_orders - sales['orders']:,} duplicate or invalid orders")
+    print(f"  - Removed {deliveries.raw_rows - deliveries.summary['deliveries']:,} duplicate or invalid deliveries")
+
+    saved = [f'{PROCESSED_DIR}/customers_clean.{storage_format}', f'{PROCESSED_DIR}/products_clean.{storage_format}']
+    for writer in [sales_writer, delivery_writer, master_writer]:
+        writer.close()
+        saved.append(writer.path)
+    saved.insert(-1, write_dataset(combine_cubes(cubes), f'{PROCESSED_DIR}/kpi_cube', storage_format))
+    if items is not None:
+        items_writer.close()
+        saved[-1:-1] = [
+            items_writer.path,
+            write_dataset(combine_product_days(product_days), f'{PROCESSED_DIR}/product_daily', storage_format),
+        ]
+    print("\n" + "="*70)
+    print("SAVING CLEANED DATA")
+    print("="*70)
+    for path in saved:
+        print(f"✓ Saved: {path}")
+    if columnar:
+        print(f"✓ Saved: {column_store.table_dir('sales')}")
+        print(f"✓ Saved: {column_store.table_dir('deliveries')}")
+
+    mark_outputs_updated()
+    print_quality_report(df_customers, df_products, sales, deliveries.summary, saved, validator.close())
 
 # ============================================================================
-# SAVE CLEANED DATA
+# INCREMENTAL MODE
 # ============================================================================
 
-print("\n" + "="*70)
-print("SAVING CLEANED DATA")
-print("="*70)
+def raw_file_manifest():
+    """Size and modification time of every raw sales, delivery and order line file"""
+    manifest = {}
+    for name in ['sales_data', 'delivery_data', 'order_items']:
+        stem = f'{RAW_DIR}/{name}'
+        if name == 'order_items' and not dataset_exists(stem):
+            continue
+        for path in dataset_parts(stem, detect_format(stem)):
+            info = os.stat(path)
+            manifest[path] = [info.st_size, info.st_mtime_ns]
+    return manifest
+
+
+def customer_order_counts(df_sales):
+    """Orders and first order time per customer (IsRepeatCustomer = more than one order)"""
+    return df_sales.groupby('CustomerID', as_index=False).agg(
+        OrderCount=('OrderID', 'size'),
+        FirstOrderDateTime=('OrderDateTime', 'min'),
+    )
+
+
+def load_state():
+    """Previous incremental run's high-water mark, manifest, customer order counts, delivery and order IDs"""
+    state_path = f'{STATE_DIR}/cleaning_state.json'
+    if not os.path.isfile(state_path) or not os.path.isfile(f'{STATE_DIR}/order_ids.npz'):
+        return None, None, None, None
+    with open(state_path) as f:
+        state = json.load(f)
+    df_counts = read_dataset(f'{STATE_DIR}/customer_order_counts')
+    df_counts['FirstOrderDateTime'] = pd.to_datetime(df_counts['FirstOrderDateTime'])
+    return (state, df_counts, SeenIdSet.load(f'{STATE_DIR}/delivery_ids.npz'),
+            SeenIdSet.load(f'{STATE_DIR}/order_ids.npz'))
+
+
+def save_state(state, df_counts, seen_deliveries, order_ids, storage_format):
+    """Persist the high-water mark, raw file manifest, customer order counts, delivery and order IDs"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    write_dataset(df_counts, f'{STATE_DIR}/customer_order_counts', storage_format)
+    seen_deliveries.save(f'{STATE_DIR}/delivery_ids.npz')
+    order_ids.save(f'{STATE_DIR}/order_ids.npz')
+    with open(f'{STATE_DIR}/cleaning_state.json', 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def clear_state():
+    """Forget incremental state (full runs rewrite every output)"""
+    if os.path.isfile(f'{STATE_DIR}/cleaning_state.json'):
+        os.remove(f'{STATE_DIR}/cleaning_state.json')
+
+
+def read_new_rows(stem, paths, row_filter, chunk_size=CHUNK_SIZE):
+    """Rows of the given raw files of a dataset that row_filter keeps (no rows, same columns, without files)"""
+    frames = [row_filter(chunk) for path in paths for chunk in iter_file_chunks(path, chunk_size)]
+    if not frames:
+        first_part = dataset_parts(stem, detect_format(stem))[0]
+        return next(iter_file_chunks(first_part, 1)).iloc[:0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def advance_manifest(previous, manifest, pending):
+    """Manifest to save: pending files keep their previous entry so the next run reads them again"""
+    return {path: previous.get(path) if path in pending else info for path, info in manifest.items()}
+
+
+def mark_repeat_customers(customer_ids):
+    """update_dataset callback: set IsRepeatCustomer for customers who just placed a second order"""
+    def update(df):
+        mask = df['CustomerID'].isin(customer_ids) & ~df['IsRepeatCustomer'].astype(bool)
+        if not mask.any():
+            return None
+        df['IsRepeatCustomer'] = df['IsRepeatCustomer'].astype(bool) | mask
+        return df
+    return update
+
+
+def fill_late_deliveries(df_late, repeat_update, filled=None):
+    """update_dataset callback for the master dataset: repeat flags plus deliveries of earlier orders.
+
+    Rows that received a delivery are also appended to the filled list, when given.
+    """
+    df_late = df_late[MASTER_DELIVERY_COLUMNS].set_index('OrderID')
+
+    def update(df):
+        updated = repeat_update(df)
+        df = df if updated is None else updated
+        mask = df['OrderID'].isin(df_late.index)
+        if not mask.any():
+            return updated
+        for column in df_late.columns:
+            values = df.loc[mask, 'OrderID'].map(df_late[column])
+            df[column] = df[column].astype(object)
+            df.loc[mask, column] = values.astype(object)
+        if filled is not None:
+            filled.append(df[mask])
+        return df
+    return update
+
+
+def cube_from_master(chunk_size=CHUNK_SIZE):
+    """KPI cube rebuilt from the processed master dataset, chunk by chunk"""
+    return combine_cubes([kpi_cube(chunk)
+                          for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/master_dataset', chunk_size)])
+
+
+def load_cube(chunk_size=CHUNK_SIZE):
+    """The saved KPI cube, or one rebuilt from the master dataset if it was never written"""
+    if dataset_exists(f'{PROCESSED_DIR}/kpi_cube'):
+        return read_dataset(f'{PROCESSED_DIR}/kpi_cube')
+    return cube_from_master(chunk_size)
+
+
+def load_product_days(product_ids):
+    """The saved product x day rollup, or one rebuilt from the cleaned order lines if it was never written"""
+    if dataset_exists(f'{PROCESSED_DIR}/product_daily'):
+        return read_dataset(f'{PROCESSED_DIR}/product_daily')
+    if not dataset_exists(f'{PROCESSED_DIR}/order_items_clean'):
+        return None
+    df_items = read_dataset(f'{PROCESSED_DIR}/order_items_clean')
+    df_sales = read_dataset(f'{PROCESSED_DIR}/sales_clean', columns=['OrderID', 'OrderDate'])
+    return product_day_rollup(order_lines(df_items, df_sales, product_ids))
+
+
+def _raw_paths(paths, name):
+    """Paths belonging to one raw dataset (single file or part files)"""
+    return [path for path in paths if os.path.basename(os.path.dirname(path)) == name
+            or os.path.basename(path).startswith(f'{name}.')]
+
+
+def _partitions(datetimes):
+    """(Year, Month) partitions holding the given order times"""
+    datetimes = pd.to_datetime(pd.Series(datetimes)).dropna()
+    return sorted(set(zip(datetimes.dt.year, datetimes.dt.month)))
+
 
-# Save individual cleaned files
-df_customers.to_csv('data/processed/customers_clean.csv', index=False)
-print("✓ Saved: data/processed/customers_clean.csv")
+def _initial_state(storage_format, partition):
+    """State after a full clean, read back from the processed outputs"""
+    df_sales = read_dataset(f'{PROCESSED_DIR}/sales_clean', columns=['OrderID', 'CustomerID', 'OrderDateTime'])
+    df_sales['OrderDateTime'] = pd.to_datetime(df_sales['OrderDateTime'])
+    seen_deliveries = SeenIdSet('DEL')
+    for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/deliveries_clean', CHUNK_SIZE, columns=['DeliveryID']):
+        seen_deliveries.first_occurrences(chunk['DeliveryID'])
+    state = {
+        'storage_format': storage_format,
+        'partition': partition,
+        'max_order_id': int(id_numbers(df_sales['OrderID'], 'ORD').max()),
+        'max_order_datetime': str(df_sales['OrderDateTime'].max()),
+        'files': raw_file_manifest(),
+    }
+    return state, customer_order_counts(df_sales), seen_deliveries, key_set(df_sales['OrderID'], 'ORD')
 
-df_products.to_csv('data/processed/products_clean.csv', index=False)
-print("✓ Saved: data/processed/products_clean.csv")
 
-df_sales.to_csv('data/processed/sales_clean.csv', index=False)
-print("✓ Saved: data/processed/sales_clean.csv")
+def update_column_store(df_sales, df_deliveries, max_order_id, repeat_customer_ids, chunk_size=CHUNK_SIZE):
+    """Append new rows to the columnar store and flag new repeat customers; returns the table folders.
 
-df_deliveries.to_csv('data/processed/deliveries_clean.csv', index=False)
-print("✓ Saved: data/processed/deliveries_clean.csv")
+    The store is rebuilt from the processed datasets (already appended to) when it
+    is missing or does not end at the previous run's last order.
+    """
+    catalog = column_store.load_catalog('sales')
+    stored_max = None
+    if catalog is not None:
+        stored_max = max((key for key in catalog['zone_maps']['OrderKey']['max'] if key is not None), default=-1)
+    if stored_max != max_order_id:
+        for table, dataset in column_store.DATASETS.items():
+            column_store.build_table(table, f'{PROCESSED_DIR}/{dataset}', chunk_size)
+    else:
+        column_store.append_rows(df_sales, 'sales')
+        column_store.append_rows(df_deliveries, 'deliveries')
+        column_store.set_flag('sales', 'IsRepeatCustomer', 'CustomerKey',
+                              id_numbers(pd.Series(repeat_customer_ids), 'CUST').to_numpy())
+    return [column_store.table_dir('sales'), column_store.table_dir('deliveries')]
 
-# Create master dataset
-df_master = df_sales.merge(
-    df_deliveries[['OrderID', 'DeliveryTimeMinutes', 'IsOnTime', 'DeliveryRating', 
-                   'DeliveryPartnerID', 'DeliveryTimeSegment', 'RatingCategory']],
-    on='OrderID',
-    how='left'
-)
 
-df_master = df_master.merge(
-    df_customers[['CustomerID', 'Name', 'City', 'CustomerSegment', 'RegistrationDate']],
-    on='CustomerID',
-    how='left',
-    suffixes=('', '_customer')
-)
+def run_incremental(chunk_size=CHUNK_SIZE, storage_format='csv', partition=False, columnar=False):
+    """Clean only orders and deliveries added since the last run and append them to the outputs"""
+    start = time.perf_counter()
+    state, df_counts, seen_deliveries, order_ids = load_state()
+    if state is None or state['storage_format'] != storage_format or state['partition'] != partition:
+        print("\nNo incremental state for these settings yet: running a full clean first")
+        run_batch(storage_format, partition, columnar)
+        state, df_counts, seen_deliveries, order_ids = _initial_state(storage_format, partition)
+        save_state(state, df_counts, seen_deliveries, order_ids, storage_format)
+        print(f"✓ Recorded high-water mark: {state['max_order_datetime']} (OrderID {state['max_order_id']})")
+        return
 
-df_master.to_csv('data/processed/master_dataset.csv', index=False)
-print("✓ Saved: data/processed/master_dataset.csv")
+    print("\n[1/5] Finding new raw data files...")
+    manifest = raw_file_manifest()
+    changed = [path for path in manifest if state['files'].get(path) != manifest[path]]
+    sales_paths = _raw_paths(changed, 'sales_data')
+    delivery_paths = _raw_paths(changed, 'delivery_data')
+    item_paths = _raw_paths(changed, 'order_items')
+    print(f"  - {len(changed)} new or changed files since {state['max_order_datetime']}")
+
+    # Orders arrive in OrderID order; deliveries of earlier orders can arrive late
+    df_sales = read_new_rows(
+        f'{RAW_DIR}/sales_data', sales_paths,
+        lambda chunk: chunk[id_numbers(chunk['OrderID'], 'ORD') > state['max_order_id']], chunk_size)
+    df_deliveries = read_new_rows(
+        f'{RAW_DIR}/delivery_data', delivery_paths,
+        lambda chunk: drop_duplicate_ids(chunk, 'DeliveryID', seen_deliveries), chunk_size)
+    df_items = None
+    if dataset_exists(f'{RAW_DIR}/order_items'):
+        df_items = read_new_rows(
+            f'{RAW_DIR}/order_items', item_paths, lambda chunk: chunk[chunk['OrderKey'] > state['max_order_id']],
+            chunk_size)
+    if len(df_sales) == 0 and len(df_deliveries) == 0 and (df_items is None or len(df_items) == 0):
+        state['files'] = manifest
+        save_state(state, df_counts, seen_deliveries, order_ids, storage_format)
+        print("✓ No new orders or deliveries: processed data is up to date")
+        return
+
+    # Lines of orders not in the raw sales yet are read again by the next run
+    pending = set()
+    raw_max_order_id = int(id_numbers(df_sales['OrderID'], 'ORD').max()) if len(df_sales) else state['max_order_id']
+    if df_items is not None and (df_items['OrderKey'] > raw_max_order_id).any():
+        pending = set(item_paths)
+
+    # Rejected rows are added to those of earlier runs; the report covers this run
+    validator = Validator(storage_format, append=True)
+    df_customers = read_dataset(f'{RAW_DIR}/customer_data')
+    df_products = read_dataset(f'{RAW_DIR}/product_data')
+    df_customers, df_products = clean_dimensions(df_customers, df_products, validator, storage_format)
+
+    print("\n[4/5] Cleaning new sales data...")
+    df_sales = clean_sales(validator.validate(drop_duplicate_ids(df_sales, 'OrderID'), 'sales_data'))
+    order_ids.add(df_sales['OrderID'])
+    validator.key_sets['orders'] = order_ids
+
+    # Update per-customer order counts; customers reaching two orders flip older rows too
+    df_new_counts = customer_order_counts(df_sales)
+    df_counts = df_counts.merge(df_new_counts, on='CustomerID', how='outer', suffixes=('', '_new'))
+    previous_counts = df_counts['OrderCount'].fillna(0)
+    df_counts['OrderCount'] = (previous_counts + df_counts['OrderCount_new'].fillna(0)).astype(int)
+    df_counts['FirstOrderDateTime'] = df_counts[['FirstOrderDateTime', 'FirstOrderDateTime_new']].min(axis=1)
+    flipped = df_counts[(previous_counts == 1) & (df_counts['OrderCount'] > 1)]
+    df_counts = df_counts[['CustomerID', 'OrderCount', 'FirstOrderDateTime']]
+
+    order_counts = df_counts.set_index('CustomerID')['OrderCount']
+    df_sales['IsRepeatCustomer'] = df_sales['CustomerID'].map(order_counts) > 1
+    print(f"✓ Cleaned {len(df_sales)} new sales records")
+    if df_items is not None:
+        df_items = validator.validate(df_items, 'order_items')
+        df_items = clean_order_items(df_items, df_sales['OrderID'], product_id_lookup(df_products))
+        print(f"✓ Cleaned {len(df_items)} new order lines")
+
+    print("\n[5/5] Cleaning new delivery data...")
+    df_deliveries = clean_deliveries(validator.validate(df_deliveries, 'delivery_data'))
+    is_late = id_numbers(df_deliveries['OrderID'], 'ORD') <= state['max_order_id']
+    print(f"✓ Cleaned {len(df_deliveries)} new delivery records ({int(is_late.sum())} for earlier orders)")
+
+    print("\n" + "="*70)
+    print("APPENDING CLEANED DATA")
+    print("="*70)
+    partition_cols = PARTITION_COLUMNS if partition else None
+    df_master = build_master(df_sales, df_deliveries[~is_late], df_customers)
+    df_cube = load_cube(chunk_size)
+    product_ids = product_id_lookup(df_products)
+    has_items = df_items is not None and len(df_items) > 0
+    df_product_days = load_product_days(product_ids) if has_items else None
+    appends = [(df_sales, 'sales_clean', partition_cols), (df_deliveries, 'deliveries_clean', None),
+               (df_master, 'master_dataset', partition_cols)]
+    if df_items is not None:
+        appends.append((df_items, 'order_items_clean', None))
+    saved = [append_dataset(df, f'{PROCESSED_DIR}/{name}', storage_format, cols)
+             for df, name, cols in appends if len(df)]
+    if columnar:
+        saved += update_column_store(df_sales, df_deliveries, state['max_order_id'], flipped['CustomerID'])
+    for path in saved:
+        print(f"✓ Appended: {path}")
+
+    # Fix rows written by earlier runs
+    repeat_update = mark_repeat_customers(set(flipped['CustomerID']))
+    flip_partitions = _partitions(flipped['FirstOrderDateTime'])
+    late_partitions = _partitions(df_deliveries.loc[is_late, 'OrderDateTime'])
+    if len(flipped):
+        update_dataset(f'{PROCESSED_DIR}/sales_clean', repeat_update, chunk_size=chunk_size,
+                       partitions=flip_partitions)
+    filled = []
+    if len(flipped) or is_late.any():
+        update_dataset(f'{PROCESSED_DIR}/master_dataset',
+                       fill_late_deliveries(df_deliveries[is_late], repeat_update, filled), chunk_size=chunk_size,
+                       partitions=sorted(set(flip_partitions) | set(late_partitions)))
+    print(f"✓ Updated IsRepeatCustomer for {len(flipped)} customers with their second order")
+
+    # Late deliveries add to the cells of orders counted by earlier runs
+    late_cubes = [kpi_cube(rows, delivery_only=True) for rows in filled]
+    path = write_dataset(combine_cubes([df_cube, kpi_cube(df_master)] + late_cubes),
+                         f'{PROCESSED_DIR}/kpi_cube', storage_format)
+    print(f"✓ Updated: {path}")
+    if has_items:
+        df_product_days = combine_product_days(
+            [df_product_days, product_day_rollup(order_lines(df_items, df_sales, product_ids))])
+        path = write_dataset(df_product_days, f'{PROCESSED_DIR}/product_daily', storage_format)
+        print(f"✓ Updated: {path}")
+
+    if len(df_sales):
+        state['max_order_id'] = max(state['max_order_id'], int(id_numbers(df_sales['OrderID'], 'ORD').max()))
+        state['max_order_datetime'] = str(max(pd.Timestamp(state['max_order_datetime']),
+                                              df_sales['OrderDateTime'].max()))
+    state['files'] = advance_manifest(state['files'], manifest, pending)
+    save_state(state, df_counts, seen_deliveries, order_ids, storage_format)
+    mark_outputs_updated()
+    validation = validator.close()
+
+    print("\n" + "="*70)
+    print(f"✅ Incremental cleaning complete in {time.perf_counter() - start:.1f}s")
+    print(f"  - New orders: {len(df_sales):,}")
+    print(f"  - New deliveries: {len(df_deliveries):,}")
+    print(f"  - High-water mark: {state['max_order_datetime']} (OrderID {state['max_order_id']})")
+    print(f"  - Rows quarantined: {validation['rejected']:,} (see {REPORT_PATH})")
+    print("="*70)
 
 # ============================================================================
-# DATA QUALITY REPORT
+# PIPELINE STAGES
+# ============================================================================
+# One table per function, reading inputs from and writing outputs to disk, so
+# pipeline.py can cache them and run independent tables in parallel processes
+
+def read_processed(name, columns=None):
+    """A processed dataset with its datetime columns parsed (CSV stores them as text)"""
+    df = read_dataset(f'{PROCESSED_DIR}/{name}', columns=columns)
+    for column in DATETIME_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def validate_table(df, table, storage_format, key_sets=None):
+    """Validate one raw table and keep its part of the quality report"""
+    validator = Validator(storage_format)
+    validator.key_sets.update(key_sets or {})
+    df = validator.validate(df, table)
+    os.makedirs(QUALITY_PARTS_DIR, exist_ok=True)
+    validator.close(f'{QUALITY_PARTS_DIR}/{table}.json')
+    return df
+
+
+def stage_customers(storage_format='csv'):
+    """Validate, clean and save the customer table"""
+    df_customers = read_dataset(f'{RAW_DIR}/customer_data')
+    df_customers = clean_customers(validate_table(df_customers, 'customer_data', storage_format))
+    print(f"✓ Saved: {write_dataset(df_customers, f'{PROCESSED_DIR}/customers_clean', storage_format)}")
+    return {'rows': len(df_customers)}
+
+
+def stage_products(storage_format='csv'):
+    """Validate, clean and save the product table"""
+    df_products = read_dataset(f'{RAW_DIR}/product_data')
+    df_products = clean_products(validate_table(df_products, 'product_data', storage_format))
+    print(f"✓ Saved: {write_dataset(df_products, f'{PROCESSED_DIR}/products_clean', storage_format)}")
+    return {'rows': len(df_products)}
+
+
+def stage_sales(storage_format='csv', partition=False):
+    """Deduplicate, validate (against the cleaned customers), clean and save the sales"""
+    clear_state()
+    customers = key_set(read_processed('customers_clean', ['CustomerID'])['CustomerID'], 'CUST')
+    df_sales = read_dataset(f'{RAW_DIR}/sales_data')
+    initial_count = len(df_sales)
+    df_sales = drop_duplicate_ids(df_sales, 'OrderID')
+    print(f"  - Removed {initial_count - len(df_sales)} duplicate orders")
+    df_sales = clean_sales(validate_table(df_sales, 'sales_data', storage_format, {'customers': customers}))
+    partition_cols = PARTITION_COLUMNS if partition else None
+    print(f"✓ Saved: {write_dataset(df_sales, f'{PROCESSED_DIR}/sales_clean', storage_format, partition_cols)}")
+    return {'rows': len(df_sales)}
+
+
+def stage_deliveries(storage_format='csv'):
+    """Deduplicate, validate (against the cleaned orders), clean and save the deliveries"""
+    orders = key_set(read_processed('sales_clean', ['OrderID'])['OrderID'], 'ORD')
+    df_deliveries = read_dataset(f'{RAW_DIR}/delivery_data')
+    initial_count = len(df_deliveries)
+    df_deliveries = drop_duplicate_ids(df_deliveries, 'DeliveryID')
+    print(f"  - Removed {initial_count - len(df_deliveries)} duplicate deliveries")
+    df_deliveries = clean_deliveries(validate_table(df_deliveries, 'delivery_data', storage_format,
+                                                    {'orders': orders}))
+    print(f"✓ Saved: {write_dataset(df_deliveries, f'{PROCESSED_DIR}/deliveries_clean', storage_format)}")
+    return {'rows': len(df_deliveries)}
+
+
+def stage_order_items(storage_format='csv'):
+    """Validate (against the cleaned orders and products), clean and save the order lines"""
+    order_ids = read_processed('sales_clean', ['OrderID'])['OrderID']
+    key_sets = {
+        'orders': key_set(order_ids, 'ORD'),
+        'products': key_set(read_processed('products_clean', ['ProductID'])['ProductID'], 'PROD'),
+    }
+    df_items = validate_table(read_dataset(f'{RAW_DIR}/order_items'), 'order_items', storage_format, key_sets)
+    df_items = clean_order_items(df_items, order_ids,
+                                 product_id_lookup(read_processed('products_clean', ['ProductID'])))
+    print(f"✓ Saved: {write_dataset(df_items, f'{PROCESSED_DIR}/order_items_clean', storage_format)}")
+    return {'rows': len(df_items)}
+
+
+def stage_master(storage_format='csv', partition=False):
+    """Join the cleaned sales, deliveries and customers into the master dataset and KPI cube"""
+    df_master = build_master(read_processed('sales_clean'), read_processed('deliveries_clean'),
+                             read_processed('customers_clean'))
+    partition_cols = PARTITION_COLUMNS if partition else None
+    print(f"✓ Saved: {write_dataset(df_master, f'{PROCESSED_DIR}/master_dataset', storage_format, partition_cols)}")
+    df_cube = combine_cubes([kpi_cube(df_master)])
+    print(f"✓ Saved: {write_dataset(df_cube, f'{PROCESSED_DIR}/kpi_cube', storage_format)}")
+    return {'rows': len(df_master)}
+
+
+def stage_product_daily(storage_format='csv'):
+    """Roll the cleaned order lines up into revenue and margin per product per day"""
+    df_lines = order_lines(read_processed('order_items_clean'), read_processed('sales_clean', ['OrderID', 'OrderDate']),
+                           product_id_lookup(read_processed('products_clean', ['ProductID'])))
+    df_product_days = combine_product_days([product_day_rollup(df_lines)])
+    print(f"✓ Saved: {write_dataset(df_product_days, f'{PROCESSED_DIR}/product_daily', storage_format)}")
+    return {'rows': len(df_product_days)}
+
+
+def stage_report():
+    """Combine the validation reports of the table stages and print the data quality report"""
+    reports = []
+    for table in ['customer_data', 'product_data', 'sales_data', 'delivery_data', 'order_items']:
+        path = f'{QUALITY_PARTS_DIR}/{table}.json'
+        if os.path.isfile(path):
+            with open(path) as f:
+                reports.append(json.load(f))
+    validation = combine_reports(reports)
+    write_report(validation)
+
+    df_sales = read_processed('sales_clean', ['OrderID', 'OrderDate', 'OrderStatus', 'TotalAmount'])
+    df_deliveries = read_processed('deliveries_clean', ['IsOnTime', 'DeliveryTimeMinutes', 'DeliveryRating'])
+    df_deliveries['IsOnTime'] = df_deliveries['IsOnTime'].astype(bool)
+    names = ['customers_clean', 'products_clean', 'sales_clean', 'deliveries_clean', 'order_items_clean',
+             'product_daily', 'kpi_cube', 'master_dataset']
+    saved = [f'{PROCESSED_DIR}/{name}' for name in names if dataset_exists(f'{PROCESSED_DIR}/{name}')]
+    mark_outputs_updated()
+    print_quality_report(read_processed('customers_clean'), read_processed('products_clean'),
+                         sales_summary(df_sales), delivery_summary(df_deliveries), saved, validation)
+    return {'rows': validation['rows']}
+
 # ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Clean raw Blinkit data for Power BI')
+    parser.add_argument('--streaming', action='store_true',
+                        help='clean sales and deliveries in chunks with bounded memory')
+    parser.add_argument('--incremental', action='store_true',
+                        help='clean only orders and deliveries added since the last incremental run')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows per chunk in streaming mode')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the cleaned datasets (raw inputs are detected)')
+    parser.add_argument('--partition', action='store_true',
+                        help='partition sales and master datasets by Year/Month (one folder per month)')
+    parser.add_argument('--columnar', action='store_true',
+                        help=f'also append cleaned sales and deliveries to the memory-mapped store in '
+                             f'{column_store.STORE_DIR}/')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'also run under cProfile and save the stats in {METRICS_DIR}/')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - DATA CLEANING")
+    print("="*70)
+
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    if args.incremental:
+        run, options = run_incremental, (args.chunk_size, args.storage_format, args.partition, args.columnar)
+    elif args.streaming:
+        run, options = run_streaming, (args.chunk_size, args.storage_format, args.partition, args.columnar)
+    else:
+        run, options = run_batch, (args.storage_format, args.partition, args.columnar)
+    try:
+        if args.profile:
+            run_profiled(run, f'{METRICS_DIR}/data_cleaning.prof', *options)
+        else:
+            run(*options)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_generation.py first to generate sample data")
+        exit(1)
+    print_metrics(write_metrics('data_cleaning'))
+
 
-print("\n" + "="*70)
-print("DATA QUALITY REPORT")
-print("="*70)
-
-print(f"\nCustomers:")
-print(f"  - Total records: {len(df_customers):,}")
-print(f"  - Active customers: {df_customers['IsActive'].sum():,}")
-print(f"  - Unique cities: {df_customers['City'].nunique()}")
-
-print(f"\nProducts:")
-print(f"  - Total products: {len(df_products):,}")
-print(f"  - Active products: {df_products['IsActive'].sum():,}")
-print(f"  - Categories: {df_products['Category'].nunique()}")
-print(f"  - Out of stock: {(df_products['StockStatus'] == 'Out of Stock').sum()}")
-
-print(f"\nSales:")
-print(f"  - Total orders: {len(df_sales):,}")
-print(f"  - Completed orders: {(df_sales['OrderStatus'] == 'Completed').sum():,}")
-print(f"  - Total revenue: ₹{df_sales['TotalAmount'].sum():,.2f}")
-print(f"  - Average order value: ₹{df_sales['TotalAmount'].mean():.2f}")
-print(f"  - Date range: {df_sales['OrderDate'].min()} to {df_sales['OrderDate'].max()}")
-
-print(f"\nDeliveries:")
-print(f"  - Total deliveries: {len(df_deliveries):,}")
-print(f"  - On-time deliveries: {df_deliveries['IsOnTime'].sum():,} ({df_deliveries['IsOnTime'].mean()*100:.1f}%)")
-print(f"  - Average delivery time: {df_deliveries['DeliveryTimeMinutes'].mean():.1f} minutes")
-print(f"  - Average rating: {df_deliveries['DeliveryRating'].mean():.2f}/5")
-
-print("\n" + "="*70)
-print("✅ Data cleaning complete!")
-print("\nCleaned files are ready for Power BI import:")
-print("  - data/processed/master_dataset.csv (recommended)")
-print("  - data/processed/customers_clean.csv")
-print("  - data/processed/products_clean.csv")
-print("  - data/processed/sales_clean.csv")
-print("  - data/processed/deliveries_clean.csv")
-print("="*70)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
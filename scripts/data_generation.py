@@ -5,16 +5,15 @@ Generates realistic sample data for sales, customers, products, and deliveries
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from faker import Faker
 import random
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-# Initialize Faker
-fake = Faker('en_IN')
-Faker.seed(42)
-np.random.seed(42)
-random.seed(42)
+from instrumentation import METRICS_DIR, measure, print_metrics, run_profiled, timed, write_metrics
+from storage import FORMATS, remove_dataset, write_dataset
 
 # Configuration
 NUM_CUSTOMERS = 5000
@@ -22,15 +21,44 @@ NUM_PRODUCTS = 200
 NUM_ORDERS = 20000
 START_DATE = datetime(2023, 1, 1)
 END_DATE = datetime(2024, 12, 31)
+SEED = 42
+SHARD_SIZE = 1_000_000
+SCALE_FACTORS = [1, 10, 100, 1000]  # benchmark sizes, as multiples of the counts above
+
+# Order shape
+PEAK_HOURS = np.array([7, 8, 12, 13, 19, 20, 21])  # 7-9 AM, 12-2 PM, 7-10 PM
+ORDER_SIZE_WEIGHTS = [0.3, 0.25, 0.2, 0.12, 0.08, 0.03, 0.01, 0.01]  # 1-8 items per order
+DISCOUNT_RATES = np.array([0, 0, 0.05, 0.10, 0.15])
+ORDER_STATUSES = ['Completed', 'Completed', 'Completed', 'Cancelled']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Delivery shape
+DELIVERY_SEED = SEED + 1
+DELIVERY_MINUTES = np.arange(8, 26)  # 8-25 minutes
+DELIVERY_MINUTE_WEIGHTS = [0.05, 0.08, 0.12, 0.15, 0.18, 0.15, 0.12, 0.08, 0.04, 0.02,
+                           0.01, 0, 0, 0, 0, 0, 0, 0]
+ON_TIME_MINUTES = 15
+NUM_DELIVERY_PARTNERS = 50
+ON_TIME_RATINGS = np.array([4, 4, 5, 5, 5, 3])
+LATE_RATINGS = np.array([2, 3, 3, 4])
+
+
+def seed_generators(seed=SEED):
+    """Seed Faker, random and NumPy's global generator, which draw the customers and products"""
+    Faker.seed(seed)
+    np.random.seed(seed)
+    random.seed(seed)
 
-print("="*70)
-print("BLINKIT ANALYSIS DASHBOARD - DATA GENERATOR")
-print("="*70)
+
+# Initialize Faker
+fake = Faker('en_IN')
+seed_generators()
 
 # ============================================================================
 # 1. GENERATE CUSTOMER DATA
 # ============================================================================
 
+@timed
 def generate_customers(num_customers):
     """Generate customer data"""
     print(f"\n[1/4] Generating {num_customers} customers...")
@@ -65,6 +93,7 @@ def generate_customers(num_customers):
 # 2. GENERATE PRODUCT DATA
 # ============================================================================
 
+@timed
 def generate_products(num_products):
     """Generate product catalog"""
     print(f"\n[2/4] Generating {num_products} products...")
@@ -121,162 +150,397 @@ def generate_products(num_products):
 # 3. GENERATE SALES DATA
 # ============================================================================
 
-def generate_sales(num_orders, df_customers, df_products):
-    """Generate sales transactions"""
-    print(f"\n[3/4] Generating {num_orders} sales transactions...")
+def _format_ids(prefix, numbers, width):
+    """Format an array of integers as zero-padded string IDs (e.g. ORD000001)"""
+    padded = np.char.zfill(np.asarray(numbers).astype(str), width)
+    return np.char.add(prefix, padded).astype(object)
+
+
+def _draw_order_items(rng, num_items, num_products):
+    """Draw distinct products and quantities for every order line at once"""
+    order_index = np.repeat(np.arange(len(num_items)), num_items)
+    product_index = rng.integers(0, num_products, size=len(order_index))
     
-    orders = []
-    
-    # Peak hours: 7-9 AM, 12-2 PM, 7-10 PM
-    peak_hours = [7, 8, 12, 13, 19, 20, 21]
-    
-    for i in range(num_orders):
-        # Random date with higher probability on weekends
-        order_date = fake.date_time_between(start_date=START_DATE, end_date=END_DATE)
-        
-        # Increase weekend orders
-        if order_date.weekday() >= 5:  # Saturday or Sunday
-            if random.random() < 0.3:  # Skip 30% to balance
-                continue
-        
-        # Peak hour probability
-        hour = random.choice(peak_hours) if random.random() < 0.6 else random.randint(6, 23)
-        order_datetime = order_date.replace(hour=hour, minute=random.randint(0, 59))
-        
-        # Select customer
-        customer = df_customers.sample(1).iloc[0]
-        
-        # Number of items (1-8 items per order)
-        num_items = np.random.choice([1, 2, 3, 4, 5, 6, 7, 8], 
-                                     p=[0.3, 0.25, 0.2, 0.12, 0.08, 0.03, 0.01, 0.01])
-        
-        # Select products
-        products = df_products.sample(num_items)
-        
-        # Calculate order details
-        subtotal = sum(products['Price'] * np.random.randint(1, 4, size=len(products)))
-        delivery_fee = 0 if subtotal > 200 else 20
-        discount = round(subtotal * random.choice([0, 0, 0.05, 0.10, 0.15]), 2)
-        total_amount = round(subtotal + delivery_fee - discount, 2)
-        
-        order = {
-            'OrderID': f'ORD{i+1:06d}',
-            'CustomerID': customer['CustomerID'],
-            'OrderDateTime': order_datetime,
-            'OrderDate': order_datetime.date(),
-            'OrderTime': order_datetime.time(),
-            'OrderHour': hour,
-            'DayOfWeek': order_datetime.strftime('%A'),
-            'IsWeekend': order_datetime.weekday() >= 5,
-            'NumItems': num_items,
-            'Subtotal': round(subtotal, 2),
-            'DeliveryFee': delivery_fee,
-            'Discount': discount,
-            'TotalAmount': total_amount,
-            'PaymentMethod': customer['PreferredPaymentMethod'],
-            'OrderStatus': random.choice(['Completed', 'Completed', 'Completed', 'Cancelled']),
-            'City': customer['City'],
-            'Area': customer['Area']
-        }
-        orders.append(order)
+    # Orders hold at most 8 lines, so comparing each line with the previous
+    # seven finds every repeated product; redraw those until orders are distinct
+    max_items = int(num_items.max()) if len(num_items) else 0
+    while True:
+        repeated = np.zeros(len(order_index), dtype=bool)
+        for lag in range(1, max_items):
+            same_order = order_index[lag:] == order_index[:-lag]
+            same_product = product_index[lag:] == product_index[:-lag]
+            repeated[lag:] |= same_order & same_product
+        if not repeated.any():
+            break
+        product_index[repeated] = rng.integers(0, num_products, size=int(repeated.sum()))
+    
+    quantity = rng.integers(1, 4, size=len(order_index))
+    return order_index, product_index, quantity
+
+
+@timed
+def _draw_orders(rng, num_orders, num_customers, num_products):
+    """Draw every random attribute of a batch of orders as whole arrays"""
+    # Random order timestamps between START_DATE and END_DATE
+    span_seconds = int((END_DATE - START_DATE).total_seconds())
+    offsets = rng.integers(0, span_seconds, size=num_orders)
+    order_days = (np.datetime64(START_DATE, 's') + offsets.astype('timedelta64[s]')).astype('datetime64[D]')
+    weekday = (order_days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    
+    # Skip 30% of weekend orders to balance
+    keep = ~((weekday >= 5) & (rng.random(num_orders) < 0.3))
+    
+    # Peak hour probability
+    is_peak = rng.random(num_orders) < 0.6
+    hour = np.where(is_peak, rng.choice(PEAK_HOURS, size=num_orders), rng.integers(6, 24, size=num_orders))
+    minute = rng.integers(0, 60, size=num_orders)
+    
+    # Select customers, basket sizes, discounts and statuses
+    customer_index = rng.integers(0, num_customers, size=num_orders)
+    num_items = rng.choice(np.arange(1, 9), size=num_orders, p=ORDER_SIZE_WEIGHTS)
+    num_items = np.minimum(num_items, num_products)
+    discount_rate = rng.choice(DISCOUNT_RATES, size=num_orders)
+    is_cancelled = rng.integers(0, len(ORDER_STATUSES), size=num_orders) == ORDER_STATUSES.index('Cancelled')
+    
+    orders = {
+        'order_number': np.flatnonzero(keep) + 1,
+        'order_day': order_days[keep],
+        'weekday': weekday[keep],
+        'hour': hour[keep],
+        'second_of_day': (hour * 3600 + minute * 60 + offsets % 60)[keep],
+        'customer_index': customer_index[keep],
+        'num_items': num_items[keep],
+        'discount_rate': discount_rate[keep],
+        'is_cancelled': is_cancelled[keep],
+    }
+    
+    # Select products for every order line
+    orders['line_order_index'], orders['line_product_index'], orders['line_quantity'] = \
+        _draw_order_items(rng, orders['num_items'], num_products)
+    return orders
+
+
+@timed
+def _sales_frame(orders, df_customers, df_products, customer_order_counts, order_id_offset=0):
+    """Calculate order amounts and build the sales DataFrame column-wise"""
+    customer_index = orders['customer_index']
+    num_items = orders['num_items']
     
-    df_sales = pd.DataFrame(orders)
+    # Calculate order details
+    prices = df_products['Price'].to_numpy(dtype=float)
+    line_amount = prices[orders['line_product_index']] * orders['line_quantity']
+    subtotal = np.bincount(orders['line_order_index'], weights=line_amount, minlength=len(num_items))
+    delivery_fee = np.where(subtotal > 200, 0, 20)
+    discount = np.round(subtotal * orders['discount_rate'], 2)
+    total_amount = np.round(subtotal + delivery_fee - discount, 2)
+    
+    order_day = orders['order_day']
+    second_of_day = orders['second_of_day']
+    order_datetime = order_day.astype('datetime64[s]') + second_of_day.astype('timedelta64[s]')
+    order_times = np.array([f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in range(86400)], dtype=object)
+    
+    return pd.DataFrame({
+        'OrderID': _format_ids('ORD', orders['order_number'] + order_id_offset, 6),
+        'CustomerID': df_customers['CustomerID'].to_numpy()[customer_index],
+        'OrderDateTime': pd.to_datetime(order_datetime),
+        'OrderDate': pd.to_datetime(order_day),
+        'OrderTime': order_times[second_of_day],
+        'OrderHour': orders['hour'],
+        'DayOfWeek': pd.Categorical.from_codes(orders['weekday'], categories=DAY_NAMES),
+        'IsWeekend': orders['weekday'] >= 5,
+        'NumItems': num_items,
+        'Subtotal': np.round(subtotal, 2),
+        'DeliveryFee': delivery_fee,
+        'Discount': discount,
+        'TotalAmount': total_amount,
+        'PaymentMethod': df_customers['PreferredPaymentMethod'].to_numpy()[customer_index],
+        'OrderStatus': pd.Categorical.from_codes(orders['is_cancelled'].astype(np.int8),
+                                                 categories=['Completed', 'Cancelled']),
+        'City': df_customers['City'].to_numpy()[customer_index],
+        'Area': df_customers['Area'].to_numpy()[customer_index],
+        'IsRepeatCustomer': customer_order_counts[customer_index] > 1,
+    })
+
+
+@timed
+def _order_items_frame(orders, df_products, order_id_offset=0):
+    """Order lines with integer keys: OrderKey/ProductKey are the numbers in OrderID/ProductID"""
+    product_index = orders['line_product_index']
+    product_keys = df_products['ProductID'].str.slice(len('PROD')).astype(np.int32).to_numpy()
+    order_keys = (orders['order_number'] + order_id_offset).astype(np.int32)
+    return pd.DataFrame({
+        'OrderKey': order_keys[orders['line_order_index']],
+        'ProductKey': product_keys[product_index],
+        'Quantity': orders['line_quantity'].astype(np.int8),
+        'UnitPrice': df_products['Price'].to_numpy(dtype=float)[product_index],
+        'UnitCost': df_products['CostPrice'].to_numpy(dtype=float)[product_index],
+    })
+
+
+@timed
+def generate_sales(num_orders, df_customers, df_products, seed=SEED, return_items=False):
+    """Generate sales transactions; with return_items=True, also their order lines as (df_sales, df_order_items)"""
+    print(f"\n[3/4] Generating {num_orders} sales transactions...")
+    
+    rng = np.random.default_rng(seed)
+    orders = _draw_orders(rng, num_orders, len(df_customers), len(df_products))
     
     # Add repeat customer flag
-    customer_order_counts = df_sales.groupby('CustomerID').size()
-    df_sales['IsRepeatCustomer'] = df_sales['CustomerID'].map(
-        lambda x: customer_order_counts[x] > 1
-    )
+    customer_order_counts = np.bincount(orders['customer_index'], minlength=len(df_customers))
+    df_sales = _sales_frame(orders, df_customers, df_products, customer_order_counts)
     
     print(f"✓ Generated {len(df_sales)} sales transactions")
     print(f"  - Average order value: ₹{df_sales['TotalAmount'].mean():.2f}")
     print(f"  - Total revenue: ₹{df_sales['TotalAmount'].sum():,.2f}")
-    return df_sales
+    if not return_items:
+        return df_sales
+    
+    df_order_items = _order_items_frame(orders, df_products)
+    print(f"  - Order lines: {len(df_order_items)}")
+    return df_sales, df_order_items
 
 # ============================================================================
 # 4. GENERATE DELIVERY DATA
 # ============================================================================
 
-def generate_deliveries(df_sales):
+@timed
+def generate_deliveries(df_sales, seed=DELIVERY_SEED, verbose=True):
     """Generate delivery data"""
-    print(f"\n[4/4] Generating delivery data...")
-    
-    deliveries = []
-    
-    for _, order in df_sales.iterrows():
-        if order['OrderStatus'] == 'Completed':
-            # Delivery time: 8-25 minutes
-            delivery_minutes = np.random.choice(
-                range(8, 26),
-                p=[0.05, 0.08, 0.12, 0.15, 0.18, 0.15, 0.12, 0.08, 0.04, 0.02, 
-                   0.01, 0, 0, 0, 0, 0, 0, 0]
-            )
-            
-            delivery_datetime = order['OrderDateTime'] + timedelta(minutes=delivery_minutes)
-            
-            # On-time if delivered within 15 minutes
-            is_on_time = delivery_minutes <= 15
-            
-            delivery = {
-                'DeliveryID': f'DEL{order["OrderID"][3:]}',
-                'OrderID': order['OrderID'],
-                'CustomerID': order['CustomerID'],
-                'OrderDateTime': order['OrderDateTime'],
-                'DeliveryDateTime': delivery_datetime,
-                'DeliveryTimeMinutes': delivery_minutes,
-                'IsOnTime': is_on_time,
-                'DeliveryPartnerID': f'DP{random.randint(1, 50):03d}',
-                'DeliveryRating': random.choice([4, 4, 5, 5, 5, 3]) if is_on_time else random.choice([2, 3, 3, 4]),
-                'City': order['City'],
-                'Area': order['Area'],
-                'DeliveryStatus': 'Delivered'
-            }
-            deliveries.append(delivery)
+    if verbose:
+        print(f"\n[4/4] Generating delivery data...")
+    
+    rng = np.random.default_rng(seed)
+    completed = df_sales[(df_sales['OrderStatus'] == 'Completed').to_numpy()]
+    num_deliveries = len(completed)
+    
+    # Delivery time: 8-25 minutes, on-time if delivered within 15 minutes
+    delivery_minutes = rng.choice(DELIVERY_MINUTES, size=num_deliveries, p=DELIVERY_MINUTE_WEIGHTS)
+    is_on_time = delivery_minutes <= ON_TIME_MINUTES
+    partner_numbers = rng.integers(1, NUM_DELIVERY_PARTNERS + 1, size=num_deliveries)
     
-    df_deliveries = pd.DataFrame(deliveries)
-    print(f"✓ Generated {len(df_deliveries)} delivery records")
-    print(f"  - Average delivery time: {df_deliveries['DeliveryTimeMinutes'].mean():.1f} minutes")
-    print(f"  - On-time delivery rate: {(df_deliveries['IsOnTime'].sum() / len(df_deliveries) * 100):.1f}%")
+    # One uniform draw per delivery picks from the on-time or late rating pool
+    u = rng.random(num_deliveries)
+    ratings = np.where(is_on_time,
+                       ON_TIME_RATINGS[(u * len(ON_TIME_RATINGS)).astype(np.int64)],
+                       LATE_RATINGS[(u * len(LATE_RATINGS)).astype(np.int64)])
+    
+    order_datetime = completed['OrderDateTime'].to_numpy()
+    df_deliveries = pd.DataFrame({
+        'DeliveryID': ('DEL' + completed['OrderID'].str.slice(3)).to_numpy(),
+        'OrderID': completed['OrderID'].to_numpy(),
+        'CustomerID': completed['CustomerID'].to_numpy(),
+        'OrderDateTime': order_datetime,
+        'DeliveryDateTime': order_datetime + delivery_minutes.astype('timedelta64[m]'),
+        'DeliveryTimeMinutes': delivery_minutes,
+        'IsOnTime': is_on_time,
+        'DeliveryPartnerID': _format_ids('DP', partner_numbers, 3),
+        'DeliveryRating': ratings,
+        'City': completed['City'].to_numpy(),
+        'Area': completed['Area'].to_numpy(),
+        'DeliveryStatus': 'Delivered',
+    })
+    
+    if verbose:
+        print(f"✓ Generated {len(df_deliveries)} delivery records")
+        print(f"  - Average delivery time: {df_deliveries['DeliveryTimeMinutes'].mean():.1f} minutes")
+        print(f"  - On-time delivery rate: {(df_deliveries['IsOnTime'].sum() / len(df_deliveries) * 100):.1f}%")
     return df_deliveries
 
+# ============================================================================
+# 5. SHARDED GENERATION
+# ============================================================================
+
+# Settings shared with pool workers by _init_shard_worker
+_shard_context = {}
+
+
+def shard_seeds(seed, shard):
+    """Derive independent (sales, deliveries) seed sequences for one shard"""
+    return np.random.SeedSequence([seed, shard]).spawn(2)
+
+
+def _init_shard_worker(context):
+    """Process-pool initializer: share customers, products and settings"""
+    _shard_context.update(context)
+
+
+def _draw_shard_orders(shard):
+    """Draw the orders of one shard from its own seed"""
+    ctx = _shard_context
+    sales_seed, _ = shard_seeds(ctx['seed'], shard)
+    size = min(ctx['shard_size'], ctx['num_orders'] - shard * ctx['shard_size'])
+    return _draw_orders(np.random.default_rng(sales_seed), size, len(ctx['customers']), len(ctx['products']))
+
+
+def _count_shard_customers(shard):
+    """First pass: per-customer order counts of one shard"""
+    orders = _draw_shard_orders(shard)
+    return np.bincount(orders['customer_index'], minlength=len(_shard_context['customers']))
+
+
+def _write_shard(shard):
+    """Second pass: generate one shard and write its part files"""
+    ctx = _shard_context
+    orders = _draw_shard_orders(shard)
+    df_sales = _sales_frame(orders, ctx['customers'], ctx['products'], ctx['customer_order_counts'],
+                            order_id_offset=shard * ctx['shard_size'])
+    df_order_items = _order_items_frame(orders, ctx['products'], order_id_offset=shard * ctx['shard_size'])
+    _, delivery_seed = shard_seeds(ctx['seed'], shard)
+    df_deliveries = generate_deliveries(df_sales, seed=delivery_seed, verbose=False)
+    
+    part = f'part-{shard:05d}'
+    fmt = ctx['storage_format']
+    write_dataset(df_sales, os.path.join('data/raw/sales_data', part), fmt)
+    write_dataset(df_deliveries, os.path.join('data/raw/delivery_data', part), fmt)
+    write_dataset(df_order_items, os.path.join('data/raw/order_items', part), fmt)
+    df_consolidated = df_sales.merge(df_deliveries, on='OrderID', how='left', suffixes=('', '_delivery'))
+    write_dataset(df_consolidated, os.path.join('data/processed/blinkit_consolidated', part), fmt)
+    
+    return {
+        'orders': len(df_sales),
+        'order_lines': len(df_order_items),
+        'deliveries': len(df_deliveries),
+        'revenue': df_sales['TotalAmount'].sum(),
+        'min_date': df_sales['OrderDate'].min(),
+        'max_date': df_sales['OrderDate'].max(),
+    }
+
+
+@timed
+def generate_sharded(num_orders, df_customers, df_products, shard_size=SHARD_SIZE, workers=None, seed=SEED,
+                     storage_format='csv'):
+    """Generate sales and deliveries shard by shard in a process pool, streaming part files to disk"""
+    num_shards = -(-num_orders // shard_size)
+    print(f"\n[3/4] Generating {num_orders} sales transactions in {num_shards} shards of {shard_size}...")
+    
+    for stem in ['data/raw/sales_data', 'data/raw/delivery_data', 'data/raw/order_items',
+                 'data/processed/blinkit_consolidated']:
+        remove_dataset(stem)
+        os.makedirs(stem)
+    
+    context = {
+        'customers': df_customers,
+        'products': df_products,
+        'num_orders': num_orders,
+        'shard_size': shard_size,
+        'seed': seed,
+        'storage_format': storage_format,
+    }
+    
+    # IsRepeatCustomer needs order counts over all shards, so count them first
+    customer_order_counts = np.zeros(len(df_customers), dtype=np.int64)
+    with ProcessPoolExecutor(workers, initializer=_init_shard_worker, initargs=(context,)) as pool:
+        for shard_counts in pool.map(_count_shard_customers, range(num_shards)):
+            customer_order_counts += shard_counts
+    
+    print(f"\n[4/4] Writing sales and delivery part files...")
+    context['customer_order_counts'] = customer_order_counts
+    summaries = []
+    with ProcessPoolExecutor(workers, initializer=_init_shard_worker, initargs=(context,)) as pool:
+        for shard, summary in enumerate(pool.map(_write_shard, range(num_shards))):
+            summaries.append(summary)
+            print(f"  - part-{shard:05d}: {summary['orders']:,} orders, {summary['deliveries']:,} deliveries")
+    
+    print(f"✓ Generated {sum(s['orders'] for s in summaries)} sales transactions")
+    return summaries
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 
-def main():
-    """Main execution function"""
+def parse_args():
+    """Command-line options"""
+    parser = argparse.ArgumentParser(description='Generate sample Blinkit data')
+    parser.add_argument('--scale', type=int, default=1,
+                        help=f'multiply the default {NUM_CUSTOMERS:,} customers, {NUM_PRODUCTS} products '
+                             f'and {NUM_ORDERS:,} orders (e.g. {SCALE_FACTORS})')
+    parser.add_argument('--orders', type=int, default=None, help='number of orders to draw (default: scaled)')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed for the generated data')
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help='write orders as part files of this many orders, generated in parallel')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for sharded generation (default: all CPUs)')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the generated datasets')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'also run under cProfile and save the stats in {METRICS_DIR}/')
+    return parser.parse_args()
+
+
+def main_sharded(num_orders, df_customers, df_products, shard_size, workers=None, seed=SEED, storage_format='csv'):
+    """Sharded mode: orders and deliveries are streamed to part files"""
+    summaries = generate_sharded(num_orders, df_customers, df_products,
+                                 shard_size=shard_size, workers=workers, seed=seed,
+                                 storage_format=storage_format)
     
+    print("\n" + "="*70)
+    print("DATA GENERATION SUMMARY")
+    print("="*70)
+    print(f"Customers:     {len(df_customers):,}")
+    print(f"Products:      {len(df_products):,}")
+    print(f"Orders:        {sum(s['orders'] for s in summaries):,}")
+    print(f"Order lines:   {sum(s['order_lines'] for s in summaries):,}")
+    print(f"Deliveries:    {sum(s['deliveries'] for s in summaries):,}")
+    print(f"Total Revenue: ₹{sum(s['revenue'] for s in summaries):,.2f}")
+    print(f"Date Range:    {min(s['min_date'] for s in summaries).date()} to {max(s['max_date'] for s in summaries).date()}")
+    print(f"Part files:    {len(summaries)} per dataset in data/raw/sales_data/ and data/raw/delivery_data/")
+    print("="*70)
+
+
+def scaled_sizes(scale=1):
+    """Customers, products and orders of a dataset scale times the default size"""
+    return NUM_CUSTOMERS * scale, NUM_PRODUCTS * scale, NUM_ORDERS * scale
+
+
+def run(num_orders=NUM_ORDERS, seed=SEED, shard_size=None, workers=None, storage_format='csv',
+        num_customers=NUM_CUSTOMERS, num_products=NUM_PRODUCTS):
+    """Generate every raw dataset (sharded into part files when shard_size is given)"""
     # Create directories
     os.makedirs('data/raw', exist_ok=True)
     os.makedirs('data/processed', exist_ok=True)
     
+    # Reseed here rather than rely on the import: a forked worker (pipeline stages) starts with a reseeded random
+    seed_generators(seed)
+    
     # Generate data
-    df_customers = generate_customers(NUM_CUSTOMERS)
-    df_products = generate_products(NUM_PRODUCTS)
-    df_sales = generate_sales(NUM_ORDERS, df_customers, df_products)
-    df_deliveries = generate_deliveries(df_sales)
+    df_customers = generate_customers(num_customers)
+    df_products = generate_products(num_products)
+    
+    fmt = storage_format
+    customers_path = write_dataset(df_customers, 'data/raw/customer_data', fmt)
+    products_path = write_dataset(df_products, 'data/raw/product_data', fmt)
+    
+    if shard_size:
+        main_sharded(num_orders, df_customers, df_products, shard_size, workers, seed, fmt)
+        return
+    
+    df_sales, df_order_items = generate_sales(num_orders, df_customers, df_products, seed=seed,
+                                               return_items=True)
+    df_deliveries = generate_deliveries(df_sales, seed=seed + 1)
     
     # Save raw data
     print("\n" + "="*70)
     print("SAVING DATA FILES")
     print("="*70)
     
-    df_customers.to_csv('data/raw/customer_data.csv', index=False)
-    print("✓ Saved: data/raw/customer_data.csv")
+    print(f"✓ Saved: {customers_path}")
+    print(f"✓ Saved: {products_path}")
     
-    df_products.to_csv('data/raw/product_data.csv', index=False)
-    print("✓ Saved: data/raw/product_data.csv")
+    path = write_dataset(df_sales, 'data/raw/sales_data', fmt)
+    print(f"✓ Saved: {path}")
     
-    df_sales.to_csv('data/raw/sales_data.csv', index=False)
-    print("✓ Saved: data/raw/sales_data.csv")
+    path = write_dataset(df_deliveries, 'data/raw/delivery_data', fmt)
+    print(f"✓ Saved: {path}")
     
-    df_deliveries.to_csv('data/raw/delivery_data.csv', index=False)
-    print("✓ Saved: data/raw/delivery_data.csv")
+    path = write_dataset(df_order_items, 'data/raw/order_items', fmt)
+    print(f"✓ Saved: {path}")
     
     # Create consolidated dataset
-    df_consolidated = df_sales.merge(df_deliveries, on='OrderID', how='left', suffixes=('', '_delivery'))
-    df_consolidated.to_csv('data/processed/blinkit_consolidated.csv', index=False)
-    print("✓ Saved: data/processed/blinkit_consolidated.csv")
+    with measure('merge consolidated') as step:
+        df_consolidated = df_sales.merge(df_deliveries, on='OrderID', how='left', suffixes=('', '_delivery'))
+        step.rows = len(df_consolidated)
+    path = write_dataset(df_consolidated, 'data/processed/blinkit_consolidated', fmt)
+    print(f"✓ Saved: {path}")
     
     # Summary statistics
     print("\n" + "="*70)
@@ -285,9 +549,10 @@ def main():
     print(f"Customers:     {len(df_customers):,}")
     print(f"Products:      {len(df_products):,}")
     print(f"Orders:        {len(df_sales):,}")
+    print(f"Order lines:   {len(df_order_items):,}")
     print(f"Deliveries:    {len(df_deliveries):,}")
     print(f"Total Revenue: ₹{df_sales['TotalAmount'].sum():,.2f}")
-    print(f"Date Range:    {df_sales['OrderDate'].min()} to {df_sales['OrderDate'].max()}")
+    print(f"Date Range:    {df_sales['OrderDate'].min().date()} to {df_sales['OrderDate'].max().date()}")
     print("="*70)
     print("\n✅ Data generation complete! Files saved in data/ directory")
     print("\nNext steps:")
@@ -295,5 +560,23 @@ def main():
     print("2. Import the CSV files from data/raw/")
     print("3. Create relationships and build visualizations")
 
+
+def main():
+    """Main execution function"""
+    args = parse_args()
+    
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - DATA GENERATOR")
+    print("="*70)
+    
+    num_customers, num_products, num_orders = scaled_sizes(args.scale)
+    options = (args.orders or num_orders, args.seed, args.shard_size, args.workers, args.storage_format,
+               num_customers, num_products)
+    if args.profile:
+        run_profiled(run, f'{METRICS_DIR}/data_generation.prof', *options)
+    else:
+        run(*options)
+    print_metrics(write_metrics('data_generation'))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
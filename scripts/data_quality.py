@@ -0,0 +1,311 @@
+"""
+Blinkit Analysis Dashboard - Data Quality Rules
+Declarative validation rules for the raw tables, evaluated chunk by chunk as
+they are cleaned: failing rows are quarantined and every run writes a JSON report
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import os
+import time
+
+from instrumentation import measure
+from storage import DATETIME_COLUMNS, DatasetWriter, append_dataset, remove_dataset
+
+REJECTS_DIR = 'data/processed/rejects'
+REPORT_PATH = 'data/processed/quality_report.json'
+
+SEVERITIES = ['reject', 'warn']  # reject: quarantine the row, warn: count it and keep it
+BALANCE_TOLERANCE = 0.01  # rupees of rounding allowed in amount reconciliations
+EXAMPLES = 5  # failing IDs listed per rule in the report
+
+# ID column shown as examples in the report
+KEY_COLUMNS = {
+    'customer_data': 'CustomerID',
+    'product_data': 'ProductID',
+    'sales_data': 'OrderID',
+    'delivery_data': 'DeliveryID',
+    'order_items': 'OrderKey',
+}
+
+# ============================================================================
+# RULES
+# ============================================================================
+
+class Rule:
+    """A named check; test(df, key_sets) returns True for the rows that pass.
+
+    numeric: its columns hold numbers, so validated rows come back with them parsed
+    """
+
+    def __init__(self, name, columns, test, severity='reject', numeric=False):
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity '{severity}', expected one of {SEVERITIES}")
+        self.name = name
+        self.columns = columns
+        self.test = test
+        self.severity = severity
+        self.numeric = numeric
+
+    def passes(self, df, key_sets):
+        """Boolean mask of the rows that pass"""
+        return np.asarray(self.test(df, key_sets), dtype=bool)
+
+
+def _numbers(values):
+    """Numeric values (NaN where a CSV cell did not parse as a number)"""
+    return pd.to_numeric(values, errors='coerce')
+
+
+def not_null(column, severity='reject'):
+    """Value present (datetimes must also parse)"""
+    return Rule(f'{column} is not null', [column], lambda df, key_sets: df[column].notna(), severity)
+
+
+def greater_than(column, value, severity='reject'):
+    """Value strictly above a bound"""
+    return Rule(f'{column} > {value}', [column], lambda df, key_sets: _numbers(df[column]) > value, severity,
+                numeric=True)
+
+
+def between(column, low, high=None, allow_null=False, severity='reject'):
+    """Value within [low, high] (no upper bound when high is None)"""
+    name = f'{column} >= {low}' if high is None else f'{low} <= {column} <= {high}'
+    if allow_null:
+        name += ' or null'
+
+    def test(df, key_sets):
+        values = _numbers(df[column])
+        inside = values >= low if high is None else values.between(low, high)
+        return inside | values.isna() if allow_null else inside
+    return Rule(name, [column], test, severity, numeric=True)
+
+
+def one_of(column, values, severity='reject'):
+    """Value from a fixed list"""
+    return Rule(f'{column} in {values}', [column], lambda df, key_sets: df[column].isin(values), severity)
+
+
+def ordered(earlier, later, severity='reject'):
+    """One column never before another (both present)"""
+    return Rule(f'{later} >= {earlier}', [earlier, later], lambda df, key_sets: df[later] >= df[earlier], severity)
+
+
+def balances(total, plus, minus=(), tolerance=BALANCE_TOLERANCE, severity='reject'):
+    """total equals the sum of the plus columns minus the minus columns"""
+    name = ' + '.join(plus) + ''.join(f' - {column}' for column in minus) + f' = {total}'
+
+    def test(df, key_sets):
+        difference = _numbers(df[total]).to_numpy(dtype=float, na_value=np.nan)
+        for column in plus:
+            difference = difference - _numbers(df[column]).to_numpy(dtype=float, na_value=np.nan)
+        for column in minus:
+            difference = difference + _numbers(df[column]).to_numpy(dtype=float, na_value=np.nan)
+        return np.abs(difference) <= tolerance
+    return Rule(name, [total, *plus, *minus], test, severity, numeric=True)
+
+
+def references(column, key_set, numeric=False, severity='reject'):
+    """Value found in a key set of another table (formatted IDs, or their numbers when numeric)"""
+    def test(df, key_sets):
+        if numeric:
+            return key_sets[key_set].contains_numbers(_numbers(df[column]).fillna(-1).to_numpy())
+        return key_sets[key_set].contains(df[column])
+    return Rule(f'{column} in {key_set}', [column], test, severity, numeric=numeric)
+
+
+# Rules per raw table; key sets: customers, products and orders (kept, cleaned rows)
+RULES = {
+    'customer_data': [
+        not_null('CustomerID'),
+        not_null('RegistrationDate'),
+        not_null('City', severity='warn'),
+    ],
+    'product_data': [
+        not_null('ProductID'),
+        greater_than('Price', 0),
+        greater_than('CostPrice', 0),
+        ordered('CostPrice', 'Price', severity='warn'),
+        between('StockQuantity', 0, allow_null=True, severity='warn'),
+    ],
+    'sales_data': [
+        not_null('OrderID'),
+        not_null('OrderDateTime'),
+        references('CustomerID', 'customers'),
+        greater_than('TotalAmount', 0),
+        balances('TotalAmount', ['Subtotal', 'DeliveryFee'], ['Discount']),
+        between('OrderHour', 0, 23),
+        one_of('OrderStatus', ['Completed', 'Cancelled'], severity='warn'),
+    ],
+    'delivery_data': [
+        not_null('DeliveryID'),
+        references('OrderID', 'orders'),
+        greater_than('DeliveryTimeMinutes', 0),
+        ordered('OrderDateTime', 'DeliveryDateTime'),
+        between('DeliveryRating', 1, 5, severity='warn'),
+    ],
+    'order_items': [
+        references('OrderKey', 'orders', numeric=True),
+        references('ProductKey', 'products', numeric=True),
+        greater_than('Quantity', 0),
+        greater_than('UnitPrice', 0),
+    ],
+}
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def failed_rules(failures, rows):
+    """'; '-joined names of the rules each row failed"""
+    reasons = pd.Series('', index=range(rows), dtype=object)
+    for name, failed in failures.items():
+        reasons[failed] = reasons[failed] + f'{name}; '
+    return reasons.str.slice(0, -2).to_numpy()
+
+
+class Validator:
+    """Applies RULES to raw chunks, quarantining rows that fail a reject rule.
+
+    key_sets maps the names used by references() to objects with contains(ids)
+    and contains_numbers(numbers), such as data_cleaning.SeenIdSet.
+    """
+
+    def __init__(self, storage_format='csv', append=False, rules=None, rejects_dir=REJECTS_DIR):
+        self.storage_format = storage_format
+        self.append = append
+        self.rules = rules or RULES
+        self.rejects_dir = rejects_dir
+        self.key_sets = {}
+        self.tables = {}
+        self._writers = {}
+
+    def _table_stats(self, table):
+        """Running counts of one table, created on first use (replacing its old rejects unless appending)"""
+        if table not in self.tables:
+            if not self.append:
+                remove_dataset(f'{self.rejects_dir}/{table}')
+            self.tables[table] = {
+                'rows': 0, 'rejected': 0, 'seconds': 0.0,
+                'rules': {rule.name: {'severity': rule.severity, 'failed': 0, 'seconds': 0.0, 'examples': []}
+                          for rule in self.rules[table]},
+            }
+        return self.tables[table]
+
+    def validate(self, df, table):
+        """Rows of df passing every reject rule, with rule datetimes and numbers parsed; the rest are quarantined"""
+        with measure(f'validate {table}', rows=len(df)):
+            start = time.perf_counter()
+            stats = self._table_stats(table)
+            rules = self.rules[table]
+            columns = dict.fromkeys(column for rule in rules for column in rule.columns)
+            numeric = {column for rule in rules if rule.numeric for column in rule.columns}
+            parsed = {column: pd.to_datetime(df[column], errors='coerce') for column in columns
+                      if column in DATETIME_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[column])}
+            # Numbers read as text (a CSV column with a malformed cell) would break the cleaning steps after this
+            numbers = [column for column in columns
+                       if column in numeric and not pd.api.types.is_numeric_dtype(df[column])]
+            parsed.update({column: _numbers(df[column]) for column in numbers})
+            view = df.assign(**parsed) if parsed else df
+
+            rejected = np.zeros(len(df), dtype=bool)
+            failures = {}
+            for rule in rules:
+                rule_start = time.perf_counter()
+                failed = ~rule.passes(view, self.key_sets)
+                rule_stats = stats['rules'][rule.name]
+                count = int(failed.sum())
+                if count:
+                    failures[rule.name] = failed
+                    rule_stats['failed'] += count
+                    if len(rule_stats['examples']) < EXAMPLES and table in KEY_COLUMNS:
+                        examples = df[KEY_COLUMNS[table]].to_numpy()[failed][:EXAMPLES - len(rule_stats['examples'])]
+                        rule_stats['examples'] += [str(value) for value in examples]
+                    if rule.severity == 'reject':
+                        rejected |= failed
+                rule_stats['seconds'] += time.perf_counter() - rule_start
+
+            stats['rows'] += len(df)
+            if rejected.any():
+                stats['rejected'] += int(rejected.sum())
+                reasons = {name: failed[rejected] for name, failed in failures.items()}
+                self._quarantine(df[rejected].assign(FailedRules=failed_rules(reasons, int(rejected.sum()))), table)
+                view = view[~rejected]
+                if numbers:
+                    # Parsed again without the rejected cells, so whole numbers come back as integers
+                    view = view.assign(**{column: _numbers(df[column][~rejected]) for column in numbers})
+            stats['seconds'] += time.perf_counter() - start
+            return view
+
+    def _quarantine(self, df_rejected, table):
+        """Write rejected rows, with the rules they failed, to rejects/<table>"""
+        stem = f'{self.rejects_dir}/{table}'
+        os.makedirs(self.rejects_dir, exist_ok=True)
+        if self.append:
+            append_dataset(df_rejected, stem, self.storage_format)
+            return
+        if table not in self._writers:
+            self._writers[table] = DatasetWriter(stem, self.storage_format)
+        self._writers[table].write(df_rejected)
+
+    def report(self):
+        """Per-table and per-rule counts and timings"""
+        tables = {}
+        for table, stats in self.tables.items():
+            tables[table] = {
+                'rows': stats['rows'],
+                'rejected': stats['rejected'],
+                'seconds': round(stats['seconds'], 4),
+                'rows_per_second': round(stats['rows'] / max(stats['seconds'], 1e-9)),
+                'rules': [{'rule': name, 'severity': rule['severity'], 'failed': rule['failed'],
+                           'seconds': round(rule['seconds'], 4), 'examples': rule['examples']}
+                          for name, rule in stats['rules'].items()],
+            }
+        return combine_reports([{'tables': tables}])
+
+    def close(self, report_path=REPORT_PATH):
+        """Finish the rejects files and write the JSON report; returns the report"""
+        for writer in self._writers.values():
+            writer.close()
+        report = self.report()
+        if report_path:
+            write_report(report, report_path)
+        return report
+
+
+def combine_reports(reports):
+    """One report over the tables of several reports (each table validated by one of them)"""
+    tables = {}
+    for report in reports:
+        tables.update(report['tables'])
+    rows = sum(stats['rows'] for stats in tables.values())
+    seconds = sum(stats['seconds'] for stats in tables.values())
+    return {
+        'generated_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'rows': rows,
+        'rejected': sum(stats['rejected'] for stats in tables.values()),
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(rows / max(seconds, 1e-9)),
+        'tables': tables,
+    }
+
+
+def write_report(report, report_path=REPORT_PATH):
+    """Save a report as JSON"""
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def print_validation_report(report, report_path=REPORT_PATH):
+    """Print rows checked, quarantined rows and kept warnings"""
+    print(f"\nValidation:")
+    print(f"  - Rows checked: {report['rows']:,} ({report['rows_per_second']:,} rows/sec)")
+    print(f"  - Rows quarantined: {report['rejected']:,}")
+    for table, stats in report['tables'].items():
+        for rule in stats['rules']:
+            if rule['failed']:
+                action = 'quarantined' if rule['severity'] == 'reject' else 'kept'
+                print(f"    {table}: {rule['failed']:,} rows failed '{rule['rule']}' ({action})")
+    print(f"  - Report: {report_path}")
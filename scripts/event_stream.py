@@ -0,0 +1,401 @@
+"""
+Blinkit Analysis Dashboard - Event Stream
+Replays generated orders and their delivery completions as a live event
+stream through a local file queue, and consumes it with an asyncio
+micro-batcher that cleans each batch and keeps running KPIs with
+end-to-end latency
+
+Usage:
+    python scripts/event_stream.py --orders 50000 --rate 5000      # producer and consumer together
+    python scripts/event_stream.py --produce --rate 2000           # producer only
+    python scripts/event_stream.py --consume --batch-size 500      # consumer only (start the producer first)
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import time
+
+import data_generation as gen
+from data_cleaning import SeenIdSet, clean_deliveries, clean_sales, drop_duplicate_ids
+from instrumentation import measure, print_metrics, write_metrics
+
+QUEUE_DIR = 'data/stream/queue'
+KPI_PATH = 'data/processed/stream_kpis.json'
+END_MARKER = 'END'  # written by the producer after its last event
+SEGMENT_EVENTS = 100_000  # events per queue file
+PRODUCER_TICK = 0.01  # seconds between writes when rate-limited
+POLL_INTERVAL = 0.005  # seconds between reads of an idle queue
+BATCH_SIZE = 1000
+MAX_WAIT_MS = 100  # a partial batch is processed after waiting this long
+REPORT_EVERY = 2.0  # seconds between progress lines
+KPI_WINDOW_MINUTES = 60  # orders per minute is averaged over this much event time
+
+# ============================================================================
+# FILE QUEUE
+# ============================================================================
+
+def _segment_path(queue_dir, segment):
+    """File of one queue segment"""
+    return os.path.join(queue_dir, f'events-{segment:05d}.jsonl')
+
+
+class FileQueueWriter:
+    """Appends JSON lines to numbered segment files; a segment is complete once the next one exists"""
+
+    def __init__(self, queue_dir=QUEUE_DIR, segment_events=SEGMENT_EVENTS):
+        shutil.rmtree(queue_dir, ignore_errors=True)  # a new stream replaces the previous one
+        os.makedirs(queue_dir)
+        self.queue_dir = queue_dir
+        self.segment_events = segment_events
+        self.segment = 0
+        self._written = 0
+        self._file = open(_segment_path(queue_dir, 0), 'w')
+
+    def write(self, lines):
+        """Append lines and flush them so readers see them at once"""
+        while lines:
+            if self._written == self.segment_events:
+                self._file.close()
+                self.segment += 1
+                self._written = 0
+                self._file = open(_segment_path(self.queue_dir, self.segment), 'w')
+            part, lines = lines[:self.segment_events - self._written], lines[self.segment_events - self._written:]
+            self._file.write('\n'.join(part) + '\n')
+            self._written += len(part)
+        self._file.flush()
+
+    def close(self):
+        """Close the last segment and mark the stream as finished"""
+        self._file.close()
+        open(os.path.join(self.queue_dir, END_MARKER), 'w').close()
+
+
+class FileQueueReader:
+    """Tails the segment files of a FileQueueWriter, returning only complete lines"""
+
+    def __init__(self, queue_dir=QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.segment = 0
+        self._file = None
+        self._partial = ''
+
+    def _read(self):
+        """Complete lines added to the open segment since the last read"""
+        text = self._partial + self._file.read()
+        lines = text.split('\n')
+        self._partial = lines.pop()
+        return lines
+
+    def read_lines(self):
+        """Every complete line available now (possibly none)"""
+        lines = []
+        while True:
+            if self._file is None:
+                path = _segment_path(self.queue_dir, self.segment)
+                if not os.path.exists(path):
+                    return lines
+                self._file = open(path)
+            next_exists = os.path.exists(_segment_path(self.queue_dir, self.segment + 1))
+            lines += self._read()
+            if not next_exists:
+                return lines
+            self._file.close()
+            self._file, self._partial = None, ''
+            self.segment += 1
+
+    def finished(self):
+        """True once the producer has closed the stream (read_lines may still return its last lines)"""
+        return os.path.exists(os.path.join(self.queue_dir, END_MARKER))
+
+# ============================================================================
+# PRODUCER
+# ============================================================================
+
+def build_events(num_orders=gen.NUM_ORDERS, seed=gen.SEED):
+    """Generated orders and their deliveries as JSON lines in event-time order"""
+    df_customers = gen.generate_customers(gen.NUM_CUSTOMERS)
+    df_products = gen.generate_products(gen.NUM_PRODUCTS)
+    df_sales = gen.generate_sales(num_orders, df_customers, df_products, seed=seed)
+    df_deliveries = gen.generate_deliveries(df_sales, seed=seed + 1, verbose=False)
+
+    lines, times = [], []
+    for event_type, df, time_column in [('order', df_sales, 'OrderDateTime'),
+                                        ('delivery', df_deliveries, 'DeliveryDateTime')]:
+        records = df.assign(EventType=event_type).to_json(orient='records', lines=True, date_format='iso')
+        lines += records.splitlines()
+        times.append(df[time_column].to_numpy(dtype='datetime64[ns]'))
+    order = np.argsort(np.concatenate(times), kind='stable')
+    return [lines[i] for i in order]
+
+
+def produce(lines, writer, rate=None):
+    """Write lines to the queue at rate events/sec (as fast as possible when None), stamping each with
+    its emit time; returns seconds taken"""
+    start = time.perf_counter()
+    sent = 0
+    while sent < len(lines):
+        due = len(lines) if not rate else min(len(lines), int((time.perf_counter() - start) * rate) + 1)
+        if due <= sent:
+            time.sleep(PRODUCER_TICK)
+            continue
+        emitted_at = f'{{"EmittedAt":{time.time():.6f},'
+        writer.write([emitted_at + line[1:] for line in lines[sent:due]])
+        sent = due
+    writer.close()
+    return time.perf_counter() - start
+
+# ============================================================================
+# CONSUMER
+# ============================================================================
+
+class RunningKpis:
+    """Dashboard KPIs updated with each cleaned batch"""
+
+    def __init__(self, window_minutes=KPI_WINDOW_MINUTES):
+        self.window = pd.Timedelta(minutes=window_minutes)
+        self.orders = 0
+        self.revenue = 0.0
+        self.revenue_by_city = pd.Series(dtype=float)
+        self.deliveries = 0
+        self.on_time = 0
+        self.minute_orders = pd.Series(dtype=float)  # orders per event-time minute within the window
+        self.latest = None
+
+    def add_orders(self, df_sales):
+        """Count a batch of cleaned orders"""
+        if not len(df_sales):
+            return
+        self.orders += len(df_sales)
+        self.revenue += float(df_sales['TotalAmount'].sum())
+        self.revenue_by_city = self.revenue_by_city.add(df_sales.groupby('City')['TotalAmount'].sum(), fill_value=0)
+        minutes = df_sales['OrderDateTime'].dt.floor('min').value_counts()
+        self.minute_orders = self.minute_orders.add(minutes, fill_value=0)
+        latest = df_sales['OrderDateTime'].max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        self.minute_orders = self.minute_orders[self.minute_orders.index > self.latest - self.window]
+
+    def add_deliveries(self, df_deliveries):
+        """Count a batch of cleaned deliveries"""
+        self.deliveries += len(df_deliveries)
+        self.on_time += int(df_deliveries['IsOnTime'].astype(bool).sum())
+
+    def orders_per_minute(self):
+        """Average orders per minute over the last window of event time"""
+        return float(self.minute_orders.sum()) / (self.window / pd.Timedelta(minutes=1))
+
+    def on_time_rate(self):
+        """Percentage of deliveries on time"""
+        return self.on_time / self.deliveries * 100 if self.deliveries else 0.0
+
+    def snapshot(self):
+        """KPIs as plain values"""
+        return {
+            'event_time': None if self.latest is None else self.latest.isoformat(),
+            'orders': self.orders,
+            'revenue': round(self.revenue, 2),
+            'orders_per_minute': round(self.orders_per_minute(), 3),
+            'deliveries': self.deliveries,
+            'on_time_rate': round(self.on_time_rate(), 2),
+            'revenue_by_city': {city: round(value, 2) for city, value in self.revenue_by_city.sort_values(
+                ascending=False).items()},
+        }
+
+
+class StreamConsumer:
+    """Cleans micro-batches of events with the data_cleaning.py transforms and updates the KPIs"""
+
+    def __init__(self):
+        self.kpis = RunningKpis()
+        self.seen_orders = SeenIdSet('ORD')
+        self.seen_deliveries = SeenIdSet('DEL')
+        self.events = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._latencies = []
+
+    def process(self, lines):
+        """Clean and count one batch of JSON lines"""
+        with measure('stream batch', rows=len(lines)):
+            events = {'order': [], 'delivery': []}
+            for line in lines:
+                event = json.loads(line)
+                events[event.pop('EventType')].append(event)
+            emitted_at = []
+            for records, clean in [(events['order'], self._clean_orders), (events['delivery'], self._clean_deliveries)]:
+                if records:
+                    df = pd.DataFrame(records)
+                    emitted_at.append(df.pop('EmittedAt').to_numpy())
+                    clean(df)
+        self._latencies.append(time.time() - np.concatenate(emitted_at))
+        self.events += len(lines)
+        self.batches += 1
+
+    def _clean_orders(self, df_sales):
+        df_sales = clean_sales(drop_duplicate_ids(df_sales, 'OrderID', self.seen_orders))
+        self.kpis.add_orders(df_sales)
+
+    def _clean_deliveries(self, df_deliveries):
+        df_deliveries = clean_deliveries(drop_duplicate_ids(df_deliveries, 'DeliveryID', self.seen_deliveries))
+        self.kpis.add_deliveries(df_deliveries)
+
+    def latency_ms(self):
+        """End-to-end latency percentiles, from emit to processed, in milliseconds"""
+        if not self._latencies:
+            return {}
+        latencies = np.concatenate(self._latencies) * 1000
+        return {name: round(float(np.percentile(latencies, q)), 1)
+                for name, q in [('p50', 50), ('p95', 95), ('p99', 99), ('max', 100)]}
+
+
+async def tail_queue(reader, queue):
+    """Move complete lines from the file queue to an asyncio queue; None marks the end"""
+    while True:
+        finished = reader.finished()  # checked before reading, so no line written before END is missed
+        lines = reader.read_lines()
+        if lines:
+            await queue.put(lines)
+            await asyncio.sleep(0)
+        elif finished:
+            await queue.put(None)
+            return
+        else:
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+def print_progress(consumer, elapsed):
+    """One progress line"""
+    kpis, latency = consumer.kpis, consumer.latency_ms()
+    print(f"  [{elapsed:6.1f}s] {consumer.events:,} events ({consumer.events / max(elapsed, 1e-9):,.0f}/s) | "
+          f"{kpis.orders:,} orders, ₹{kpis.revenue:,.0f} | {kpis.orders_per_minute():.2f} orders/min | "
+          f"on-time {kpis.on_time_rate():.1f}% | latency p50 {latency.get('p50', 0):.0f} ms, "
+          f"p99 {latency.get('p99', 0):.0f} ms")
+
+
+def write_kpis(consumer, elapsed, path=KPI_PATH):
+    """Save the running KPIs and latency as JSON"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {
+        **consumer.kpis.snapshot(),
+        'events': consumer.events,
+        'batches': consumer.batches,
+        'events_per_second': round(consumer.events / max(elapsed, 1e-9)),
+        'latency_ms': consumer.latency_ms(),
+    }
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(f'{path}.tmp', path)  # readers never see a half-written file
+    return snapshot
+
+
+async def consume(queue_dir=QUEUE_DIR, batch_size=BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, report_every=REPORT_EVERY,
+                  kpi_path=KPI_PATH):
+    """Micro-batch the stream until the producer closes it; returns the consumer"""
+    loop = asyncio.get_running_loop()
+    consumer = StreamConsumer()
+    queue = asyncio.Queue()
+    tail = asyncio.create_task(tail_queue(FileQueueReader(queue_dir), queue))
+    start = last_report = loop.time()
+    batch, deadline, done = [], None, False
+    while not done:
+        try:
+            timeout = None if not batch else max(deadline - loop.time(), 0)
+            lines = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            lines = []
+        if lines is None:
+            done = True
+        elif lines:
+            if not batch:
+                deadline = loop.time() + max_wait_ms / 1000
+            batch += lines
+
+        while len(batch) >= batch_size:
+            consumer.process(batch[:batch_size])
+            batch = batch[batch_size:]
+            deadline = loop.time() + max_wait_ms / 1000
+        if batch and (done or loop.time() >= deadline):
+            consumer.process(batch)
+            batch = []
+
+        if loop.time() - last_report >= report_every:
+            last_report = loop.time()
+            print_progress(consumer, last_report - start)
+            write_kpis(consumer, last_report - start, kpi_path)
+    await tail
+    consumer.seconds = loop.time() - start
+    print_progress(consumer, consumer.seconds)
+    return consumer
+
+
+async def run_stream(lines, writer, rate, batch_size, max_wait_ms, report_every):
+    """Producer (in a thread) and consumer together; returns (producer seconds, consumer)"""
+    producer = asyncio.create_task(asyncio.to_thread(produce, lines, writer, rate))
+    consumer = await consume(QUEUE_DIR, batch_size, max_wait_ms, report_every)
+    return await producer, consumer
+
+
+def print_summary(consumer):
+    """Final KPIs, throughput and latency"""
+    snapshot = write_kpis(consumer, consumer.seconds)
+    print("\n" + "="*70)
+    print("EVENT STREAM SUMMARY")
+    print("="*70)
+    print(f"Events:          {snapshot['events']:,} in {snapshot['batches']:,} batches "
+          f"({snapshot['events_per_second']:,} events/sec)")
+    print(f"Orders:          {snapshot['orders']:,} (₹{snapshot['revenue']:,.2f})")
+    print(f"Orders/minute:   {snapshot['orders_per_minute']:.2f} (last {KPI_WINDOW_MINUTES} min of event time)")
+    print(f"On-time rate:    {snapshot['on_time_rate']:.1f}% of {snapshot['deliveries']:,} deliveries")
+    latency = snapshot['latency_ms']
+    print(f"Latency (ms):    p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, max {latency['max']}")
+    print("Revenue by city:")
+    for city, revenue in snapshot['revenue_by_city'].items():
+        print(f"  - {city:<12} ₹{revenue:,.2f}")
+    print(f"\n✓ Saved: {KPI_PATH}")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--produce', action='store_true', help='only write events to the queue')
+    parser.add_argument('--consume', action='store_true', help='only read events from the queue')
+    parser.add_argument('--orders', type=int, default=gen.NUM_ORDERS, help='orders to replay')
+    parser.add_argument('--seed', type=int, default=gen.SEED, help='seed for the order generator')
+    parser.add_argument('--rate', type=float, default=5000, help='events per second (0: as fast as possible)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='events per micro-batch')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='process a partial batch after waiting this long')
+    parser.add_argument('--report-every', type=float, default=REPORT_EVERY, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - EVENT STREAM")
+    print("="*70)
+
+    if args.consume:
+        print(f"\nConsuming {QUEUE_DIR}/ in batches of up to {args.batch_size:,} events...")
+        consumer = asyncio.run(consume(QUEUE_DIR, args.batch_size, args.max_wait_ms, args.report_every))
+        print_summary(consumer)
+    else:
+        writer = FileQueueWriter()  # replace the previous stream before a consumer can pick it up
+        lines = build_events(args.orders, args.seed)
+        rate = args.rate or None
+        print(f"\nStreaming {len(lines):,} order and delivery events to {QUEUE_DIR}/ at "
+              f"{f'{rate:,.0f} events/sec' if rate else 'full speed'}...")
+        if args.produce:
+            seconds = produce(lines, writer, rate)
+            print(f"✓ Produced {len(lines):,} events in {seconds:.1f}s")
+        else:
+            seconds, consumer = asyncio.run(run_stream(lines, writer, rate, args.batch_size, args.max_wait_ms,
+                                                       args.report_every))
+            print(f"✓ Produced {len(lines):,} events in {seconds:.1f}s")
+            print_summary(consumer)
+    print_metrics(write_metrics('event_stream'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Blinkit Analysis Dashboard - Instrumentation
+Records wall time, rows, rows/sec and memory for every step of a run and
+writes them as a JSON file per script plus a CSV history across runs
+"""
+
+import pandas as pd
+import cProfile
+import functools
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+try:
+    import resource  # peak memory (not available on Windows)
+except ImportError:
+    resource = None
+
+METRICS_DIR = 'data/processed/_metrics'
+HISTORY_FILE = 'metrics_history.csv'
+HISTORY_COLUMNS = ['run_id', 'script', 'started_at', 'step', 'parent', 'calls', 'seconds', 'rows',
+                   'rows_per_second', 'rss_delta_mb', 'peak_rss_mb']
+PROFILE_LINES = 15  # functions printed from a cProfile dump
+
+# ============================================================================
+# MEMORY
+# ============================================================================
+
+def current_rss_mb():
+    """Resident memory of this process now (Linux only, else None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far (Linux reports KB, macOS bytes)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+# ============================================================================
+# RECORDING
+# ============================================================================
+
+class Step:
+    """Handle yielded by measure(): set rows once they are known"""
+
+    def __init__(self, rows=None):
+        self.rows = rows
+
+
+class Recorder:
+    """Per-step totals for one process; calls of the same step name add up"""
+
+    def __init__(self):
+        self.started_at = pd.Timestamp.now().isoformat(timespec='seconds')
+        self.run_id = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+        self._start = time.perf_counter()
+        self._active = []  # names of the enclosing steps
+        self.steps = {}
+
+    @contextmanager
+    def measure(self, name, rows=None):
+        """Time a block; nested steps record the enclosing step as their parent"""
+        step = Step(rows)
+        parent = self._active[-1] if self._active else ''
+        rss_before = current_rss_mb()
+        self._active.append(name)
+        start = time.perf_counter()
+        try:
+            yield step
+        finally:
+            seconds = time.perf_counter() - start
+            self._active.pop()
+            rss_after = current_rss_mb()
+            stats = self.steps.setdefault(name, {'parent': parent, 'calls': 0, 'seconds': 0.0, 'rows': 0,
+                                                 'rss_delta_mb': 0.0, 'peak_rss_mb': None})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['rows'] += step.rows or 0
+            if rss_before is not None and rss_after is not None:
+                stats['rss_delta_mb'] += rss_after - rss_before
+            peak = peak_rss_mb()
+            if peak is not None:
+                stats['peak_rss_mb'] = max(stats['peak_rss_mb'] or 0.0, peak)
+
+    def report(self, script):
+        """Run summary and one record per step"""
+        steps = []
+        for name, stats in self.steps.items():
+            steps.append({
+                'step': name,
+                'parent': stats['parent'],
+                'calls': stats['calls'],
+                'seconds': round(stats['seconds'], 4),
+                'rows': stats['rows'],
+                'rows_per_second': round(stats['rows'] / stats['seconds']) if stats['rows'] and stats['seconds']
+                else None,
+                'rss_delta_mb': round(stats['rss_delta_mb'], 1),
+                'peak_rss_mb': round(stats['peak_rss_mb'], 1) if stats['peak_rss_mb'] is not None else None,
+            })
+        peak = peak_rss_mb()
+        return {
+            'run_id': self.run_id,
+            'script': script,
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+            'steps': steps,
+        }
+
+
+RECORDER = Recorder()
+
+
+def reset():
+    """Start a new run, e.g. in a worker process forked from an instrumented one"""
+    global RECORDER
+    RECORDER = Recorder()
+
+
+def measure(name, rows=None):
+    """Context manager timing one step of this process's run"""
+    return RECORDER.measure(name, rows)
+
+
+def _result_rows(result):
+    """Rows in a function result (the first item of a tuple), or None"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    return None
+
+
+def timed(func=None, *, name=None):
+    """Decorator: record every call as a step named after the function, counting the rows returned"""
+    if func is None:
+        return functools.partial(timed, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with measure(name or func.__name__) as step:
+            result = func(*args, **kwargs)
+            step.rows = _result_rows(result)
+        return result
+    return wrapper
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def write_metrics(script, metrics_dir=METRICS_DIR):
+    """Write <script>.json for this run and append its steps to the CSV history; returns the report"""
+    report = RECORDER.report(script)
+    os.makedirs(metrics_dir, exist_ok=True)
+    with open(os.path.join(metrics_dir, f'{script}.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    history_path = os.path.join(metrics_dir, HISTORY_FILE)
+    df_steps = pd.DataFrame(report['steps'], columns=HISTORY_COLUMNS[3:]).astype({'rows_per_second': 'Int64'})
+    df_steps.insert(0, 'started_at', report['started_at'])
+    df_steps.insert(0, 'script', script)
+    df_steps.insert(0, 'run_id', report['run_id'])
+    with open(history_path, 'a', newline='') as f:  # header only when the file is new
+        df_steps.to_csv(f, header=f.tell() == 0, index=False)
+    return report
+
+
+def print_metrics(report, top=10):
+    """Print the slowest steps of a run"""
+    print("\n" + "="*70)
+    print(f"PERFORMANCE METRICS ({report['wall_seconds']:.2f}s wall, peak RSS {report['peak_rss_mb']} MB)")
+    print("="*70)
+    print(f"{'step':<34}{'calls':>6}{'seconds':>10}{'rows/sec':>12}{'RSS +MB':>9}")
+    for step in sorted(report['steps'], key=lambda step: step['seconds'], reverse=True)[:top]:
+        rate = f"{step['rows_per_second']:,}" if step['rows_per_second'] else '-'
+        print(f"{step['step'][:33]:<34}{step['calls']:>6}{step['seconds']:>10.3f}{rate:>12}"
+              f"{step['rss_delta_mb']:>9.1f}")
+    print(f"\nMetrics saved in {METRICS_DIR}/ ({report['script']}.json, {HISTORY_FILE})")
+
+
+def run_profiled(func, profile_path, *args, **kwargs):
+    """Call func under cProfile, dump the stats to profile_path and print the top functions"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(os.path.dirname(profile_path) or '.', exist_ok=True)
+        profiler.dump_stats(profile_path)
+        print(f"\ncProfile stats saved: {profile_path} (top {PROFILE_LINES} by cumulative time)")
+        pstats.Stats(profile_path).sort_stats('cumulative').print_stats(PROFILE_LINES)
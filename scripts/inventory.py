@@ -0,0 +1,244 @@
+"""
+Blinkit Analysis Dashboard - Inventory Simulation
+Replays cleaned order lines against per-product stock one day at a time, with
+all products stepped together as NumPy arrays: sales deplete stock, unmet demand
+is lost, and a restock order is placed whenever stock plus open orders falls
+below MinStockLevel. Writes a daily product stock snapshot and the stockout events
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import time
+
+from data_cleaning import id_numbers, stock_status
+from storage import FORMATS, iter_dataset_chunks, read_dataset, write_dataset
+
+PROCESSED_DIR = 'data/processed'
+CHUNK_SIZE = 1_000_000
+LEAD_TIME_DAYS = 3  # restock orders arrive at the start of the day this many days later
+REORDER_MULTIPLE = 2  # restock orders refill to the larger of the initial stock and this x MinStockLevel
+NON_DEPLETING_STATUSES = ['Cancelled']  # orders whose lines never leave the shelf
+PRODUCT_COLUMNS = ['ProductID', 'ProductName', 'Price', 'StockQuantity', 'MinStockLevel']
+SNAPSHOT_COLUMNS = ['OpeningStock', 'Received', 'UnitsDemanded', 'UnitsSold', 'LostUnits', 'ClosingStock',
+                    'OnOrder', 'ReorderQuantity']
+
+# ============================================================================
+# DAILY DEMAND
+# ============================================================================
+
+def order_days(chunk_size=CHUNK_SIZE):
+    """Day number (days since 1970) by order number, -1 for cancelled orders and orders without a date"""
+    day_by_order = np.full(1024, -1, dtype=np.int32)
+    for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/sales_clean', chunk_size,
+                                     columns=['OrderID', 'OrderDate', 'OrderStatus']):
+        orders = id_numbers(chunk['OrderID'], 'ORD').to_numpy(dtype=float)
+        days = pd.to_datetime(chunk['OrderDate']).to_numpy().astype('datetime64[D]')
+        keep = ~np.isnan(orders) & ~np.isnat(days) & ~chunk['OrderStatus'].isin(NON_DEPLETING_STATUSES).to_numpy()
+        orders = orders[keep].astype(np.int64)
+        if not len(orders):
+            continue
+        if orders.max() >= len(day_by_order):
+            grown = np.full(max(2 * len(day_by_order), int(orders.max()) + 1), -1, dtype=np.int32)
+            grown[:len(day_by_order)] = day_by_order
+            day_by_order = grown
+        day_by_order[orders] = days[keep].astype(np.int64)
+    return day_by_order
+
+
+def product_positions(product_keys):
+    """Position of each product by ProductKey (-1 for unknown keys)"""
+    positions = np.full(int(product_keys.max()) + 1, -1, dtype=np.int64)
+    positions[product_keys] = np.arange(len(product_keys))
+    return positions
+
+
+def daily_demand(day_by_order, positions, first_day, num_days, chunk_size=CHUNK_SIZE):
+    """Units ordered per (day, product) from the cleaned order lines; returns (demand, order lines used)"""
+    num_products = int(positions.max()) + 1
+    demand = np.zeros(num_days * num_products)
+    lines = 0
+    for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/order_items_clean', chunk_size,
+                                     columns=['OrderKey', 'ProductKey', 'Quantity']):
+        orders = chunk['OrderKey'].to_numpy(dtype=np.int64)
+        products = chunk['ProductKey'].to_numpy(dtype=np.int64)
+        days = np.where(orders < len(day_by_order), day_by_order[np.minimum(orders, len(day_by_order) - 1)], -1)
+        products = np.where(products < len(positions), positions[np.minimum(products, len(positions) - 1)], -1)
+        keep = (days >= 0) & (products >= 0)
+        cells = (days[keep] - first_day) * num_products + products[keep]
+        demand += np.bincount(cells, chunk['Quantity'].to_numpy(dtype=float)[keep], len(demand))
+        lines += int(keep.sum())
+    return demand.reshape(num_days, num_products).round().astype(np.int64), lines
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+def simulate(demand, initial_stock, min_stock_level, reorder_up_to, lead_time=LEAD_TIME_DAYS):
+    """Step every product through the days together; returns one (days, products) array per snapshot column.
+
+    Each day: restock orders due today arrive, sales take min(stock, demand) and the rest
+    is lost, then products whose stock plus open orders is below MinStockLevel order up
+    to reorder_up_to, arriving lead_time days later.
+    """
+    if lead_time < 1:
+        raise ValueError("Lead time must be at least one day")
+    num_days, num_products = demand.shape
+    snapshot = {column: np.zeros((num_days, num_products), dtype=np.int64) for column in SNAPSHOT_COLUMNS}
+    arriving = np.zeros((lead_time + 1, num_products), dtype=np.int64)  # ring buffer of orders by arrival day
+    stock = np.asarray(initial_stock, dtype=np.int64).copy()
+    on_order = np.zeros(num_products, dtype=np.int64)
+
+    for day in range(num_days):
+        snapshot['OpeningStock'][day] = stock
+        received = arriving[day % (lead_time + 1)]
+        stock += received
+        on_order -= received
+        snapshot['Received'][day] = received
+        received[:] = 0
+
+        sold = np.minimum(stock, demand[day])
+        stock -= sold
+        snapshot['UnitsSold'][day] = sold
+
+        position = stock + on_order
+        ordered = np.where(position < min_stock_level, reorder_up_to - position, 0)
+        arriving[(day + lead_time) % (lead_time + 1)] += ordered
+        on_order += ordered
+        snapshot['ClosingStock'][day] = stock
+        snapshot['OnOrder'][day] = on_order
+        snapshot['ReorderQuantity'][day] = ordered
+
+    snapshot['UnitsDemanded'] = demand
+    snapshot['LostUnits'] = demand - snapshot['UnitsSold']
+    return snapshot
+
+
+def stockout_runs(closing_stock, lost_units):
+    """Runs of consecutive days ending at zero stock per product: (product, first day, days, lost units)"""
+    num_days, num_products = closing_stock.shape
+    width = num_days + 2  # a day of stock on both sides separates the products
+    out = np.zeros((num_products, width), dtype=bool)
+    out[:, 1:-1] = (closing_stock == 0).T
+    out = out.ravel()
+    starts = np.flatnonzero(out[1:] & ~out[:-1]) + 1
+    ends = np.flatnonzero(out[:-1] & ~out[1:]) + 1  # exclusive
+
+    lost = np.zeros((num_products, width), dtype=np.int64)
+    lost[:, 1:-1] = lost_units.T
+    lost = np.r_[0, np.cumsum(lost.ravel())]
+    return starts // width, starts % width - 1, ends - starts, lost[ends] - lost[starts]
+
+# ============================================================================
+# OUTPUT TABLES
+# ============================================================================
+
+def daily_table(snapshot, df_products, first_day):
+    """One row per product x day with the stock movements and the StockStatus at the end of the day"""
+    num_days, num_products = snapshot['ClosingStock'].shape
+    dates = pd.to_datetime(np.arange(first_day, first_day + num_days).astype('datetime64[D]'))
+    df = pd.DataFrame({
+        'Date': np.tile(dates, num_products),
+        'ProductID': np.repeat(df_products['ProductID'].to_numpy(dtype=object), num_days),
+    })
+    for column in SNAPSHOT_COLUMNS:
+        df[column] = snapshot[column].T.reshape(-1)
+    min_stock_level = np.repeat(df_products['MinStockLevel'].to_numpy(), num_days)
+    df['StockStatus'] = stock_status(df['ClosingStock'], min_stock_level)
+    return df
+
+
+def stockout_table(snapshot, df_products, first_day):
+    """One row per stockout: when it started, when stock came back and the demand lost meanwhile"""
+    num_days = len(snapshot['ClosingStock'])
+    products, days, lengths, lost = stockout_runs(snapshot['ClosingStock'], snapshot['LostUnits'])
+    ends = days + lengths
+    return pd.DataFrame({
+        'ProductID': df_products['ProductID'].to_numpy(dtype=object)[products],
+        'ProductName': df_products['ProductName'].to_numpy(dtype=object)[products],
+        'StockoutDate': pd.to_datetime((first_day + days).astype('datetime64[D]')),
+        'RestockDate': pd.to_datetime(np.where(ends < num_days, first_day + ends, np.iinfo(np.int64).min)
+                                      .astype('datetime64[D]')),  # NaT while still out of stock
+        'DaysOutOfStock': lengths,
+        'LostUnits': lost,
+        'LostRevenue': (lost * df_products['Price'].to_numpy(dtype=float)[products]).round(2),
+    })
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run(storage_format='csv', lead_time=LEAD_TIME_DAYS, reorder_multiple=REORDER_MULTIPLE, chunk_size=CHUNK_SIZE):
+    """Simulate stock levels from the cleaned orders and write the inventory_daily and stockout_events tables"""
+    start = time.perf_counter()
+    print("\n[1/3] Aggregating order lines per product and day...")
+    df_products = read_dataset(f'{PROCESSED_DIR}/products_clean', columns=PRODUCT_COLUMNS)
+    df_products = df_products.assign(ProductKey=id_numbers(df_products['ProductID'], 'PROD')).dropna(
+        subset=['ProductKey']).reset_index(drop=True)
+    positions = product_positions(df_products['ProductKey'].to_numpy(dtype=np.int64))
+    day_by_order = order_days(chunk_size)
+    order_day_numbers = day_by_order[day_by_order >= 0]
+    if not len(order_day_numbers):
+        raise ValueError("No completed orders with an order date to simulate")
+    first_day = int(order_day_numbers.min())
+    num_days = int(order_day_numbers.max()) - first_day + 1
+    demand, lines = daily_demand(day_by_order, positions, first_day, num_days, chunk_size)
+    print(f"✓ {lines:,} order lines over {num_days} days x {len(df_products):,} products "
+          f"({time.perf_counter() - start:.2f}s)")
+
+    print("\n[2/3] Simulating stock levels...")
+    simulate_start = time.perf_counter()
+    initial_stock = df_products['StockQuantity'].to_numpy(dtype=np.int64)
+    min_stock_level = df_products['MinStockLevel'].to_numpy(dtype=np.int64)
+    reorder_up_to = np.maximum(initial_stock, reorder_multiple * min_stock_level)
+    snapshot = simulate(demand, initial_stock, min_stock_level, reorder_up_to, lead_time)
+    df_daily = daily_table(snapshot, df_products, first_day)
+    df_stockouts = stockout_table(snapshot, df_products, first_day)
+    print(f"✓ Simulated {num_days} days x {len(df_products):,} products "
+          f"({time.perf_counter() - simulate_start:.2f}s, lead time {lead_time} days)")
+
+    print("\n[3/3] Saving...")
+    for df, name in [(df_daily, 'inventory_daily'), (df_stockouts, 'stockout_events')]:
+        path = write_dataset(df, f'{PROCESSED_DIR}/{name}', storage_format)
+        print(f"✓ Saved: {path} ({len(df):,} rows)")
+
+    last_day = df_daily[df_daily['Date'] == df_daily['Date'].max()]
+    demanded = snapshot['UnitsDemanded'].sum()
+    print(f"\n  - Fill rate: {snapshot['UnitsSold'].sum() / demanded * 100 if demanded else 100:.1f}% "
+          f"({snapshot['LostUnits'].sum():,} units lost, ₹{df_stockouts['LostRevenue'].sum():,.2f})")
+    print(f"  - Restock orders: {(snapshot['ReorderQuantity'] > 0).sum():,}")
+    print(f"  - Stockouts: {len(df_stockouts):,} ({df_stockouts['ProductID'].nunique():,} products)")
+    print(f"  - Out of stock on {last_day['Date'].iloc[0].date()}: "
+          f"{(last_day['StockStatus'] == 'Out of Stock').sum():,} products")
+    print(f"\n✅ Inventory simulated in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Simulate daily Blinkit product stock levels and stockouts')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the inventory_daily and stockout_events tables')
+    parser.add_argument('--lead-time', type=int, default=LEAD_TIME_DAYS,
+                        help='days between placing a restock order and receiving it')
+    parser.add_argument('--reorder-multiple', type=int, default=REORDER_MULTIPLE,
+                        help='restock up to max(initial StockQuantity, this x MinStockLevel)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='sales and order line rows read at a time')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - INVENTORY SIMULATION")
+    print("="*70)
+
+    try:
+        run(args.storage_format, args.lead_time, args.reorder_multiple, args.chunk_size)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
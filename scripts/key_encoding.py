@@ -0,0 +1,246 @@
+"""
+Blinkit Analysis Dashboard - Key Encoding
+Encodes the cleaned datasets as a compact star schema: integer surrogate keys,
+small lookup tables for categorical columns, readable IDs only in dimension tables
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import re
+
+from data_cleaning import id_numbers
+from storage import FORMATS, DatasetWriter, dataset_exists, iter_dataset_chunks, read_dataset, to_storage_dtypes, \
+    write_dataset
+
+PROCESSED_DIR = 'data/processed'
+MODEL_DIR = f'{PROCESSED_DIR}/model'
+CHUNK_SIZE = 500_000
+MISSING_KEY = -1
+
+# Formatted IDs become the number in the ID (CUST00042 -> CustomerKey 42)
+ID_KEYS = {
+    'CustomerID': ('CustomerKey', 'CUST', np.int32),
+    'ProductID': ('ProductKey', 'PROD', np.int32),
+    'OrderID': ('OrderKey', 'ORD', np.int32),
+    'DeliveryID': ('DeliveryKey', 'DEL', np.int32),
+    'DeliveryPartnerID': ('DeliveryPartnerKey', 'DP', np.int16),
+}
+
+# IDs without a cleaned table of their own get a lookup table of (key, ID) pairs
+ID_LOOKUPS = ['DeliveryPartnerID']
+
+# Categorical columns become codes into a lookup table: column -> (key column, lookup)
+LOOKUP_KEYS = {
+    'City': ('CityKey', 'City'),
+    'City_customer': ('CustomerCityKey', 'City'),
+    'Area': ('AreaKey', 'Area'),
+    'PaymentMethod': ('PaymentMethodKey', 'PaymentMethod'),
+    'PreferredPaymentMethod': ('PreferredPaymentMethodKey', 'PaymentMethod'),
+    'OrderStatus': ('OrderStatusKey', 'OrderStatus'),
+    'DeliveryStatus': ('DeliveryStatusKey', 'DeliveryStatus'),
+    'DayOfWeek': ('DayOfWeekKey', 'DayOfWeek'),
+    'CustomerSegment': ('CustomerSegmentKey', 'CustomerSegment'),
+}
+
+# Lookups with a natural order; the others start from the sorted customer table values
+FIXED_LOOKUPS = {
+    'DayOfWeek': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+    'OrderStatus': ['Completed', 'Cancelled'],
+    'DeliveryStatus': ['Delivered'],
+}
+CUSTOMER_LOOKUPS = {'City': 'City', 'Area': 'Area', 'CustomerSegment': 'CustomerSegment',
+                    'PaymentMethod': 'PreferredPaymentMethod'}
+
+# Narrow numeric types (nullable where master dataset rows have no delivery)
+NUMERIC_DTYPES = {
+    'OrderHour': np.int8, 'NumItems': np.int8, 'DeliveryFee': np.int16, 'Quantity': np.int8,
+    'Year': np.int16, 'Month': np.int8, 'Quarter': np.int8, 'WeekOfYear': np.int8,
+    'DeliveryTimeMinutes': 'Int16', 'DeliveryRating': 'Int8',
+}
+
+# (cleaned dataset, encoded table, readable IDs kept)
+TABLES = [
+    ('customers_clean', 'dim_customer', ['CustomerID']),
+    ('products_clean', 'dim_product', ['ProductID']),
+    ('sales_clean', 'fact_sales', []),
+    ('deliveries_clean', 'fact_deliveries', []),
+    ('order_items_clean', 'fact_order_items', []),
+    ('master_dataset', 'fact_master', []),
+    ('kpi_cube', 'agg_kpi_cube', []),
+    ('product_daily', 'agg_product_daily', []),
+]
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+class Lookup:
+    """Values of a categorical column, numbered in the order they were added"""
+
+    def __init__(self, name, values=()):
+        self.name = name
+        self.values = []
+        self._known = set()
+        self.add(values)
+
+    def add(self, values):
+        """Number values not seen before"""
+        for value in pd.unique(pd.Series(values).dropna()):
+            if value not in self._known:
+                self._known.add(value)
+                self.values.append(value)
+
+    def encode(self, series):
+        """Codes of the values (MISSING_KEY where missing)"""
+        self.add(series)
+        codes = pd.Categorical(series, categories=self.values).codes
+        return codes.astype(np.int16)
+
+    def frame(self):
+        """The lookup table: key and value columns"""
+        return pd.DataFrame({f'{self.name}Key': np.arange(len(self.values), dtype=np.int16), self.name: self.values})
+
+
+def id_keys(ids, prefix, dtype):
+    """Surrogate keys from formatted IDs (MISSING_KEY where missing)"""
+    numbers = id_numbers(ids, prefix)
+    invalid = ids.notna() & (numbers.isna() | ~ids.astype(str).str.startswith(prefix))
+    if invalid.any():
+        raise ValueError(f"Cannot derive a key from ID '{ids[invalid].iloc[0]}': "
+                         f"expected '{prefix}' followed by a number")
+    return numbers.fillna(MISSING_KEY).astype(dtype).to_numpy()
+
+
+def encode_frame(df, lookups, keep_ids=()):
+    """Replace IDs with surrogate keys and categorical columns with lookup codes, keeping column order"""
+    df = df.reset_index(drop=True)
+    columns = {}
+    for column in df.columns:
+        if column in ID_KEYS:
+            key_column, prefix, dtype = ID_KEYS[column]
+            keys = id_keys(df[column], prefix, dtype)
+            columns[key_column] = keys
+            if column in keep_ids:
+                columns[column] = df[column]
+            elif column in ID_LOOKUPS:
+                present = keys != MISSING_KEY
+                lookups[column].update(zip(keys[present], df[column].to_numpy()[present]))
+        elif column in LOOKUP_KEYS:
+            key_column, lookup = LOOKUP_KEYS[column]
+            columns[key_column] = lookups[lookup].encode(df[column])
+        elif column in NUMERIC_DTYPES:
+            columns[column] = df[column].astype(NUMERIC_DTYPES[column])
+        else:
+            columns[column] = df[column]
+    return to_storage_dtypes(pd.DataFrame(columns))
+
+
+def build_lookups():
+    """Lookups seeded with fixed orders and the values in the cleaned customer table"""
+    df_customers = read_dataset(f'{PROCESSED_DIR}/customers_clean')
+    lookups = {name: Lookup(name, values) for name, values in FIXED_LOOKUPS.items()}
+    for name, column in CUSTOMER_LOOKUPS.items():
+        lookups[name] = Lookup(name, sorted(df_customers[column].dropna().unique()))
+    for column in ID_LOOKUPS:
+        lookups[column] = {}  # key -> ID, collected while encoding
+    return lookups
+
+
+def id_lookup_frame(column, ids_by_key):
+    """Lookup table of the (key, ID) pairs collected while encoding, ordered by key"""
+    keys = sorted(ids_by_key)
+    return pd.DataFrame({ID_KEYS[column][0]: np.array(keys, dtype=ID_KEYS[column][2]),
+                         column: [ids_by_key[key] for key in keys]})
+
+
+def encode_table(source, target, lookups, keep_ids, storage_format='csv', chunk_size=CHUNK_SIZE):
+    """Encode one cleaned dataset chunk by chunk; returns (rows, bytes before, bytes after)"""
+    writer = DatasetWriter(f'{MODEL_DIR}/{target}', storage_format)
+    before = after = 0
+    for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/{source}', chunk_size):
+        encoded = encode_frame(chunk, lookups, keep_ids)
+        before += chunk.memory_usage(deep=True).sum()
+        after += encoded.memory_usage(deep=True).sum()
+        writer.write(encoded)
+    writer.close()
+    return writer.rows, before, after
+
+
+def _table_name(name):
+    """Lookup table name, e.g. DeliveryPartnerID -> dim_delivery_partner"""
+    name = re.sub(r'ID$', '', name)
+    return 'dim_' + re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+# ============================================================================
+# MEMORY REPORT
+# ============================================================================
+
+def print_memory_report(df_report):
+    """Print in-memory size per table before and after encoding"""
+    print("\n" + "="*70)
+    print("MEMORY PER TABLE (pandas, deep)")
+    print("="*70)
+    print(f"{'table':<22}{'rows':>12}{'before (MB)':>13}{'after (MB)':>12}{'saved':>9}")
+    for row in df_report.itertuples(index=False):
+        print(f"{row.table:<22}{row.rows:>12,}{row.before_mb:>13.2f}{row.after_mb:>12.2f}{row.saved_pct:>8.0f}%")
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run(storage_format='csv', chunk_size=CHUNK_SIZE):
+    """Encode every cleaned dataset and write lookup tables and the memory report"""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    lookups = build_lookups()
+
+    print("\n[1/2] Encoding tables...")
+    report = []
+    for source, target, keep_ids in TABLES:
+        if not dataset_exists(f'{PROCESSED_DIR}/{source}'):
+            print(f"  - Skipped {source} (not found)")
+            continue
+        rows, before, after = encode_table(source, target, lookups, keep_ids, storage_format, chunk_size)
+        report.append({'table': target, 'rows': rows, 'before_mb': before / 1e6, 'after_mb': after / 1e6,
+                       'saved_pct': (1 - after / before) * 100 if before else 0.0})
+        print(f"✓ {source} -> {target} ({rows:,} rows)")
+
+    print("\n[2/2] Writing lookup tables...")
+    for name, lookup in lookups.items():
+        df_lookup = id_lookup_frame(name, lookup) if name in ID_LOOKUPS else lookup.frame()
+        path = write_dataset(df_lookup, f'{MODEL_DIR}/{_table_name(name)}', storage_format)
+        print(f"✓ Saved: {path} ({len(df_lookup)} values)")
+
+    df_report = pd.DataFrame(report)
+    df_report.to_csv(f'{MODEL_DIR}/memory_report.csv', index=False)
+    print_memory_report(df_report)
+    total_before, total_after = df_report['before_mb'].sum(), df_report['after_mb'].sum()
+    print(f"{'total':<22}{'':>12}{total_before:>13.2f}{total_after:>12.2f}"
+          f"{(1 - total_after / total_before) * 100 if total_before else 0:>8.0f}%")
+    print("="*70)
+    print(f"\n✅ Star schema saved in {MODEL_DIR}/ (key -1 marks a missing value)")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Encode cleaned Blinkit data with integer keys and lookup tables')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the encoded tables')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='rows encoded at a time')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - KEY ENCODING")
+    print("="*70)
+
+    try:
+        run(args.storage_format, args.chunk_size)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
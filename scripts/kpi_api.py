@@ -0,0 +1,381 @@
+"""
+Blinkit Analysis Dashboard - KPI Query API
+Answers filtered dashboard KPI queries from the cleaned master dataset held in memory,
+with an LRU result cache and an optional local HTTP server
+
+Usage:
+    python scripts/kpi_api.py --city Delhi --start 2024-01-01 --end 2024-03-31
+    python scripts/kpi_api.py --serve --port 8050
+        GET /kpis?city=Delhi,Mumbai&start=2024-01-01&end=2024-03-31&segment=Premium&hour=7-9
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from storage import dataset_exists, read_dataset
+
+PROCESSED_DIR = 'data/processed'
+CACHE_SIZE = 1024
+
+# Is Peak Hour in DAX_measures.txt: 7-9 AM, 12-2 PM, 7-9 PM
+PEAK_HOURS = [7, 8, 9, 12, 13, 14, 19, 20, 21]
+
+MASTER_COLUMNS = ['CustomerID', 'OrderDate', 'OrderHour', 'NumItems', 'TotalAmount', 'OrderStatus', 'City',
+                  'IsRepeatCustomer', 'DeliveryTimeMinutes', 'IsOnTime', 'DeliveryRating', 'CustomerSegment']
+
+# ============================================================================
+# FILTERS
+# ============================================================================
+
+def _values(value):
+    """A filter value as a list: accepts None, a comma-separated string or a list"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def _hours(value):
+    """Hours 0-23 from values such as '7', '7-9' or [7, 8]"""
+    hours = set()
+    for part in _values(value):
+        first, _, last = part.partition('-')
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid hour '{part}': expected a number or a range such as 7-9") from None
+        if not 0 <= first <= last <= 23:
+            raise ValueError(f"Invalid hour '{part}': hours run from 0 to 23")
+        hours.update(range(first, last + 1))
+    return tuple(sorted(hours)) or None
+
+
+def _date(value):
+    """ISO date string of a date-like value, or None"""
+    if value is None or value == '':
+        return None
+    try:
+        return pd.Timestamp(value).date().isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}': expected YYYY-MM-DD") from None
+
+
+def normalize_filters(city=None, start=None, end=None, segment=None, hour=None):
+    """Canonical, hashable form of a filter, so equivalent queries share one cache entry"""
+    cities = tuple(sorted({v.title() for v in _values(city)})) or None
+    segments = tuple(sorted({v.title() for v in _values(segment)})) or None
+    start, end = _date(start), _date(end)
+    if start and end and start > end:
+        raise ValueError(f"Start date {start} is after end date {end}")
+    return cities, start, end, segments, _hours(hour)
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value or None; marks the entry as recently used"""
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        """Store a value, evicting the oldest entry when full"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+
+    def info(self):
+        """Hit/miss counters and current size"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+# ============================================================================
+# KPI ENGINE
+# ============================================================================
+
+def _codes(series):
+    """Integer codes and the list of distinct values of a column"""
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int32), list(uniques)
+
+
+def _divide(numerator, denominator):
+    """DAX DIVIDE(numerator, denominator, 0)"""
+    return float(numerator) / denominator if denominator else 0.0
+
+
+class KPIEngine:
+    """Columnar, memory-resident copy of the master dataset answering KPI queries.
+
+    Rows are sorted by OrderDate so a date range is a slice; the other
+    filters are masks over small integer codes. Results are cached per
+    normalized filter until data_cleaning.py rewrites its outputs.
+    """
+
+    def __init__(self, processed_dir=PROCESSED_DIR, cache_size=CACHE_SIZE):
+        self.processed_dir = processed_dir
+        self.cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+        self._version = None
+        self.rows = 0
+        self.load()
+
+    def _data_version(self):
+        """Marker written by data_cleaning.py, else the master dataset's file times"""
+        marker = os.path.join(self.processed_dir, '_version')
+        if os.path.isfile(marker):
+            with open(marker) as f:
+                return f.read()
+        stem = os.path.join(self.processed_dir, 'master_dataset')
+        paths = [f'{stem}.csv', f'{stem}.parquet', stem]
+        return tuple(os.stat(path).st_mtime_ns for path in paths if os.path.exists(path))
+
+    def load(self):
+        """Read the master dataset into arrays (and clear the cache)"""
+        stem = os.path.join(self.processed_dir, 'master_dataset')
+        if not dataset_exists(stem):
+            raise FileNotFoundError(f"No such file or directory: '{stem}.csv'")
+        version = self._data_version()
+        df = read_dataset(stem, columns=MASTER_COLUMNS)
+        df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+        df = df.sort_values('OrderDate', kind='stable', ignore_index=True)
+
+        self.days = df['OrderDate'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        self.city_codes, self.cities = _codes(df['City'].astype(object))
+        self.segment_codes, self.segments = _codes(df['CustomerSegment'].astype(object))
+        self.customer_codes, customers = _codes(df['CustomerID'])
+        self.num_customers = len(customers)
+        self.hours = df['OrderHour'].to_numpy(dtype=np.int8)
+        self.amount = df['TotalAmount'].to_numpy(dtype=float)
+        self.items = df['NumItems'].to_numpy(dtype=float)
+        self.completed = (df['OrderStatus'].astype(object) == 'Completed').to_numpy()
+        self.repeat = df['IsRepeatCustomer'].astype('boolean').fillna(False).to_numpy(dtype=bool)
+        self.minutes = pd.to_numeric(df['DeliveryTimeMinutes']).to_numpy(dtype=float)
+        self.delivered = ~np.isnan(self.minutes)
+        self.on_time = df['IsOnTime'].astype('boolean').fillna(False).to_numpy(dtype=bool)
+        self.rating = pd.to_numeric(df['DeliveryRating']).to_numpy(dtype=float)
+        self.is_peak = np.isin(self.hours, PEAK_HOURS)
+        self.rows = len(df)
+
+        self.cache.clear()
+        self._version = version
+
+    def _allowed(self, codes, names, wanted):
+        """Mask of rows whose code is one of the wanted names (None = no filter)"""
+        if wanted is None:
+            return None
+        allowed = np.zeros(len(names) + 1, dtype=bool)  # last slot is for missing values (code -1)
+        for position, name in enumerate(names):
+            allowed[position] = name in wanted
+        return allowed[codes]
+
+    def _rows(self, filters):
+        """Slice and mask of the rows matching a normalized filter"""
+        cities, start, end, segments, hours = filters
+        first = 0 if start is None else np.searchsorted(self.days, np.datetime64(start, 'D').astype(np.int64))
+        last = self.rows if end is None else np.searchsorted(
+            self.days, np.datetime64(end, 'D').astype(np.int64), side='right')
+        rows = slice(first, last)
+
+        mask = np.ones(last - first, dtype=bool)
+        for codes, names, wanted in [(self.city_codes, self.cities, cities),
+                                     (self.segment_codes, self.segments, segments)]:
+            allowed = self._allowed(codes[rows], names, wanted)
+            if allowed is not None:
+                mask &= allowed
+        if hours is not None:
+            hour_allowed = np.zeros(24, dtype=bool)
+            hour_allowed[list(hours)] = True
+            mask &= hour_allowed[self.hours[rows]]
+        return rows, mask
+
+    def _distinct_customers(self, customer_codes):
+        """DISTINCTCOUNT(CustomerID) over the given rows"""
+        seen = np.zeros(self.num_customers, dtype=bool)
+        seen[customer_codes] = True
+        return int(seen.sum())
+
+    def compute(self, filters):
+        """KPIs for a normalized filter, as defined in powerbi/DAX_measures.txt"""
+        rows, mask = self._rows(filters)
+        amount = self.amount[rows][mask]
+        completed = self.completed[rows][mask]
+        customers = self.customer_codes[rows][mask]
+        repeat = self.repeat[rows][mask]
+        delivered = self.delivered[rows][mask]
+        on_time = self.on_time[rows][mask] & delivered
+
+        total_orders = len(amount)
+        total_revenue = amount.sum()
+        completed_orders = int(completed.sum())
+        total_customers = self._distinct_customers(customers)
+        repeat_customers = self._distinct_customers(customers[repeat])
+        deliveries = int(delivered.sum())
+
+        # Active Customers L30D: the 30 days up to MAX(Calendar[Date]), i.e. the end date of the filter,
+        # or the last order day when the filter has no end date
+        end = filters[2]
+        days = self.days[rows][mask]
+        if end is not None:
+            recent = days > np.datetime64(end, 'D').astype(np.int64) - 30
+        else:
+            recent = days > days.max() - 30 if len(days) else days.astype(bool)
+
+        return {
+            'total_revenue': round(float(total_revenue), 2),
+            'total_revenue_completed': round(float(amount[completed].sum()), 2),
+            'total_orders': total_orders,
+            'completed_orders': completed_orders,
+            'cancelled_orders': total_orders - completed_orders,
+            'order_completion_rate_pct': round(_divide(completed_orders, total_orders) * 100, 2),
+            'average_order_value': round(_divide(total_revenue, total_orders), 2),
+            'avg_items_per_order': round(_divide(self.items[rows][mask].sum(), total_orders), 2),
+            'total_customers': total_customers,
+            'new_customers': self._distinct_customers(customers[~repeat]),
+            'repeat_customers': repeat_customers,
+            'customer_retention_rate_pct': round(_divide(repeat_customers, total_customers) * 100, 2),
+            'customer_lifetime_value': round(_divide(total_revenue, total_customers), 2),
+            'active_customers_l30d': self._distinct_customers(customers[recent]),
+            'deliveries': deliveries,
+            'avg_delivery_time': round(_divide(self.minutes[rows][mask][delivered].sum(), deliveries), 2),
+            'on_time_deliveries': int(on_time.sum()),
+            'on_time_delivery_rate_pct': round(_divide(on_time.sum(), deliveries) * 100, 2),
+            'avg_delivery_rating': round(_divide(self.rating[rows][mask][delivered].sum(), deliveries), 2),
+            'peak_hour_revenue_pct': round(_divide(amount[self.is_peak[rows][mask]].sum(), total_revenue) * 100, 2),
+        }
+
+    def query(self, city=None, start=None, end=None, segment=None, hour=None):
+        """KPIs for a filter; cached, and reloaded first if the cleaned outputs changed"""
+        filters = normalize_filters(city, start, end, segment, hour)
+        with self._lock:
+            if self._data_version() != self._version:
+                self.load()
+            result = self.cache.get(filters)
+            if result is None:
+                result = self.compute(filters)
+                self.cache.put(filters, result)
+        return dict(result)
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+
+class KPIRequestHandler(BaseHTTPRequestHandler):
+    """GET /kpis?city=..&start=..&end=..&segment=..&hour=.., /cache and /health"""
+
+    engine = None
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._send(200, {'status': 'ok', 'rows': self.engine.rows})
+        elif url.path == '/cache':
+            self._send(200, self.engine.cache.info())
+        elif url.path == '/kpis':
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            unknown = set(params) - {'city', 'start', 'end', 'segment', 'hour'}
+            if unknown:
+                self._send(400, {'error': f"Unknown filter(s): {', '.join(sorted(unknown))}"})
+                return
+            try:
+                self._send(200, self.engine.query(**params))
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+        else:
+            self._send(404, {'error': f'No such endpoint: {url.path}'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KPIServer(ThreadingHTTPServer):
+    """One thread per request, with a listen backlog sized for bursts of dashboard queries"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(engine, host='127.0.0.1', port=8050):
+    """Serve KPI queries over HTTP until interrupted"""
+    KPIRequestHandler.engine = engine
+    server = KPIServer((host, port), KPIRequestHandler)
+    print(f"✓ Serving KPIs for {engine.rows:,} orders on http://{host}:{port}/kpis (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--city', help='comma-separated cities')
+    parser.add_argument('--start', help='first order date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last order date (YYYY-MM-DD)')
+    parser.add_argument('--segment', help='comma-separated customer segments')
+    parser.add_argument('--hour', help='comma-separated hours or ranges, e.g. 7-9,19-21')
+    parser.add_argument('--serve', action='store_true', help='run the HTTP server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='cached query results')
+    args = parser.parse_args()
+
+    try:
+        engine = KPIEngine(cache_size=args.cache_size)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+
+    if args.serve:
+        serve(engine, args.host, args.port)
+        return
+    try:
+        kpis = engine.query(args.city, args.start, args.end, args.segment, args.hour)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
+    for name, value in kpis.items():
+        print(f"{name:<30}{value:>16,}")
+
+
+if __name__ == "__main__":
+    main()
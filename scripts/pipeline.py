@@ -0,0 +1,317 @@
+"""
+Blinkit Analysis Dashboard - Pipeline Runner
+Runs generation, cleaning and the analytics scripts as a DAG of stages: a stage
+is skipped when its inputs, parameters and code are unchanged since its outputs
+were written, and independent stages run in parallel processes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cohorts
+import data_cleaning as cleaning
+import data_generation
+import instrumentation
+import inventory
+import key_encoding
+import rfm_segmentation
+import rolling_metrics
+from storage import FORMATS, dataset_exists
+
+RAW_DIR = 'data/raw'
+PROCESSED_DIR = 'data/processed'
+STATE_PATH = f'{PROCESSED_DIR}/_state/pipeline.json'
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+HASH_BLOCK = 1 << 20  # bytes read at a time when hashing files
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+class Stage:
+    """One step of the pipeline.
+
+    raw: raw datasets it reads (fingerprinted by file contents)
+    after: upstream stages (fingerprinted by their own fingerprints)
+    params: run options passed to func as keyword arguments
+    modules: scripts whose source code is part of the fingerprint
+    optional: skipped when a raw input or an upstream stage is missing
+    """
+
+    def __init__(self, name, func, outputs, raw=(), after=(), params=('storage_format',), modules=(),
+                 optional=False):
+        self.name = name
+        self.func = func
+        self.outputs = outputs
+        self.raw = raw
+        self.after = after
+        self.params = params
+        self.modules = modules
+        self.optional = optional
+
+
+CLEANING_MODULES = ['data_cleaning', 'data_quality', 'aggregates', 'storage']
+CLEANED_TABLES = ['customers', 'products', 'sales', 'deliveries', 'order_items', 'master', 'product_daily']
+
+# In dependency order; customers and products, deliveries and order lines, and the analytics run in parallel
+STAGES = [
+    Stage('generate', data_generation.run,
+          [f'{RAW_DIR}/{name}' for name in ['customer_data', 'product_data', 'sales_data', 'delivery_data',
+                                            'order_items']],
+          params=('num_orders', 'seed', 'storage_format'), modules=['data_generation', 'storage']),
+    Stage('customers', cleaning.stage_customers, [f'{PROCESSED_DIR}/customers_clean'],
+          raw=['customer_data'], modules=CLEANING_MODULES),
+    Stage('products', cleaning.stage_products, [f'{PROCESSED_DIR}/products_clean'],
+          raw=['product_data'], modules=CLEANING_MODULES),
+    Stage('sales', cleaning.stage_sales, [f'{PROCESSED_DIR}/sales_clean'],
+          raw=['sales_data'], after=['customers'], params=('storage_format', 'partition'), modules=CLEANING_MODULES),
+    Stage('deliveries', cleaning.stage_deliveries, [f'{PROCESSED_DIR}/deliveries_clean'],
+          raw=['delivery_data'], after=['sales'], modules=CLEANING_MODULES),
+    Stage('order_items', cleaning.stage_order_items, [f'{PROCESSED_DIR}/order_items_clean'],
+          raw=['order_items'], after=['sales', 'products'], modules=CLEANING_MODULES, optional=True),
+    Stage('master', cleaning.stage_master, [f'{PROCESSED_DIR}/master_dataset', f'{PROCESSED_DIR}/kpi_cube'],
+          after=['sales', 'deliveries', 'customers'], params=('storage_format', 'partition'),
+          modules=CLEANING_MODULES),
+    Stage('product_daily', cleaning.stage_product_daily, [f'{PROCESSED_DIR}/product_daily'],
+          after=['order_items', 'sales', 'products'], modules=CLEANING_MODULES, optional=True),
+    Stage('report', cleaning.stage_report, [f'{PROCESSED_DIR}/quality_report.json'],
+          after=CLEANED_TABLES, params=(), modules=CLEANING_MODULES),
+    Stage('rfm', rfm_segmentation.run, [f'{PROCESSED_DIR}/customer_rfm'],
+          after=['sales'], modules=['rfm_segmentation', 'storage']),
+    Stage('cohorts', cohorts.run, [f'{PROCESSED_DIR}/cohort_retention', f'{PROCESSED_DIR}/clv_curve'],
+          after=['sales', 'customers'], modules=['cohorts', 'storage']),
+    Stage('rolling_metrics', rolling_metrics.run, [f'{PROCESSED_DIR}/daily_rolling'],
+          after=['master'], modules=['rolling_metrics', 'key_encoding', 'storage']),
+    Stage('inventory', inventory.run, [f'{PROCESSED_DIR}/inventory_daily', f'{PROCESSED_DIR}/stockout_events'],
+          after=['order_items', 'sales', 'products'], modules=['inventory', 'data_cleaning', 'storage'],
+          optional=True),
+    Stage('key_encoding', key_encoding.run, [f'{key_encoding.MODEL_DIR}/memory_report.csv'],
+          after=CLEANED_TABLES, modules=['key_encoding', 'storage']),
+]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+def upstream(stage, stages):
+    """Stages that must finish first (raw inputs come from generate when it is part of the run)"""
+    after = [name for name in stage.after if name in stages]
+    if stage.raw and 'generate' in stages:
+        after.append('generate')
+    return after
+
+
+def select_stages(targets=None, generate=False):
+    """Names of the stages to run, in dependency order: the targets and everything upstream of them"""
+    names = set(targets or [stage.name for stage in STAGES if stage.name != 'generate'])
+    if generate:
+        names.add('generate')
+    unknown = names - set(STAGES_BY_NAME)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {list(STAGES_BY_NAME)}")
+    for stage in reversed(STAGES):
+        if stage.name in names:
+            names.update(stage.after)
+    return [stage.name for stage in STAGES if stage.name in names]
+
+# ============================================================================
+# FINGERPRINTS
+# ============================================================================
+
+def file_digest(path, known):
+    """Content hash of a file, reused from known while its size and modification time are unchanged"""
+    info = os.stat(path)
+    cached = known.get(path)
+    if cached and cached[:2] == [info.st_size, info.st_mtime_ns]:
+        return cached[2]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    known[path] = [info.st_size, info.st_mtime_ns, digest.hexdigest()]
+    return known[path][2]
+
+
+def dataset_files(stem):
+    """Every file of a dataset in any format or layout"""
+    if os.path.isdir(stem):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(stem) for name in names)
+    return [f'{stem}.{fmt}' for fmt in FORMATS if os.path.isfile(f'{stem}.{fmt}')]
+
+
+def fingerprint(stage, options, upstream_fingerprints, known):
+    """Hash of everything a stage's outputs depend on"""
+    payload = {
+        'stage': stage.name,
+        'params': {name: options[name] for name in stage.params},
+        'code': [file_digest(os.path.join(SCRIPTS_DIR, f'{module}.py'), known) for module in stage.modules],
+        'raw': {path: file_digest(path, known)
+                for name in stage.raw for path in dataset_files(f'{RAW_DIR}/{name}')},
+        'after': upstream_fingerprints,
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def outputs_exist(stage):
+    """Whether every output of a stage is on disk"""
+    return all(dataset_exists(path) or os.path.isfile(path) for path in stage.outputs)
+
+
+def load_state():
+    """Fingerprints of the last successful run of each stage, and file hashes"""
+    if not os.path.isfile(STATE_PATH):
+        return {'stages': {}, 'files': {}}
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    """Persist stage fingerprints and file hashes"""
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, 'w') as f:
+        json.dump(state, f, indent=2)
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def run_stage(name, kwargs):
+    """Run one stage (in its own worker process); returns (seconds, peak MB, result)
+
+    The stage's step metrics are saved as pipeline_<stage>.json in the metrics directory.
+    """
+    instrumentation.reset()
+    start = time.perf_counter()
+    result = STAGES_BY_NAME[name].func(**kwargs)
+    seconds = time.perf_counter() - start
+    instrumentation.write_metrics(f'pipeline_{name}')
+    return seconds, instrumentation.peak_rss_mb(), result
+
+
+def run(options, targets=None, generate=False, workers=None, force=False):
+    """Run the selected stages, skipping cached ones; returns {stage: summary}"""
+    names = select_stages(targets, generate)
+    workers = workers or os.cpu_count() or 1
+    state = load_state()
+    known = state['files']
+    summary = {name: {'status': 'pending'} for name in names}
+    fingerprints = {}
+    running = {}
+    pending = list(names)
+
+    while pending or running:
+        for name in list(pending):
+            if len(running) >= workers:
+                break
+            stage = STAGES_BY_NAME[name]
+            after = upstream(stage, names)
+            statuses = [summary[dep]['status'] for dep in after]
+            if any(status in ('failed', 'blocked') for status in statuses):
+                summary[name]['status'] = 'blocked'
+                pending.remove(name)
+                continue
+            if any(status in ('pending', 'running') for status in statuses):
+                continue
+            pending.remove(name)
+
+            missing_raw = [raw for raw in stage.raw if not dataset_exists(f'{RAW_DIR}/{raw}')]
+            if stage.optional and (missing_raw or 'skipped' in statuses):
+                summary[name]['status'] = 'skipped'
+                continue
+            # Generated raw data is covered by the raw file hashes, so generate is not part of the fingerprint
+            fingerprints[name] = fingerprint(stage, options, {dep: fingerprints.get(dep) for dep in stage.after},
+                                             known)
+            if not force and state['stages'].get(name) == fingerprints[name] and outputs_exist(stage):
+                summary[name]['status'] = 'cached'
+                continue
+
+            print(f"\n▶ Running stage: {name}")
+            pool = ProcessPoolExecutor(1)  # a fresh process per stage, so its peak memory is its own
+            future = pool.submit(run_stage, name, {param: options[param] for param in stage.params})
+            running[future] = (name, pool)
+            summary[name]['status'] = 'running'
+
+        if not running:
+            continue
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, pool = running.pop(future)
+            pool.shutdown()
+            try:
+                seconds, peak_mb, result = future.result()
+            except Exception as e:
+                summary[name]['status'] = 'failed'
+                summary[name]['error'] = f"{type(e).__name__}: {e}"
+                print(f"❌ Stage {name} failed: {summary[name]['error']}")
+                continue
+            summary[name].update(status='ran', seconds=seconds, peak_mb=peak_mb,
+                                 rows=result.get('rows') if isinstance(result, dict) else None)
+            state['stages'][name] = fingerprints[name]
+            save_state(state)
+
+    save_state(state)
+    return summary
+
+
+def print_summary(summary, wall_seconds):
+    """Print status, wall time and peak memory of every stage"""
+    print("\n" + "="*70)
+    print("PIPELINE SUMMARY")
+    print("="*70)
+    print(f"{'stage':<18}{'status':<10}{'seconds':>10}{'peak MB':>10}{'rows':>14}")
+    for name, stage in summary.items():
+        seconds = f"{stage['seconds']:.2f}" if 'seconds' in stage else '-'
+        peak_mb = f"{stage['peak_mb']:.0f}" if stage.get('peak_mb') is not None else '-'
+        rows = f"{stage['rows']:,}" if stage.get('rows') is not None else '-'
+        print(f"{name:<18}{stage['status']:<10}{seconds:>10}{peak_mb:>10}{rows:>14}")
+    stage_seconds = sum(stage.get('seconds', 0) for stage in summary.values())
+    print("-"*70)
+    print(f"Wall time: {wall_seconds:.2f}s (stage time {stage_seconds:.2f}s)")
+    print("="*70)
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Run the Blinkit data pipeline, skipping unchanged stages')
+    parser.add_argument('stages', nargs='*',
+                        help=f'stages to bring up to date, with everything upstream (default: all): '
+                             f'{", ".join(STAGES_BY_NAME)}')
+    parser.add_argument('--generate', action='store_true', help='also (re)generate the raw sample data')
+    parser.add_argument('--orders', type=int, default=data_generation.NUM_ORDERS, dest='num_orders',
+                        help='number of orders to generate')
+    parser.add_argument('--seed', type=int, default=data_generation.SEED, help='seed for the generated data')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the datasets')
+    parser.add_argument('--partition', action='store_true',
+                        help='partition sales and master datasets by Year/Month (one folder per month)')
+    parser.add_argument('--workers', type=int, default=None, help='stages run at once (default: all CPUs)')
+    parser.add_argument('--force', action='store_true', help='run every selected stage even if cached')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - PIPELINE")
+    print("="*70)
+
+    options = {'num_orders': args.num_orders, 'seed': args.seed, 'storage_format': args.storage_format,
+               'partition': args.partition}
+    start = time.perf_counter()
+    try:
+        summary = run(options, args.stages, args.generate, args.workers, args.force)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
+    print_summary(summary, time.perf_counter() - start)
+
+    if any(stage['status'] in ('failed', 'blocked') for stage in summary.values()):
+        print("❌ Some stages failed; run data_generation.py first if raw data is missing")
+        exit(1)
+    print("\n✅ Pipeline complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Blinkit Analysis Dashboard - RFM Segmentation
+Scores every customer on recency, frequency and monetary value from the cleaned
+sales and assigns the dashboard's customer segments (Champions, Loyal, Potential, At Risk)
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+from data_cleaning import id_numbers
+from key_encoding import id_keys
+from storage import FORMATS, dataset_manifest, iter_file_chunks, write_dataset
+
+PROCESSED_DIR = 'data/processed'
+SALES_STEM = f'{PROCESSED_DIR}/sales_clean'
+STATE_PATH = f'{PROCESSED_DIR}/_state/rfm_totals.npz'
+CHUNK_SIZE = 500_000
+SALES_COLUMNS = ['OrderID', 'CustomerID', 'OrderDate', 'TotalAmount']
+CUSTOMER_ID_WIDTH = 5  # CUST00001, as written by data_generation.py
+
+# Score 5 down to 2 at these thresholds, else 1 (the RFM Score measure in DAX_measures.txt)
+RECENCY_DAYS = [30, 60, 90, 180]
+FREQUENCY_ORDERS = [2, 5, 10, 20]
+MONETARY_AMOUNTS = [1000, 2000, 5000, 10000]
+SCORE_LEVELS = 5
+SCORING_METHODS = ['quantile', 'dax']
+
+# Minimum RFM score per segment, best first (the Customer Segment measure)
+SEGMENTS = [(12, 'Champions'), (9, 'Loyal'), (6, 'Potential')]
+DEFAULT_SEGMENT = 'At Risk'
+
+# ============================================================================
+# PER-CUSTOMER TOTALS
+# ============================================================================
+
+class CustomerTotals:
+    """First and last order day, orders and revenue per customer, in arrays indexed by
+    customer number (CUST00042 -> 42). Memory grows with customers, not orders."""
+
+    def __init__(self):
+        self.orders = np.zeros(0, dtype=np.int32)
+        self.revenue = np.zeros(0, dtype=np.float64)
+        self.first_day = np.zeros(0, dtype=np.int32)
+        self.last_day = np.zeros(0, dtype=np.int32)
+        self.max_order_id = 0
+        self.rows = 0  # sales rows added, including rows without a customer or date
+        self.files = {}  # sales file -> [size, modification time, rows added from it]
+
+    def _grow(self, size):
+        """Make room for customer numbers below size"""
+        if size <= len(self.orders):
+            return
+        size = max(size, 2 * len(self.orders), 1024)
+        for name, fill in [('orders', 0), ('revenue', 0), ('first_day', np.iinfo(np.int32).max),
+                           ('last_day', np.iinfo(np.int32).min)]:
+            current = getattr(self, name)
+            grown = np.full(size, fill, dtype=current.dtype)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+
+    def add(self, df_sales):
+        """Fold a chunk of cleaned sales into the totals with one groupby"""
+        self.rows += len(df_sales)
+        if not len(df_sales):
+            return
+        self.max_order_id = max(self.max_order_id, int(id_numbers(df_sales['OrderID'], 'ORD').max()))
+
+        keys = id_keys(df_sales['CustomerID'].reset_index(drop=True), 'CUST', np.int64)
+        dates = pd.to_datetime(df_sales['OrderDate']).to_numpy().astype('datetime64[D]')
+        valid = (keys >= 0) & ~np.isnat(dates)
+        partial = pd.DataFrame({
+            'Day': dates[valid].astype(np.int64),
+            'Amount': pd.to_numeric(df_sales['TotalAmount']).to_numpy(dtype=float)[valid],
+        }).groupby(keys[valid], sort=False).agg(
+            First=('Day', 'min'), Last=('Day', 'max'), Orders=('Day', 'size'), Revenue=('Amount', 'sum'),
+        )
+        if not len(partial):
+            return
+
+        customers = partial.index.to_numpy()
+        self._grow(int(customers.max()) + 1)
+        self.orders[customers] += partial['Orders'].to_numpy(dtype=np.int32)
+        self.revenue[customers] += partial['Revenue'].to_numpy()
+        self.first_day[customers] = np.minimum(self.first_day[customers], partial['First'].to_numpy())
+        self.last_day[customers] = np.maximum(self.last_day[customers], partial['Last'].to_numpy())
+
+    def frame(self):
+        """Customers with at least one order: CustomerID, first/last order date, Frequency, Monetary"""
+        customers = np.flatnonzero(self.orders)
+        ids = np.char.add('CUST', np.char.zfill(customers.astype(str), CUSTOMER_ID_WIDTH))
+        return pd.DataFrame({
+            'CustomerID': ids.astype(object),
+            'FirstOrderDate': self.first_day[customers].astype('datetime64[D]').astype('datetime64[ns]'),
+            'LastOrderDate': self.last_day[customers].astype('datetime64[D]').astype('datetime64[ns]'),
+            'Frequency': self.orders[customers].astype(np.int64),
+            'Monetary': self.revenue[customers].round(2),
+        })
+
+    def save(self, path):
+        """Store the totals and the high-water mark as an .npz file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, orders=self.orders, revenue=self.revenue, first_day=self.first_day,
+                 last_day=self.last_day, max_order_id=self.max_order_id, rows=self.rows,
+                 files=json.dumps(self.files))
+
+    @classmethod
+    def load(cls, path):
+        """Read totals written by save(), or None if there are none"""
+        if not os.path.isfile(path):
+            return None
+        data = np.load(path)
+        totals = cls()
+        for name in ['orders', 'revenue', 'first_day', 'last_day']:
+            setattr(totals, name, data[name])
+        totals.max_order_id = int(data['max_order_id'])
+        totals.rows = int(data['rows'])
+        totals.files = json.loads(str(data['files'])) if 'files' in data.files else {}
+        return totals
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+def threshold_scores(values, thresholds, lower_is_better=False):
+    """Scores 1-5 from four ascending thresholds, as in the DAX RFM Score measure"""
+    if lower_is_better:
+        return (SCORE_LEVELS - np.searchsorted(thresholds, values, side='left')).astype(np.int8)
+    return (1 + np.searchsorted(thresholds, values, side='right')).astype(np.int8)
+
+
+def quantile_scores(values):
+    """Scores 1-5 by quintile of values; equal values share the lowest score among them"""
+    rank_pct = pd.Series(values).rank(method='min', pct=True).to_numpy()
+    return np.ceil(rank_pct * SCORE_LEVELS).clip(1, SCORE_LEVELS).astype(np.int8)
+
+
+def rfm_segment(rfm_score):
+    """Segment name for each RFM score (3-15)"""
+    conditions = [rfm_score >= minimum for minimum, _ in SEGMENTS]
+    return np.select(conditions, [name for _, name in SEGMENTS], DEFAULT_SEGMENT).astype(object)
+
+
+def score_customers(df_totals, as_of, method='quantile'):
+    """Add recency, the R/F/M scores, their sum and the segment to per-customer totals"""
+    df = df_totals.copy()
+    df['RecencyDays'] = (pd.Timestamp(as_of).normalize() - df['LastOrderDate']).dt.days.astype(np.int64)
+    if method == 'dax':
+        df['RecencyScore'] = threshold_scores(df['RecencyDays'], RECENCY_DAYS, lower_is_better=True)
+        df['FrequencyScore'] = threshold_scores(df['Frequency'], FREQUENCY_ORDERS)
+        df['MonetaryScore'] = threshold_scores(df['Monetary'], MONETARY_AMOUNTS)
+    else:
+        df['RecencyScore'] = quantile_scores(-df['RecencyDays'])
+        df['FrequencyScore'] = quantile_scores(df['Frequency'])
+        df['MonetaryScore'] = quantile_scores(df['Monetary'])
+    df['RFMScore'] = (df['RecencyScore'] + df['FrequencyScore'] + df['MonetaryScore']).astype(np.int8)
+    df['RFMSegment'] = rfm_segment(df['RFMScore'].to_numpy())
+    return df
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def aggregate_sales(chunk_size=CHUNK_SIZE):
+    """Totals over every cleaned sales row"""
+    totals = CustomerTotals()
+    for path, info in dataset_manifest(SALES_STEM).items():
+        rows = totals.rows
+        for chunk in iter_file_chunks(path, chunk_size, columns=SALES_COLUMNS):
+            totals.add(chunk)
+        totals.files[path] = info + [totals.rows - rows]
+    return totals
+
+
+def add_new_sales(totals, chunk_size=CHUNK_SIZE):
+    """Fold in sales after the totals' high-water mark, reading only the sales files added or changed
+    since the last run (appended part or partition files, or a rewritten CSV file).
+
+    Returns (new rows, files read), or None if rows folded in earlier no longer match
+    the totals (the sales were re-cleaned from other raw data).
+    """
+    manifest = dataset_manifest(SALES_STEM)
+    if set(totals.files) - set(manifest):
+        return None
+    max_order_id, new_rows, files_read = totals.max_order_id, 0, 0
+    for path, info in manifest.items():
+        known = totals.files.get(path)
+        if known is not None and known[:2] == info:
+            continue
+        old_rows, file_rows = 0, 0
+        for chunk in iter_file_chunks(path, chunk_size, columns=SALES_COLUMNS):
+            new = (id_numbers(chunk['OrderID'], 'ORD') > max_order_id).to_numpy()
+            old_rows += int((~new).sum())
+            file_rows += len(chunk)
+            totals.add(chunk[new])
+        if old_rows != (known[2] if known is not None else 0):
+            return None
+        new_rows += file_rows - old_rows
+        files_read += 1
+        totals.files[path] = info + [file_rows]
+    return new_rows, files_read
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def print_segment_report(df_rfm):
+    """Customers, orders and revenue per segment"""
+    summary = df_rfm.groupby('RFMSegment').agg(
+        Customers=('CustomerID', 'size'), Orders=('Frequency', 'sum'), Revenue=('Monetary', 'sum'),
+        AvgRecency=('RecencyDays', 'mean'),
+    )
+    order = [name for _, name in SEGMENTS] + [DEFAULT_SEGMENT]
+    summary = summary.reindex([name for name in order if name in summary.index])
+
+    print("\n" + "="*70)
+    print("CUSTOMER SEGMENTS")
+    print("="*70)
+    print(f"{'segment':<14}{'customers':>12}{'share':>8}{'orders':>12}{'revenue':>16}{'recency (d)':>13}")
+    for row in summary.itertuples():
+        print(f"{row.Index:<14}{row.Customers:>12,}{row.Customers / len(df_rfm) * 100:>7.1f}%"
+              f"{row.Orders:>12,}{row.Revenue:>16,.2f}{row.AvgRecency:>13.1f}")
+    print("="*70)
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run(storage_format='csv', chunk_size=CHUNK_SIZE, method='quantile', as_of=None, incremental=False):
+    """Aggregate sales per customer, score and segment them and save customer_rfm"""
+    start = time.perf_counter()
+    print("\n[1/3] Aggregating orders per customer...")
+    totals = CustomerTotals.load(STATE_PATH) if incremental else None
+    if totals is None:
+        totals = aggregate_sales(chunk_size)
+        print(f"✓ Aggregated {totals.rows:,} orders")
+    else:
+        added = add_new_sales(totals, chunk_size)
+        if added is None:
+            print("  - Cleaned sales changed since the last run: aggregating all orders again")
+            totals = aggregate_sales(chunk_size)
+            print(f"✓ Aggregated {totals.rows:,} orders")
+        else:
+            new_rows, files_read = added
+            print(f"✓ Added {new_rows:,} new orders ({totals.rows:,} in total) "
+                  f"from {files_read} new or changed of {len(totals.files)} sales files")
+    if incremental:
+        totals.save(STATE_PATH)
+    print(f"  - {totals.rows / max(time.perf_counter() - start, 1e-9):,.0f} orders/sec")
+
+    print("\n[2/3] Scoring customers...")
+    df_totals = totals.frame()
+    if as_of is None:
+        as_of = df_totals['LastOrderDate'].max()
+    df_rfm = score_customers(df_totals, as_of, method)
+    print(f"✓ Scored {len(df_rfm):,} customers ({method} scores, recency as of {pd.Timestamp(as_of).date()})")
+
+    print("\n[3/3] Saving...")
+    path = write_dataset(df_rfm, f'{PROCESSED_DIR}/customer_rfm', storage_format)
+    print(f"✓ Saved: {path}")
+    print_segment_report(df_rfm)
+    print(f"\n✅ RFM segmentation finished in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Score and segment Blinkit customers by recency, frequency '
+                                                 'and monetary value')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the customer_rfm table')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='sales rows aggregated at a time')
+    parser.add_argument('--scoring', choices=SCORING_METHODS, default='quantile',
+                        help="quintile scores, or the fixed thresholds of the DAX 'RFM Score' measure")
+    parser.add_argument('--as-of', help='date recency is measured from (default: the latest order date)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='add only orders cleaned since the last incremental run')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - RFM SEGMENTATION")
+    print("="*70)
+
+    try:
+        run(args.storage_format, args.chunk_size, args.scoring, args.as_of, args.incremental)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
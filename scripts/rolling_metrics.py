@@ -0,0 +1,346 @@
+"""
+Blinkit Analysis Dashboard - Rolling Metrics
+Precomputes one dense daily table per city and customer segment: trailing 7/30-day
+revenue, orders and active customers, previous-period and same-period-last-year
+values and running totals, all from cumulative sums over the day axis
+"""
+
+import pandas as pd
+import numpy as np
+import argparse
+import time
+
+from key_encoding import Lookup, id_keys, MISSING_KEY
+from storage import FORMATS, iter_dataset_chunks, write_dataset
+
+PROCESSED_DIR = 'data/processed'
+CHUNK_SIZE = 500_000
+MERGE_ROWS = 4_000_000  # sparse rows buffered before they are merged
+MASTER_COLUMNS = ['OrderDate', 'City', 'CustomerSegment', 'CustomerID', 'TotalAmount']
+WINDOWS = [7, 30]
+ALL = 'All'  # City / CustomerSegment value of the rollup rows
+UNKNOWN = 'Unknown'  # orders without a city or segment
+
+# Active customers: HyperLogLog sketches per series and day are merged across days and
+# rollups with a register-wise max. 'exact' keeps every distinct customer-day instead.
+DISTINCT_METHODS = ['hll', 'exact']
+HLL_PRECISION = 10  # 2^10 registers: about 3% standard error
+CODE_BITS = 8  # city and segment codes in the packed city/segment/day key
+DAY_BITS = 20  # days since 1970
+RHO_BITS = 6
+RANK_POWERS = np.ldexp(1.0, -np.arange(1 << RHO_BITS))  # 2^-rank lookup for the estimator
+
+# ============================================================================
+# HYPERLOGLOG
+# ============================================================================
+
+def hash64(values):
+    """splitmix64 of integer values: well mixed 64-bit hashes"""
+    z = np.asarray(values).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def hll_registers(customers, precision):
+    """Register index and rank (position of the first 1 bit in the next 32 bits) per customer"""
+    hashes = hash64(customers)
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    bits = ((hashes >> np.uint64(32 - precision)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    _, exponents = np.frexp(bits)  # bit length of the 32 bits
+    return registers, np.where(bits > 0, 33 - exponents, 33).astype(np.int64)
+
+
+def hll_estimate(registers):
+    """Cardinality estimates from register arrays (registers on the last axis)"""
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / RANK_POWERS[registers].sum(axis=-1)
+    zeros = (registers == 0).sum(axis=-1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+def rolling_max(values, window):
+    """Max over the trailing window along the first axis, in three passes (van Herk / Gil-Werman)"""
+    days = len(values)
+    blocks = -(-days // window)
+    padded = np.zeros((blocks * window,) + values.shape[1:], dtype=values.dtype)
+    padded[:days] = values
+    shaped = padded.reshape((blocks, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(shaped, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    result = prefix[:days].copy()
+    if days >= window:
+        result[window - 1:] = np.maximum(suffix[:days - window + 1], prefix[window - 1:days])
+    return result
+
+# ============================================================================
+# CHUNKED AGGREGATION
+# ============================================================================
+
+def _reduce_sums(keys, orders, revenue):
+    """Sum orders and revenue per distinct key"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return (unique_keys, np.bincount(inverse, orders, len(unique_keys)),
+            np.bincount(inverse, revenue, len(unique_keys)))
+
+
+def _reduce_max(keys):
+    """Keep the highest rank per register: keys are (register key << RHO_BITS) | rank"""
+    keys = np.unique(keys)
+    last = np.r_[(keys[1:] >> RHO_BITS) != (keys[:-1] >> RHO_BITS), True]
+    return keys[last]
+
+
+class DailyActivity:
+    """Orders, revenue and active-customer sketches per (city, segment, day), chunk by chunk.
+    Memory grows with series x days (x registers), not orders."""
+
+    def __init__(self, method='hll', precision=HLL_PRECISION):
+        self.method = method
+        self.precision = precision
+        self.lookups = {'City': Lookup('City'), 'CustomerSegment': Lookup('CustomerSegment')}
+        self._sums, self._distinct = [], []
+        self._buffered = 0
+
+    def add(self, df_master):
+        """Fold a chunk of master dataset rows into the daily totals"""
+        days = pd.to_datetime(df_master['OrderDate']).to_numpy().astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        df = df_master[valid].reset_index(drop=True)
+        cities = self.lookups['City'].encode(df['City'].astype(object).fillna(UNKNOWN)).astype(np.int64)
+        segments = self.lookups['CustomerSegment'].encode(
+            df['CustomerSegment'].astype(object).fillna(UNKNOWN)).astype(np.int64)
+        if max(len(lookup.values) for lookup in self.lookups.values()) >= 1 << CODE_BITS:
+            raise ValueError(f"Rolling metrics support at most {(1 << CODE_BITS) - 1} cities and segments")
+        cells = (((cities << CODE_BITS) | segments) << DAY_BITS) | days[valid].astype(np.int64)
+        amounts = pd.to_numeric(df['TotalAmount']).fillna(0).to_numpy(dtype=float)
+        self._sums.append(_reduce_sums(cells, np.ones(len(cells)), amounts))
+
+        customers = id_keys(df['CustomerID'], 'CUST', np.int64)
+        known = customers != MISSING_KEY
+        if self.method == 'hll':
+            registers, ranks = hll_registers(customers[known], self.precision)
+            self._distinct.append(_reduce_max((((cells[known] << self.precision) | registers) << RHO_BITS) | ranks))
+        else:
+            self._distinct.append(np.unique(np.column_stack([cells[known], customers[known]]), axis=0))
+        self._buffered += len(self._sums[-1][0]) + len(self._distinct[-1])
+        if self._buffered > MERGE_ROWS:
+            self._merge()
+
+    def _merge(self):
+        """Reduce the buffered chunks into one sorted part each"""
+        if len(self._sums) > 1:
+            self._sums = [_reduce_sums(*(np.concatenate(arrays) for arrays in zip(*self._sums)))]
+        if len(self._distinct) > 1:
+            merged = np.concatenate(self._distinct)
+            self._distinct = [_reduce_max(merged) if self.method == 'hll' else np.unique(merged, axis=0)]
+        self._buffered = sum(len(part[0]) for part in self._sums) + sum(len(part) for part in self._distinct)
+
+    def parts(self):
+        """(cell keys, orders, revenue) and the distinct-customer part, merged"""
+        self._merge()
+        if not self._sums:
+            raise ValueError("No orders with an order date to build daily series from")
+        return self._sums[0], self._distinct[0]
+
+# ============================================================================
+# DENSE DAILY SERIES
+# ============================================================================
+
+def _split_cells(cells):
+    """City code, segment code and day number of packed cell keys"""
+    days = cells & ((1 << DAY_BITS) - 1)
+    series = cells >> DAY_BITS
+    return series >> CODE_BITS, series & ((1 << CODE_BITS) - 1), days
+
+
+def dense_sums(sums, num_cities, num_segments, first_day, num_days):
+    """Orders and revenue as (city + All, segment + All, day) arrays"""
+    cells, orders, revenue = sums
+    cities, segments, days = _split_cells(cells)
+    shape = (num_cities + 1, num_segments + 1, num_days)
+    dense_orders, dense_revenue = np.zeros(shape), np.zeros(shape)
+    dense_orders[cities, segments, days - first_day] = orders
+    dense_revenue[cities, segments, days - first_day] = revenue
+    for dense in [dense_orders, dense_revenue]:
+        dense[-1, :-1] = dense[:-1, :-1].sum(axis=0)
+        dense[:, -1] = dense[:, :-1].sum(axis=1)
+    return dense_orders, dense_revenue
+
+
+def hll_active_customers(keys, precision, num_cities, num_segments, first_day, num_days):
+    """Estimated distinct customers per day and per trailing window, with All rollups"""
+    ranks = keys & ((1 << RHO_BITS) - 1)
+    registers = (keys >> RHO_BITS) & ((1 << precision) - 1)
+    cities, segments, days = _split_cells(keys >> (RHO_BITS + precision))
+    sketches = np.zeros((num_cities + 1, num_segments + 1, num_days, 1 << precision), dtype=np.uint8)
+    sketches[cities, segments, days - first_day, registers] = ranks
+    sketches[-1, :-1] = sketches[:-1, :-1].max(axis=0)
+    sketches[:, -1] = sketches[:, :-1].max(axis=1)
+
+    active = {window: np.zeros(sketches.shape[:3]) for window in [1] + WINDOWS}
+    for city in range(num_cities + 1):
+        for segment in range(num_segments + 1):  # one series at a time bounds the float temporaries
+            series = sketches[city, segment]
+            active[1][city, segment] = hll_estimate(series)
+            for window in WINDOWS:
+                active[window][city, segment] = hll_estimate(rolling_max(series, window))
+    return active
+
+
+def exact_active_customers(pairs, num_cities, num_segments, first_day, num_days):
+    """Exact distinct customers per day and per trailing window, with All rollups.
+
+    A customer seen on days d1 < d2 < ... counts in a window of w days on the days
+    [d_i, min(d_i + w, d_i+1)): disjoint intervals, summed with difference arrays.
+    """
+    cities, segments, days = _split_cells(pairs[:, 0])
+    customers, days = pairs[:, 1], days - first_day
+    width = num_segments + 1
+    rollups = [(cities, segments), (cities, num_segments), (num_cities, segments), (num_cities, num_segments)]
+    num_series = (num_cities + 1) * width
+
+    active = {window: np.zeros((num_series, num_days + 1)) for window in [1] + WINDOWS}
+    for city, segment in rollups:
+        series = np.broadcast_to(city * width + segment, days.shape)
+        triples = np.unique(np.column_stack([series, customers, days]), axis=0)  # sorted by series, customer, day
+        series, customer, day = triples[:, 0], triples[:, 1], triples[:, 2]
+        same = np.r_[(series[1:] == series[:-1]) & (customer[1:] == customer[:-1]), False]
+        next_day = np.where(same, np.r_[day[1:], 0], num_days)
+        for window, counts in active.items():
+            end = np.minimum(np.minimum(day + window, next_day), num_days)
+            counts += np.bincount(series * (num_days + 1) + day, minlength=counts.size).reshape(counts.shape)
+            counts -= np.bincount(series * (num_days + 1) + end, minlength=counts.size).reshape(counts.shape)
+    return {window: np.cumsum(counts, axis=1)[:, :num_days].reshape(num_cities + 1, width, num_days)
+            for window, counts in active.items()}
+
+
+def trailing(values, window):
+    """Sum over the trailing window along the day axis, from a cumulative sum"""
+    totals = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(totals)
+    shifted[..., window:] = totals[..., :-window]
+    return totals - shifted
+
+
+def shifted_days(values, offsets):
+    """values at day index offsets along the day axis (NaN where the day is before the data)"""
+    result = np.full(values.shape, np.nan)
+    valid = offsets >= 0
+    result[..., valid] = values[..., offsets[valid]]
+    return result
+
+
+def growth_pct(current, previous):
+    """Growth % with DIVIDE semantics: 0 when the previous value is 0, NaN when it is unknown"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(previous == 0, 0.0, (current - previous) / previous * 100)
+    return np.where(np.isnan(previous), np.nan, growth).round(2)
+
+
+def daily_table(orders, revenue, active, cities, segments, first_day):
+    """One row per city (+ All) x segment (+ All) x day with the rolling, prior-period and running columns"""
+    num_days = orders.shape[-1]
+    dates = pd.to_datetime(np.arange(first_day, first_day + num_days).astype('datetime64[D]'))
+    last_year = ((dates - pd.DateOffset(years=1)).to_numpy().astype('datetime64[D]').astype(np.int64)
+                 - first_day)
+
+    columns = {'Revenue': revenue, 'Orders': orders, 'ActiveCustomers': active[1]}
+    for window in WINDOWS:
+        columns[f'RevenueL{window}D'] = trailing(revenue, window)
+        columns[f'OrdersL{window}D'] = trailing(orders, window)
+        columns[f'ActiveCustomersL{window}D'] = active[window]
+    columns['RevenuePrev30D'] = shifted_days(columns['RevenueL30D'], np.arange(num_days) - 30)
+    columns['MoMGrowthPctL30D'] = growth_pct(columns['RevenueL30D'], columns['RevenuePrev30D'])
+    columns['RevenueSPLY'] = shifted_days(revenue, last_year)
+    columns['RevenueL30DSPLY'] = shifted_days(columns['RevenueL30D'], last_year)
+    columns['YoYGrowthPctL30D'] = growth_pct(columns['RevenueL30D'], columns['RevenueL30DSPLY'])
+    columns['RunningRevenue'] = np.cumsum(revenue, axis=-1)
+    columns['RunningOrders'] = np.cumsum(orders, axis=-1)
+
+    num_cities, num_segments = orders.shape[:2]
+    df = pd.DataFrame({
+        'Date': np.tile(dates, num_cities * num_segments),
+        'City': np.repeat(np.array(cities + [ALL], dtype=object), num_segments * num_days),
+        'CustomerSegment': np.tile(np.repeat(np.array(segments + [ALL], dtype=object), num_days), num_cities),
+    })
+    for name, values in columns.items():
+        values = values.reshape(-1)
+        if name.startswith(('Orders', 'RunningOrders', 'ActiveCustomers')):
+            df[name] = values.round().astype(np.int64)
+        else:
+            df[name] = values.round(2)
+    return df
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run(storage_format='csv', chunk_size=CHUNK_SIZE, method='hll', precision=HLL_PRECISION):
+    """Aggregate the master dataset per city, segment and day and write the daily_rolling table"""
+    start = time.perf_counter()
+    print("\n[1/3] Aggregating orders per city, segment and day...")
+    activity = DailyActivity(method, precision)
+    rows = 0
+    for chunk in iter_dataset_chunks(f'{PROCESSED_DIR}/master_dataset', chunk_size, columns=MASTER_COLUMNS):
+        activity.add(chunk)
+        rows += len(chunk)
+    sums, distinct = activity.parts()
+    print(f"✓ Aggregated {rows:,} orders ({rows / (time.perf_counter() - start):,.0f} orders/sec)")
+
+    print("\n[2/3] Building daily series...")
+    cities = activity.lookups['City'].values
+    segments = activity.lookups['CustomerSegment'].values
+    days = _split_cells(sums[0])[2]
+    first_day, num_days = int(days.min()), int(days.max() - days.min()) + 1
+    orders, revenue = dense_sums(sums, len(cities), len(segments), first_day, num_days)
+    if method == 'hll':
+        active = hll_active_customers(distinct, precision, len(cities), len(segments), first_day, num_days)
+    else:
+        active = exact_active_customers(distinct, len(cities), len(segments), first_day, num_days)
+    df_daily = daily_table(orders, revenue, active, cities, segments, first_day)
+    df_daily = df_daily.sort_values(['City', 'CustomerSegment', 'Date'], ignore_index=True)
+    print(f"✓ {num_days} days x {len(cities) + 1} cities x {len(segments) + 1} segments "
+          f"(active customers: {'HyperLogLog estimates' if method == 'hll' else 'exact'})")
+
+    print("\n[3/3] Saving...")
+    path = write_dataset(df_daily, f'{PROCESSED_DIR}/daily_rolling', storage_format)
+    print(f"✓ Saved: {path} ({len(df_daily):,} rows)")
+
+    latest = df_daily[(df_daily['City'] == ALL) & (df_daily['CustomerSegment'] == ALL)].iloc[-1]
+    print(f"\n  - Latest day: {latest['Date'].date()}")
+    print(f"  - Revenue L30D: ₹{latest['RevenueL30D']:,.2f} (MoM {latest['MoMGrowthPctL30D']:+.1f}%, "
+          f"YoY {latest['YoYGrowthPctL30D']:+.1f}%)")
+    print(f"  - Active customers L7D / L30D: {latest['ActiveCustomersL7D']:,} / {latest['ActiveCustomersL30D']:,}")
+    print(f"\n✅ Rolling metrics built in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Precompute daily rolling Blinkit metrics per city and segment')
+    parser.add_argument('--format', choices=FORMATS, default='csv', dest='storage_format',
+                        help='file format of the daily_rolling table')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='master dataset rows read at a time')
+    parser.add_argument('--distinct', choices=DISTINCT_METHODS, default='hll', dest='method',
+                        help='active customer counts: HyperLogLog estimates or exact')
+    parser.add_argument('--hll-precision', type=int, default=HLL_PRECISION, choices=range(4, 17), metavar='4-16',
+                        help='HyperLogLog registers = 2^precision (error about 1.04 / sqrt(registers))')
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BLINKIT ANALYSIS DASHBOARD - ROLLING METRICS")
+    print("="*70)
+
+    try:
+        run(args.storage_format, args.chunk_size, args.method, args.hll_precision)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        print("Please run data_cleaning.py first to create the cleaned datasets")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Blinkit Analysis Dashboard - Dataset Storage
+Reads and writes datasets as CSV (default) or typed, columnar Parquet
+"""
+
+import pandas as pd
+import glob
+import os
+import shutil
+import time
+
+from instrumentation import measure
+
+FORMATS = ['csv', 'parquet']
+
+# Column types kept natively in Parquet
+DATETIME_COLUMNS = ['OrderDateTime', 'OrderDate', 'DeliveryDateTime', 'RegistrationDate']
+BOOL_COLUMNS = ['IsActive', 'IsWeekend', 'IsRepeatCustomer', 'IsOnTime']
+CATEGORY_COLUMNS = [
+    'City', 'Area', 'City_delivery', 'Area_delivery', 'City_customer',
+    'PaymentMethod', 'PreferredPaymentMethod', 'OrderStatus', 'DeliveryStatus',
+    'DayOfWeek', 'MonthName', 'CustomerSegment', 'Category', 'SubCategory', 'Brand',
+    'StockStatus', 'TimeSegment', 'OrderValueSegment', 'DeliveryTimeSegment', 'RatingCategory', 'RFMSegment',
+]
+PARTITION_COLUMNS = ['Year', 'Month']
+
+
+def _pyarrow():
+    """Import pyarrow, which is only needed for the Parquet format"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet storage needs pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+# ============================================================================
+# LOCATING DATASETS
+# ============================================================================
+
+def dataset_name(path):
+    """Dataset a stem, file or part file belongs to (used to name I/O metrics)"""
+    root, extension = os.path.splitext(path)
+    name = os.path.basename(root if extension in ('.csv', '.parquet') else path)
+    if name.startswith('part-'):
+        name = os.path.basename(os.path.dirname(path))
+    return name
+
+
+def detect_format(stem):
+    """Format of an existing dataset: 'parquet' if Parquet files exist, else 'csv'"""
+    if os.path.isfile(f'{stem}.parquet'):
+        return 'parquet'
+    if os.path.isdir(stem) and glob.glob(os.path.join(stem, '**', '*.parquet'), recursive=True):
+        return 'parquet'
+    return 'csv'
+
+
+def dataset_parts(stem, fmt='csv'):
+    """Files of a dataset: partition or sharded part files if present, else the single file"""
+    if _is_partitioned(stem):
+        return partition_files(stem, fmt)
+    if os.path.isdir(stem):
+        return sorted(glob.glob(os.path.join(stem, f'part-*.{fmt}')))
+    if os.path.isfile(f'{stem}.{fmt}'):
+        return [f'{stem}.{fmt}']
+    raise FileNotFoundError(f"No such file or directory: '{stem}.{fmt}'")
+
+
+def _partition_sort_key(path):
+    """Numeric order of partition folders (Month=2 before Month=10)"""
+    key = []
+    for name in path.split(os.sep):
+        value = name.partition('=')[2]
+        key.append((0, int(value), '') if value.isdigit() else (1, 0, name))
+    return key
+
+
+def partition_files(stem, fmt, partitions=None):
+    """Files of a partitioned dataset, only those of the given (Year, Month) partitions when given"""
+    directories = [stem] if partitions is None else [
+        os.path.join(stem, f'Year={year}', f'Month={month}') for year, month in partitions]
+    return sorted((path for directory in directories
+                   for path in glob.glob(os.path.join(directory, '**', f'*.{fmt}'), recursive=True)),
+                  key=_partition_sort_key)
+
+
+def file_partition(path):
+    """(Year, Month) of a file in a Year=/Month= partition folder, else None"""
+    values = dict(name.split('=', 1) for name in path.split(os.sep) if '=' in name)
+    try:
+        return int(values['Year']), int(values['Month'])
+    except (KeyError, ValueError):
+        return None
+
+
+def dataset_manifest(stem):
+    """Size and modification time of every file of a dataset, to tell which files changed"""
+    manifest = {}
+    for path in dataset_parts(stem, detect_format(stem)):
+        info = os.stat(path)
+        manifest[path] = [info.st_size, info.st_mtime_ns]
+    return manifest
+
+
+def dataset_exists(stem):
+    """Whether a dataset exists in any format or layout"""
+    return os.path.isdir(stem) or any(os.path.isfile(f'{stem}.{fmt}') for fmt in FORMATS)
+
+
+def remove_dataset(stem):
+    """Delete a dataset in any format or layout"""
+    for fmt in FORMATS:
+        if os.path.isfile(f'{stem}.{fmt}'):
+            os.remove(f'{stem}.{fmt}')
+    if os.path.isdir(stem):
+        shutil.rmtree(stem)
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def read_dataset(stem, fmt=None, columns=None):
+    """Read a whole dataset into memory (format detected when not given)"""
+    fmt = fmt or detect_format(stem)
+    with measure(f'read {dataset_name(stem)}') as step:
+        if fmt == 'parquet':
+            pa = _pyarrow()
+            path = f'{stem}.parquet' if os.path.isfile(f'{stem}.parquet') else stem
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No such file or directory: '{stem}.parquet'")
+            table = pa.dataset.dataset(path, format='parquet', partitioning='hive').to_table(columns=columns)
+            df = table.to_pandas()
+        else:
+            frames = [pd.read_csv(path, usecols=columns) for path in dataset_parts(stem, 'csv')]
+            df = pd.concat(frames, ignore_index=True)
+        step.rows = len(df)
+    return df
+
+
+def _measured_chunks(chunks, name):
+    """Pass chunks through, recording the time spent reading each one"""
+    while True:
+        with measure(f'read {name}') as step:
+            chunk = next(chunks, None)
+            step.rows = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def iter_file_chunks(path, chunk_size, columns=None):
+    """Read one CSV or Parquet file as a stream of DataFrames"""
+    if path.endswith('.parquet'):
+        pa = _pyarrow()
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    else:
+        chunks = iter(pd.read_csv(path, chunksize=chunk_size, usecols=columns))
+    yield from _measured_chunks(chunks, dataset_name(path))
+
+
+def iter_dataset_chunks(stem, chunk_size, fmt=None, columns=None):
+    """Read a dataset as a stream of DataFrames of at most chunk_size rows, in file order"""
+    fmt = fmt or detect_format(stem)
+    if fmt == 'parquet' and _is_partitioned(stem):
+        pa = _pyarrow()
+        dataset = pa.dataset.dataset(stem, format='parquet', partitioning='hive')
+        chunks = (batch.to_pandas() for batch in dataset.to_batches(columns=columns, batch_size=chunk_size))
+        yield from _measured_chunks(chunks, dataset_name(stem))
+        return
+    for path in dataset_parts(stem, fmt):
+        yield from iter_file_chunks(path, chunk_size, columns)
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def to_storage_dtypes(df):
+    """Cast columns to the dtypes stored in Parquet: native timestamps, bools, categoricals"""
+    df = df.copy()
+    for column in df.columns:
+        if column in DATETIME_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+        elif column in BOOL_COLUMNS and df[column].dtype != bool:
+            df[column] = df[column].astype('boolean')
+        elif column in CATEGORY_COLUMNS and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _partition_name(column, value):
+    """Hive-style folder name, as pyarrow writes it (missing values go to its default partition)"""
+    if pd.isna(value):
+        return f'{column}=__HIVE_DEFAULT_PARTITION__'
+    return f'{column}={int(value)}'
+
+
+def _append_csv_partitions(df, stem, partition_cols):
+    """Append rows to one CSV file per partition folder; the partition columns stay in the files"""
+    for keys, df_part in df.groupby(partition_cols, sort=False, dropna=False, observed=True):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        directory = os.path.join(stem, *(_partition_name(c, v) for c, v in zip(partition_cols, keys)))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'part-00000.csv')
+        df_part.to_csv(path, mode='a', header=not os.path.isfile(path), index=False)
+
+
+def _arrow_table(df):
+    """Arrow table with storage dtypes (categoricals become dictionary-encoded)"""
+    pa = _pyarrow()
+    return pa.Table.from_pandas(to_storage_dtypes(df), preserve_index=False)
+
+
+def write_dataset(df, stem, fmt='csv', partition_cols=None):
+    """Write a DataFrame as stem.csv, stem.parquet or a Year/Month partitioned directory"""
+    writer = DatasetWriter(stem, fmt, partition_cols)
+    writer.write(df)
+    writer.close()
+    return writer.path
+
+
+class DatasetWriter:
+    """Append DataFrame chunks to one dataset in either format"""
+
+    def __init__(self, stem, fmt='csv', partition_cols=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown storage format '{fmt}', expected one of {FORMATS}")
+        self.fmt = fmt
+        self.partition_cols = partition_cols
+        self.path = stem if self.partition_cols else f'{stem}.{fmt}'
+        self.rows = 0
+        self._chunks = 0
+        self._parquet_writer = None
+        self._schema = None
+        remove_dataset(stem)
+
+    def write(self, df):
+        """Append one chunk"""
+        with measure(f'write {dataset_name(self.path)}', rows=len(df)):
+            if self.fmt == 'csv' and self.partition_cols:
+                _append_csv_partitions(df, self.path, self.partition_cols)
+            elif self.fmt == 'csv':
+                first = self._chunks == 0
+                df.to_csv(self.path, mode='w' if first else 'a', header=first, index=False)
+            elif self.partition_cols:
+                pa = _pyarrow()
+                pa.parquet.write_to_dataset(_arrow_table(df), self.path, partition_cols=self.partition_cols,
+                                            basename_template=f'chunk-{self._chunks:05d}-{{i}}.parquet')
+            else:
+                pa = _pyarrow()
+                table = _arrow_table(df)
+                if self._parquet_writer is None:
+                    self._schema = table.schema
+                    self._parquet_writer = pa.parquet.ParquetWriter(self.path, self._schema)
+                self._parquet_writer.write_table(table.cast(self._schema))
+        self._chunks += 1
+        self.rows += len(df)
+
+    def close(self):
+        """Finish the file (Parquet footers are written here)"""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def _is_partitioned(stem):
+    """Whether a dataset is a hive-partitioned directory (Year=.../Month=...)"""
+    return os.path.isdir(stem) and any('=' in name for name in os.listdir(stem))
+
+
+def append_dataset(df, stem, fmt='csv', partition_cols=None):
+    """Add rows to an existing dataset without rewriting it (creates it if missing)"""
+    if not os.path.exists(stem) and not os.path.isfile(f'{stem}.{fmt}'):
+        return write_dataset(df, stem, fmt, partition_cols)
+    if fmt == 'csv' and os.path.isfile(f'{stem}.csv'):
+        with measure(f'write {dataset_name(stem)}', rows=len(df)):
+            df.to_csv(f'{stem}.csv', mode='a', header=False, index=False)
+        return f'{stem}.csv'
+    if fmt == 'csv' and _is_partitioned(stem):
+        with measure(f'write {dataset_name(stem)}', rows=len(df)):
+            _append_csv_partitions(df, stem, partition_cols or PARTITION_COLUMNS)
+        return stem
+
+    pa = _pyarrow() if fmt == 'parquet' else None
+    if fmt == 'parquet' and _is_partitioned(stem):
+        pa.parquet.write_to_dataset(_arrow_table(df), stem, partition_cols=partition_cols or PARTITION_COLUMNS,
+                                    basename_template=f'append-{time.time_ns()}-{{i}}.parquet')
+        return stem
+
+    # A single Parquet file can't be appended to, so turn it into part files
+    if os.path.isfile(f'{stem}.{fmt}'):
+        os.makedirs(stem)
+        os.replace(f'{stem}.{fmt}', os.path.join(stem, f'part-00000.{fmt}'))
+    part = len(dataset_parts(stem, fmt))
+    write_dataset(df, os.path.join(stem, f'part-{part:05d}'), fmt)
+    return stem
+
+
+def update_dataset(stem, update, fmt=None, chunk_size=1_000_000, partitions=None):
+    """Rewrite rows of a dataset in place.
+
+    update(df) returns the updated DataFrame, or None when nothing in df
+    changed. Files are rewritten only when they change, and a partitioned
+    dataset is only scanned in the given (Year, Month) partitions. CSV files
+    are streamed in chunks through a temporary file, so an unpartitioned CSV
+    dataset is rewritten whole.
+    """
+    with measure(f'update {dataset_name(stem)}'):
+        fmt = fmt or detect_format(stem)
+        partitioned = _is_partitioned(stem)
+        if fmt == 'csv':
+            paths = partition_files(stem, 'csv', partitions) if partitioned else dataset_parts(stem, 'csv')
+            for path in paths:
+                temp_path = f'{path}.tmp'
+                changed = False
+                for number, chunk in enumerate(pd.read_csv(path, chunksize=chunk_size)):
+                    updated = update(chunk)
+                    changed |= updated is not None
+                    (chunk if updated is None else updated).to_csv(
+                        temp_path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+                if changed:
+                    os.replace(temp_path, path)
+                elif os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return
+
+        pa = _pyarrow()
+        if partitioned:
+            paths = partition_files(stem, 'parquet', partitions)
+        elif os.path.isfile(f'{stem}.parquet'):
+            paths = [f'{stem}.parquet']
+        else:
+            paths = dataset_parts(stem, 'parquet')
+
+        for path in paths:
+            table = pa.parquet.read_table(path, partitioning=None)
+            updated = update(table.to_pandas())
+            if updated is not None:
+                pa.parquet.write_table(_arrow_table(updated).cast(table.schema), path)